@@ -0,0 +1,186 @@
+# -*- encoding: utf-8 -*-
+"""
+Batched ingestion of contact interaction events.
+
+The app used to report every tap on a facility contact with its own request:
+the contact-interaction and contact-click endpoints looked the facility and
+contact up, inserted one ContactInteraction and echoed a large response, all
+on the same workers that serve SOS and search. The app now buffers taps
+(also while offline) and posts them together; ingest_contact_events()
+handles such a batch:
+
+* every contact id in the batch is checked in one query;
+* valid events go to the write-behind queue (apps.common.write_behind),
+  which inserts them in batches outside the request; events the queue has
+  no room for are rejected so the app keeps and resends them;
+* events carry a client_event_id so a batch resent after a timeout is not
+  counted twice: ids stored in the last DEDUP_SECONDS are answered as
+  duplicates, from one cache round trip. The ids are remembered by
+  write_interactions() once their rows are inserted, so an event whose
+  insert failed is accepted again when the app resends it;
+* each event gets its own status, so one bad event does not reject the rest.
+
+An event's occurred_at (when the user tapped) becomes created_at, clamped
+to the present, so the analytics keep the real time of offline taps.
+"""
+
+import hashlib
+import logging
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.common.write_behind import register_writer, write_behind
+from apps.facilities.models import FacilityContact
+
+from .models import ContactInteraction
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_EVENTS = 500
+DEDUP_SECONDS = 24 * 3600
+INTERACTION_TYPE_MAX_LENGTH = 50
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+class InvalidBatch(ValueError):
+    """The batch as a whole cannot be processed."""
+
+
+def _dedup_key(device_id, client_event_id):
+    # Hashed: both parts come from the client and may not be valid cache keys
+    digest = hashlib.md5(f'{device_id}\x1f{client_event_id}'.encode()).hexdigest()
+    return f'analytics_event:{digest}'
+
+
+def write_interactions(interactions):
+    """Insert queued interactions, then remember their client_event_ids."""
+    ContactInteraction.objects.bulk_create(interactions)
+    keys = [interaction.dedup_key for interaction in interactions
+            if getattr(interaction, 'dedup_key', None)]
+    if not keys:
+        return
+    try:
+        cache.set_many({key: 1 for key in keys}, DEDUP_SECONDS)
+    except Exception:
+        # The rows are in: failing here must not make the queue retry them
+        logger.exception("Could not remember %d analytics event ids", len(keys))
+
+
+register_writer(ContactInteraction, write_interactions)
+
+
+def _parse_event(event, now):
+    """Return (contact_id, interaction fields) or raise ValueError."""
+    if not isinstance(event, dict):
+        raise ValueError('Event must be an object')
+    try:
+        contact_id = int(event.get('contact_id'))
+    except (TypeError, ValueError):
+        raise ValueError('contact_id must be an integer')
+
+    interaction_type = event.get('type') or 'click'
+    if not isinstance(interaction_type, str) or len(interaction_type) > INTERACTION_TYPE_MAX_LENGTH:
+        raise ValueError(f'type must be a string of at most {INTERACTION_TYPE_MAX_LENGTH} characters')
+
+    data = event.get('data') or {}
+    if not isinstance(data, dict):
+        raise ValueError('data must be an object')
+
+    is_helpful = event.get('is_helpful', data.get('is_helpful'))
+    if is_helpful is not None and not isinstance(is_helpful, bool):
+        raise ValueError('is_helpful must be true, false or null')
+
+    occurred_at = now
+    if event.get('occurred_at'):
+        occurred_at = parse_datetime(str(event['occurred_at']))
+        if occurred_at is None:
+            raise ValueError('occurred_at must be an ISO 8601 date and time')
+        if timezone.is_naive(occurred_at):
+            occurred_at = occurred_at.replace(tzinfo=dt_timezone.utc)
+        occurred_at = min(occurred_at, now)
+
+    return contact_id, {
+        'interaction_type': interaction_type,
+        'click_data': data,
+        'is_helpful': is_helpful,
+        'created_at': occurred_at,
+    }
+
+
+def ingest_contact_events(session, events):
+    """
+    Store the contact interaction `events` of one mobile `session`.
+
+    Returns one status dict per event, in order. Raises InvalidBatch if
+    `events` is not a list or holds more than MAX_BATCH_EVENTS items.
+    """
+    if not isinstance(events, list):
+        raise InvalidBatch('events must be a list')
+    if len(events) > MAX_BATCH_EVENTS:
+        raise InvalidBatch(f'At most {MAX_BATCH_EVENTS} events per batch')
+
+    now = timezone.now()
+    results = []
+    parsed = []
+    for index, event in enumerate(events):
+        client_event_id = event.get('client_event_id') if isinstance(event, dict) else None
+        result = {'index': index, 'client_event_id': client_event_id}
+        results.append(result)
+        try:
+            contact_id, fields = _parse_event(event, now)
+        except ValueError as e:
+            result.update(status=REJECTED, error=str(e))
+            continue
+        parsed.append((result, contact_id, fields))
+
+    # Resent events: one cache round trip for the whole batch
+    keys = {
+        result['index']: _dedup_key(session.device_id, result['client_event_id'])
+        for result, _, _ in parsed if result['client_event_id'] not in (None, '')
+    }
+    seen = cache.get_many(list(keys.values())) if keys else {}
+    batch_keys = set()
+    fresh = []
+    for item in parsed:
+        key = keys.get(item[0]['index'])
+        if key is not None and (key in seen or key in batch_keys):
+            item[0]['status'] = DUPLICATE
+            continue
+        if key is not None:
+            batch_keys.add(key)
+        fresh.append(item)
+
+    # One query validates every contact in the batch
+    active_contacts = set(
+        FacilityContact.objects.filter(
+            contact_id__in={contact_id for _, contact_id, _ in fresh}, is_active=True
+        ).values_list('contact_id', flat=True)
+    ) if fresh else set()
+
+    interactions = []
+    for result, contact_id, fields in fresh:
+        if contact_id not in active_contacts:
+            result.update(status=REJECTED, error='Contact not found')
+            continue
+        interaction = ContactInteraction(
+            contact_id=contact_id,
+            device_id=session.device_id,
+            user_latitude=session.latitude,
+            user_longitude=session.longitude,
+            **fields
+        )
+        interaction.dedup_key = keys.get(result['index'])
+        result['status'] = ACCEPTED
+        interactions.append((interaction, result))
+
+    queued = write_behind.enqueue_many(interaction for interaction, _ in interactions)
+    for interaction, result in interactions[queued:]:
+        # Dropped under backpressure: tell the app to keep and resend it
+        result.update(status=REJECTED, error='Server busy, resend later')
+    return results
@@ -0,0 +1,73 @@
+"""
+Fold new contact interactions into the hourly and daily rollups, and
+optionally prune raw interactions past the retention window.
+
+Meant to run from cron every few minutes; each run only reads interactions
+added since the previous one (see apps.analytics.rollups).
+
+Usage:
+    python manage.py rollup_contact_interactions
+    python manage.py rollup_contact_interactions --prune
+    python manage.py rollup_contact_interactions --prune --retention-days 30
+    python manage.py rollup_contact_interactions --rebuild-since 2025-09-01
+"""
+import time
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.rollups import (
+    RAW_RETENTION_DAYS, ROLLUP_BATCH_SIZE, prune_raw_interactions, rebuild_rollups, roll_up_interactions,
+)
+
+
+class Command(BaseCommand):
+    help = "Roll contact interactions up into hourly and daily counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ROLLUP_BATCH_SIZE,
+            help="Interaction IDs per transaction (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete rolled-up raw interactions older than the retention window",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=RAW_RETENTION_DAYS,
+            help="Days of raw interactions to keep when pruning (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--rebuild-since",
+            metavar="YYYY-MM-DD",
+            help="Recount all buckets from this day on from the raw interactions",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batch_size = max(1, options["batch_size"])
+
+        folded = roll_up_interactions(batch_size)
+        self.stdout.write(f"  {folded} new interactions rolled up")
+
+        if options["rebuild_since"]:
+            try:
+                day = datetime.strptime(options["rebuild_since"], "%Y-%m-%d").date()
+                recounted = rebuild_rollups(datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc), batch_size)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"  {recounted} interactions recounted since {day}")
+
+        if options["prune"]:
+            if options["retention_days"] < 1:
+                raise CommandError("--retention-days must be at least 1")
+            deleted = prune_raw_interactions(options["retention_days"])
+            self.stdout.write(f"  {deleted} raw interactions pruned")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Interaction rollups updated in {elapsed:.1f}s."))
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0007_facility_search_document'),
+        ('lookups', '0002_gbvcategory_icon_url_servicecategory_icon_url'),
+        ('geography', '0002_add_centroid_bbox_fields'),
+        ('analytics', '0005_contactinteraction_click_data_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('pruned_before', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyInteractionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('interaction_type', models.CharField(blank=True, max_length=50)),
+                ('interaction_count', models.PositiveIntegerField(default=0)),
+                ('helpful_count', models.PositiveIntegerField(default=0)),
+                ('not_helpful_count', models.PositiveIntegerField(default=0)),
+                ('contact', models.ForeignKey(db_column='contact_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facilities.facilitycontact')),
+                ('contact_type', models.ForeignKey(db_column='contact_type_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lookups.contacttype')),
+                ('county', models.ForeignKey(db_column='county_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geography.county')),
+                ('facility', models.ForeignKey(db_column='facility_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facilities.facility')),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly Interaction Rollups',
+                'db_table': 'contact_interaction_hourly',
+                'abstract': False,
+                'indexes': [models.Index(fields=['facility', 'bucket_start'], name='contact_int_facilit_764b09_idx'), models.Index(fields=['county', 'bucket_start'], name='contact_int_county__2d3d19_idx')],
+                'unique_together': {('bucket_start', 'contact', 'interaction_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyInteractionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('interaction_type', models.CharField(blank=True, max_length=50)),
+                ('interaction_count', models.PositiveIntegerField(default=0)),
+                ('helpful_count', models.PositiveIntegerField(default=0)),
+                ('not_helpful_count', models.PositiveIntegerField(default=0)),
+                ('contact', models.ForeignKey(db_column='contact_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facilities.facilitycontact')),
+                ('contact_type', models.ForeignKey(db_column='contact_type_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lookups.contacttype')),
+                ('county', models.ForeignKey(db_column='county_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geography.county')),
+                ('facility', models.ForeignKey(db_column='facility_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facilities.facility')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Interaction Rollups',
+                'db_table': 'contact_interaction_daily',
+                'abstract': False,
+                'indexes': [models.Index(fields=['facility', 'bucket_start'], name='contact_int_facilit_b4fef7_idx'), models.Index(fields=['county', 'bucket_start'], name='contact_int_county__fcb4cc_idx')],
+                'unique_together': {('bucket_start', 'contact', 'interaction_type')},
+            },
+        ),
+    ]
@@ -3,6 +3,8 @@
 Analytics and tracking models for GVRC Admin
 """
 
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 
@@ -52,4 +54,106 @@ class AuditTrail(models.Model):
     
     class Meta:
         verbose_name_plural = "Audit Trail"
-        db_table = 'audit_trail'
\ No newline at end of file
+        db_table = 'audit_trail'
+
+class InteractionRollup(models.Model):
+    """
+    Contact interactions counted per time bucket and contact (see rollups.py).
+    Facility, contact type and county are taken from the contact when a
+    bucket is first written.
+    """
+    bucket_start = models.DateTimeField(null=False)
+    facility = models.ForeignKey('facilities.Facility', on_delete=models.CASCADE, db_column='facility_id', related_name='+')
+    contact = models.ForeignKey('facilities.FacilityContact', on_delete=models.CASCADE, db_column='contact_id', related_name='+')
+    contact_type = models.ForeignKey('lookups.ContactType', on_delete=models.CASCADE, db_column='contact_type_id', related_name='+')
+    county = models.ForeignKey('geography.County', on_delete=models.CASCADE, db_column='county_id', related_name='+')
+    interaction_type = models.CharField(max_length=50, blank=True)
+    interaction_count = models.PositiveIntegerField(default=0)
+    helpful_count = models.PositiveIntegerField(default=0)
+    not_helpful_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        unique_together = ('bucket_start', 'contact', 'interaction_type')
+
+
+class HourlyInteractionRollup(InteractionRollup):
+    """Contact interactions per hour"""
+    
+    class Meta(InteractionRollup.Meta):
+        verbose_name_plural = "Hourly Interaction Rollups"
+        db_table = 'contact_interaction_hourly'
+        indexes = [
+            models.Index(fields=['facility', 'bucket_start']),
+            models.Index(fields=['county', 'bucket_start']),
+        ]
+
+
+class DailyInteractionRollup(InteractionRollup):
+    """Contact interactions per day (UTC)"""
+    
+    class Meta(InteractionRollup.Meta):
+        verbose_name_plural = "Daily Interaction Rollups"
+        db_table = 'contact_interaction_daily'
+        indexes = [
+            models.Index(fields=['facility', 'bucket_start']),
+            models.Index(fields=['county', 'bucket_start']),
+        ]
+
+
+class IdWatermark(models.Model):
+    """
+    How far a job has read a raw table by primary key.
+
+    A row takes its id when it is inserted but only becomes visible when its
+    transaction commits, so a lower id can appear after a higher one has
+    been read. Readers therefore stop at an id seen at least a safety
+    interval earlier (seen_id, seen_at): by then every transaction that took
+    a lower id has committed.
+    """
+    last_id = models.BigIntegerField(default=0)
+    seen_id = models.BigIntegerField(default=0)
+    seen_at = models.DateTimeField(blank=True, null=True)
+    
+    def settled_id(self, latest_id, safety_seconds):
+        """
+        The highest id safe to read up to, given the table's current
+        `latest_id`, which is remembered for a later run. The caller saves.
+        """
+        if safety_seconds <= 0:
+            return max(latest_id, self.last_id)
+        now = timezone.now()
+        if self.seen_at is not None and self.seen_at > now - timedelta(seconds=safety_seconds):
+            return self.last_id
+        settled = self.seen_id
+        self.seen_id, self.seen_at = latest_id, now
+        return max(settled, self.last_id)
+    
+    class Meta:
+        abstract = True
+
+
+class RollupWatermark(IdWatermark):
+    """How far a rollup has read its raw table, and what was pruned from it"""
+    name = models.CharField(max_length=50, primary_key=True)
+    pruned_before = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} rolled up to {self.last_id}"
+    
+    class Meta:
+        db_table = 'rollup_watermarks'
+
+
+class ExportWatermark(IdWatermark):
+    """The last row an incremental analytics export has written, per export"""
+    name = models.CharField(max_length=100, primary_key=True)
+    last_key = models.CharField(max_length=500, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} exported to {self.last_id}"
+    
+    class Meta:
+        db_table = 'export_watermarks'
@@ -0,0 +1,271 @@
+# -*- encoding: utf-8 -*-
+"""
+Hourly and daily rollups of contact interactions.
+
+ContactInteraction only has its primary and foreign keys indexed, so any
+"interactions per facility per day" report scanned and grouped the whole
+raw table, and got slower with every tap. Reports now read two small
+tables instead, HourlyInteractionRollup and DailyInteractionRollup. Each
+holds one row per bucket, contact and interaction_type, which also carries
+the contact's facility, contact type and county.
+
+* roll_up_interactions() folds raw rows into both tables incrementally.
+  RollupWatermark records the highest interaction_id already counted, and
+  each run reads only newer rows, in primary-key batches. Each batch adds
+  its counts and advances the watermark in one transaction, so a crashed
+  or concurrent run never counts a row twice.
+* Offline taps arrive late, with a created_at in the past. They are
+  selected by id and added to the buckets they belong to.
+* interaction_series() answers dashboard queries from the rollups.
+* prune_raw_interactions() deletes raw rows older than the retention
+  window (ANALYTICS_RAW_RETENTION_DAYS, 90 days by default), but only rows
+  that have already been counted.
+* rebuild_rollups() recounts from a given day onward, from the raw rows
+  still kept.
+
+The rollup_contact_interactions command runs all of this and is meant to be
+run from cron every few minutes. Rollups are as fresh as its last run;
+series responses say when that was.
+
+Rows are selected by id, but ids are handed out at insert and become
+visible at commit, so a batch of interactions still being written (the
+write-behind queue inserts hundreds per transaction) can commit below an
+id that has already been read. Each run therefore reads only up to the
+highest id it saw on an earlier run at least ANALYTICS_SETTLE_SECONDS (60)
+before; the rollups trail the raw table by about one run. A transaction
+open for longer than that can still be missed; rebuild_rollups() repairs it.
+"""
+
+from collections import namedtuple
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import ContactInteraction, DailyInteractionRollup, HourlyInteractionRollup, RollupWatermark
+
+WATERMARK_NAME = 'contact_interactions'
+ROLLUP_BATCH_SIZE = 50000
+PRUNE_BATCH_SIZE = 10000
+RAW_RETENTION_DAYS = getattr(settings, 'ANALYTICS_RAW_RETENTION_DAYS', 90)
+SETTLE_SECONDS = getattr(settings, 'ANALYTICS_SETTLE_SECONDS', 60)
+# Longest range interaction_series() reads from hourly buckets
+MAX_HOURLY_RANGE = timedelta(days=31)
+
+GRANULARITIES = {
+    'hour': HourlyInteractionRollup,
+    'day': DailyInteractionRollup,
+}
+GROUP_FIELDS = {
+    'facility': 'facility_id',
+    'contact': 'contact_id',
+    'contact_type': 'contact_type_id',
+    'county': 'county_id',
+    'interaction_type': 'interaction_type',
+}
+FILTER_FIELDS = ('facility_id', 'contact_id', 'contact_type_id', 'county_id', 'interaction_type')
+COUNT_FIELDS = ('interaction_count', 'helpful_count', 'not_helpful_count')
+
+# One bucket's worth of counts for a contact and interaction type
+Delta = namedtuple('Delta', 'facility_id contact_type_id county_id interaction_count helpful_count not_helpful_count')
+
+
+def start_of_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _hourly_deltas(interactions):
+    """Count `interactions` per hour, contact and type in the database."""
+    rows = (
+        interactions.annotate(bucket=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values(
+            'bucket', 'contact_id', 'interaction_type', 'contact__facility_id',
+            'contact__contact_type_id', 'contact__facility__ward__constituency__county_id',
+        )
+        .annotate(
+            interactions=Count('pk'),
+            helpful=Count('pk', filter=Q(is_helpful=True)),
+            not_helpful=Count('pk', filter=Q(is_helpful=False)),
+        )
+        .order_by()
+    )
+    return {
+        (row['bucket'], row['contact_id'], row['interaction_type']): Delta(
+            row['contact__facility_id'], row['contact__contact_type_id'],
+            row['contact__facility__ward__constituency__county_id'],
+            row['interactions'], row['helpful'], row['not_helpful'],
+        )
+        for row in rows
+    }
+
+
+def _daily_deltas(hourly):
+    daily = {}
+    for (bucket, contact_id, interaction_type), delta in hourly.items():
+        key = (start_of_day(bucket), contact_id, interaction_type)
+        total = daily.get(key)
+        daily[key] = delta if total is None else total._replace(
+            interaction_count=total.interaction_count + delta.interaction_count,
+            helpful_count=total.helpful_count + delta.helpful_count,
+            not_helpful_count=total.not_helpful_count + delta.not_helpful_count,
+        )
+    return daily
+
+
+def _apply(model, deltas, chunk_size=500):
+    """Add `deltas` to the rows of `model`, creating the missing ones."""
+    if not deltas:
+        return
+    buckets = [bucket for bucket, _, _ in deltas]
+    contact_ids = sorted({contact_id for _, contact_id, _ in deltas})
+    existing = {}
+    for start in range(0, len(contact_ids), chunk_size):
+        for bucket, contact_id, interaction_type, *counts in model.objects.filter(
+            bucket_start__gte=min(buckets), bucket_start__lte=max(buckets),
+            contact_id__in=contact_ids[start:start + chunk_size],
+        ).values_list('bucket_start', 'contact_id', 'interaction_type', *COUNT_FIELDS):
+            existing[(bucket, contact_id, interaction_type)] = counts
+
+    rows = []
+    for (bucket, contact_id, interaction_type), delta in deltas.items():
+        fields = delta._asdict()
+        for field, count in zip(COUNT_FIELDS, existing.get((bucket, contact_id, interaction_type), ())):
+            fields[field] += count
+        rows.append(model(bucket_start=bucket, contact_id=contact_id, interaction_type=interaction_type, **fields))
+    # The totals are final (the caller holds the watermark lock), so one
+    # upsert writes new and existing buckets alike
+    model.objects.bulk_create(
+        rows, batch_size=chunk_size, update_conflicts=True,
+        unique_fields=['bucket_start', 'contact', 'interaction_type'], update_fields=COUNT_FIELDS,
+    )
+
+
+def _fold(interactions):
+    """Add `interactions` to both rollups. Returns how many were counted."""
+    hourly = _hourly_deltas(interactions)
+    _apply(HourlyInteractionRollup, hourly)
+    _apply(DailyInteractionRollup, _daily_deltas(hourly))
+    return sum(delta.interaction_count for delta in hourly.values())
+
+
+def get_watermark():
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    return watermark
+
+
+def roll_up_interactions(batch_size=ROLLUP_BATCH_SIZE, settle_seconds=SETTLE_SECONDS):
+    """Fold settled interactions newer than the watermark into the rollups. Returns rows folded."""
+    get_watermark()
+    with transaction.atomic():
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+        latest = ContactInteraction.objects.aggregate(last=Max('interaction_id'))['last'] or 0
+        target = watermark.settled_id(latest, settle_seconds)
+        watermark.save(update_fields=['seen_id', 'seen_at'])
+    folded = 0
+    while True:
+        with transaction.atomic():
+            # The row lock makes concurrent runs take turns, batch by batch
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            if watermark.last_id >= target:
+                return folded
+            upper = min(watermark.last_id + batch_size, target)
+            folded += _fold(ContactInteraction.objects.filter(
+                interaction_id__gt=watermark.last_id, interaction_id__lte=upper,
+            ))
+            watermark.last_id = upper
+            watermark.save(update_fields=['last_id', 'updated_at'])
+
+
+def rebuild_rollups(since, batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Recount every bucket from the day of `since` onward from the raw rows.
+    Raises ValueError if raw rows in that range have been pruned.
+    """
+    since = start_of_day(since)
+    with transaction.atomic():
+        watermark = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)[0]
+        if watermark.pruned_before and since < watermark.pruned_before:
+            raise ValueError(f'Raw interactions before {watermark.pruned_before:%Y-%m-%d} have been pruned')
+        HourlyInteractionRollup.objects.filter(bucket_start__gte=since).delete()
+        DailyInteractionRollup.objects.filter(bucket_start__gte=since).delete()
+        recent = ContactInteraction.objects.filter(created_at__gte=since, interaction_id__lte=watermark.last_id)
+        first = recent.aggregate(first=Min('interaction_id'))['first']
+        folded = 0
+        for start in range(first - 1, watermark.last_id, batch_size) if first else ():
+            folded += _fold(recent.filter(interaction_id__gt=start, interaction_id__lte=start + batch_size))
+        return folded
+
+
+def prune_raw_interactions(retention_days=RAW_RETENTION_DAYS, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Delete raw interactions from before the retention window that are
+    already in the rollups. Returns the number deleted.
+    """
+    cutoff = start_of_day(timezone.now() - timedelta(days=retention_days))
+    watermark = get_watermark()
+    expired = ContactInteraction.objects.filter(interaction_id__lte=watermark.last_id, created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(expired.order_by('interaction_id').values_list('interaction_id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += ContactInteraction.objects.filter(interaction_id__in=ids).delete()[0]
+    if watermark.pruned_before is None or watermark.pruned_before < cutoff:
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).update(pruned_before=cutoff)
+    return deleted
+
+
+def interaction_series(start, end, granularity='day', group_by=None, **filters):
+    """
+    Interaction counts per bucket in [start, end), from the rollups.
+
+    `granularity` is 'hour' or 'day'; `group_by` optionally splits every
+    bucket by one of GROUP_FIELDS. `filters` narrow the rows by any of
+    FILTER_FIELDS. Returns dicts with bucket_start, the group value (if
+    any), interactions, helpful and not_helpful, ordered by bucket.
+    Raises ValueError for arguments it cannot serve.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_FIELDS)}")
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    if end <= start:
+        raise ValueError('end must be after start')
+    if granularity == 'hour' and end - start > MAX_HOURLY_RANGE:
+        raise ValueError(f'Hourly series cover at most {MAX_HOURLY_RANGE.days} days')
+
+    group_fields = ['bucket_start'] + ([GROUP_FIELDS[group_by]] if group_by else [])
+    rows = (
+        GRANULARITIES[granularity].objects
+        .filter(bucket_start__gte=start, bucket_start__lt=end, **{
+            field: value for field, value in filters.items() if value is not None
+        })
+        .values(*group_fields)
+        .annotate(
+            interactions=Sum('interaction_count'),
+            helpful=Sum('helpful_count'),
+            not_helpful=Sum('not_helpful_count'),
+        )
+        .order_by(*group_fields)
+    )
+    return [
+        {
+            'bucket_start': row['bucket_start'],
+            **({group_by: row[GROUP_FIELDS[group_by]]} if group_by else {}),
+            'interactions': row['interactions'],
+            'helpful': row['helpful'],
+            'not_helpful': row['not_helpful'],
+        }
+        for row in rows
+    ]
+
+
+def rolled_up_at():
+    """When the rollups last took in new interactions, or None."""
+    return RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('updated_at', flat=True).first()
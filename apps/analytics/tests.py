@@ -1,3 +1,265 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.api.utils.data_export import AnalyticsExporter
+from apps.common.write_behind import WriteBehindQueue
+from apps.authentication.models import User
+from apps.facilities.models import Facility, FacilityContact
+from apps.geography.models import Constituency, County, Ward
+from apps.lookups.models import ContactType, OperationalStatus
+from apps.mobile_sessions.models import MobileAppUsage, MobileSession
+from apps.mobile_sessions.usage import write_feature_usage
+from .models import (
+    AuditTrail, ContactInteraction, DailyInteractionRollup, ExportWatermark, HourlyInteractionRollup,
+    RollupWatermark,
+)
+from .rollups import interaction_series, prune_raw_interactions, rebuild_rollups, roll_up_interactions
+
+BATCH_URL = '/mobile/analytics/events/batch/'
+
+
+def create_contact():
+    user = User.objects.create_user(
+        email='analytics@example.com', full_name='Analytics User',
+        phone_number='+254700000003', password='testpass123'
+    )
+    county = County.objects.create(county_name='Kisumu', county_code='042')
+    constituency = Constituency.objects.create(
+        constituency_name='Kisumu Central', constituency_code='042C', county=county
+    )
+    ward = Ward.objects.create(ward_name='Market Milimani', ward_code='042W', constituency=constituency)
+    facility = Facility.objects.create(
+        facility_name='Kisumu Rescue Centre', facility_code='KRC001',
+        operational_status=OperationalStatus.objects.create(status_name='Operational', sort_order=1),
+        ward=ward, created_by=user
+    )
+    phone = ContactType.objects.create(type_name='Phone')
+    return FacilityContact.objects.create(
+        facility=facility, contact_type=phone, contact_value='0700000000', created_by=user
+    )
+
+
+@override_settings(WRITE_BEHIND_ENABLED=False)
+class EventBatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contact = create_contact()
+        MobileSession.objects.create(device_id='analytics-device')
+
+    def post(self, events):
+        return self.client.post(
+            BATCH_URL, {'device_id': 'analytics-device', 'events': events}, content_type='application/json'
+        )
+
+    def test_batch_stored_with_status_per_event(self):
+        events = [
+            {'client_event_id': 'e1', 'contact_id': self.contact.pk, 'type': 'call',
+             'occurred_at': '2024-05-01T10:00:00Z'},
+            {'client_event_id': 'e2', 'contact_id': 999999},
+            {'client_event_id': 'e3', 'contact_id': 'not-a-number'},
+            {'client_event_id': 'e4', 'contact_id': self.contact.pk, 'data': {'duration': 30}},
+        ]
+        # Session lookup, contact validation and one insert (in a savepoint)
+        with self.assertNumQueries(5):
+            response = self.post(events)
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body['accepted'], body['rejected']), (2, 2))
+        self.assertEqual(
+            [result['status'] for result in body['results']],
+            ['accepted', 'rejected', 'rejected', 'accepted']
+        )
+        interactions = ContactInteraction.objects.order_by('created_at')
+        self.assertEqual([i.interaction_type for i in interactions], ['call', 'click'])
+        self.assertEqual(interactions[0].created_at.isoformat(), '2024-05-01T10:00:00+00:00')
+        self.assertEqual(interactions[1].click_data, {'duration': 30})
+
+    def test_resent_events_are_not_counted_twice(self):
+        events = [{'client_event_id': 'e1', 'contact_id': self.contact.pk}]
+        self.assertEqual(self.post(events).json()['accepted'], 1)
+        self.assertEqual(self.post(events).json()['duplicates'], 1)
+        self.assertEqual(ContactInteraction.objects.count(), 1)
+
+    def test_event_whose_insert_failed_is_accepted_again(self):
+        events = [{'client_event_id': 'e1', 'contact_id': self.contact.pk}]
+        with mock.patch.object(ContactInteraction.objects, 'bulk_create', side_effect=DatabaseError):
+            self.post(events)
+        self.assertEqual(self.post(events).json()['accepted'], 1)
+        self.assertEqual(ContactInteraction.objects.count(), 1)
+
+    def test_oversized_batch_is_refused(self):
+        response = self.post([{'contact_id': self.contact.pk}] * 501)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ContactInteraction.objects.count(), 0)
+
+
+@override_settings(WRITE_BEHIND_ENABLED=True)
+class WriteBehindQueueTest(TestCase):
+    def audit_row(self, record_id):
+        return AuditTrail(table_name='facilities', record_id=record_id, action_type='READ', event_category='ACCESS')
+
+    def test_queued_rows_written_in_one_batch(self):
+        queue = WriteBehindQueue(batch_size=100, autostart=False)
+        for record_id in range(5):
+            self.assertTrue(queue.enqueue(self.audit_row(record_id)))
+        self.assertEqual(AuditTrail.objects.count(), 0)
+        # One insert, in a savepoint inside the test's transaction
+        with self.assertNumQueries(3):
+            self.assertEqual(queue.flush(), 5)
+        stats = queue.stats()
+        self.assertEqual((stats['depth'], stats['written'], stats['flushes']), (0, 5, 1))
+
+    def test_full_queue_drops_and_counts(self):
+        queue = WriteBehindQueue(max_size=2, block_seconds=0.01, autostart=False)
+        self.assertEqual(queue.enqueue_many(self.audit_row(record_id) for record_id in range(4)), 2)
+        stats = queue.stats()
+        self.assertEqual((stats['depth'], stats['blocked'], stats['dropped']), (2, 1, 2))
+
+    def test_bad_row_does_not_sink_its_batch(self):
+        queue = WriteBehindQueue(autostart=False)
+        rows = [self.audit_row(1), self.audit_row(None), self.audit_row(3)]
+        with self.assertLogs('apps.common.write_behind', 'ERROR'):
+            self.assertEqual(queue.write(rows), 2)
+        self.assertEqual(sorted(AuditTrail.objects.values_list('record_id', flat=True)), [1, 3])
+        stats = queue.stats()
+        self.assertEqual((stats['written'], stats['retried'], stats['failed']), (2, 3, 1))
+
+    def test_feature_usage_merged_into_counters(self):
+        MobileSession.objects.create(device_id='usage-device')
+        MobileAppUsage.objects.create(session_id='usage-device', feature_name='sos', usage_count=3)
+        write_feature_usage([
+            MobileAppUsage(session_id='usage-device', feature_name='sos'),
+            MobileAppUsage(session_id='usage-device', feature_name='sos'),
+            MobileAppUsage(session_id='usage-device', feature_name='music'),
+        ])
+        counts = dict(MobileAppUsage.objects.values_list('feature_name', 'usage_count'))
+        self.assertEqual(counts, {'sos': 5, 'music': 1})
+
+
+class InteractionRollupTest(TestCase):
+    def setUp(self):
+        self.contact = create_contact()
+
+    def interact(self, when, interaction_type='call', is_helpful=None):
+        ContactInteraction.objects.create(
+            contact=self.contact, interaction_type=interaction_type, is_helpful=is_helpful,
+            created_at=datetime.fromisoformat(when)
+        )
+
+    def test_new_interactions_added_to_existing_buckets(self):
+        self.interact('2024-05-01T10:05:00+00:00', is_helpful=True)
+        self.interact('2024-05-01T10:55:00+00:00')
+        self.interact('2024-05-01T14:00:00+00:00', 'sms')
+        self.assertEqual(roll_up_interactions(), 3)
+        # An offline tap arriving late, and nothing new the second time
+        self.interact('2024-05-01T10:30:00+00:00', is_helpful=False)
+        self.assertEqual(roll_up_interactions(batch_size=1), 1)
+        self.assertEqual(roll_up_interactions(), 0)
+
+        hour = HourlyInteractionRollup.objects.get(bucket_start=datetime.fromisoformat('2024-05-01T10:00:00+00:00'))
+        self.assertEqual((hour.interaction_count, hour.helpful_count, hour.not_helpful_count), (3, 1, 1))
+        self.assertEqual(hour.facility_id, self.contact.facility_id)
+        self.assertEqual(hour.county_id, self.contact.facility.ward.constituency.county_id)
+        daily = dict(DailyInteractionRollup.objects.values_list('interaction_type', 'interaction_count'))
+        self.assertEqual(daily, {'call': 3, 'sms': 1})
+
+    def test_rollup_waits_for_ids_to_settle(self):
+        self.interact('2024-05-01T10:05:00+00:00')
+        # The first run only notes the newest id; a run soon after waits
+        self.assertEqual(roll_up_interactions(settle_seconds=60), 0)
+        self.assertEqual(roll_up_interactions(settle_seconds=60), 0)
+        RollupWatermark.objects.update(seen_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(roll_up_interactions(settle_seconds=60), 1)
+
+    def test_series_from_rollups(self):
+        self.interact('2024-05-01T10:05:00+00:00')
+        self.interact('2024-05-02T09:00:00+00:00', 'sms')
+        self.interact('2024-05-02T11:00:00+00:00')
+        roll_up_interactions()
+        start = datetime.fromisoformat('2024-05-01T00:00:00+00:00')
+        with self.assertNumQueries(1):
+            series = interaction_series(start, start + timedelta(days=2), group_by='interaction_type')
+        self.assertEqual(
+            [(row['bucket_start'].day, row['interaction_type'], row['interactions']) for row in series],
+            [(1, 'call', 1), (2, 'call', 1), (2, 'sms', 1)]
+        )
+        with self.assertRaises(ValueError):
+            interaction_series(start, start + timedelta(days=60), granularity='hour')
+
+    def test_summary_rejects_dates_at_the_calendar_edges(self):
+        self.client.force_login(self.contact.created_by)
+        url = '/api/analytics/contact-interaction/summary/'
+        for query in ('end=9999-12-31', 'end=0001-01-01', 'end=0001-01-01&granularity=hour'):
+            self.assertEqual(self.client.get(f'{url}?{query}').status_code, 400, query)
+        response = self.client.get(f'{url}?start=2024-05-01&end=2024-05-02')
+        self.assertEqual(response.status_code, 200)
+
+    def test_prune_keeps_rows_not_yet_rolled_up(self):
+        self.interact('2020-01-01T10:00:00+00:00')
+        roll_up_interactions()
+        self.interact('2020-01-01T11:00:00+00:00')
+        self.assertEqual(prune_raw_interactions(retention_days=30), 1)
+        self.assertEqual(ContactInteraction.objects.count(), 1)
+        self.assertEqual(DailyInteractionRollup.objects.get().interaction_count, 1)
+        with self.assertRaises(ValueError):
+            rebuild_rollups(datetime.fromisoformat('2020-01-01T00:00:00+00:00'))
+
+
+class AnalyticsExportTest(TestCase):
+    def setUp(self):
+        self.contact = create_contact()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.exporter = AnalyticsExporter(storage_type='local')
+
+    def interact(self, **fields):
+        return ContactInteraction.objects.create(contact=self.contact, **fields)
+
+    def read(self, path):
+        with gzip.open(path, 'rt', newline='') as f:
+            return f.read()
+
+    def test_csv_export_quotes_values(self):
+        self.interact(interaction_type='call', click_data={'note': 'said "thanks", hung up'})
+        path = self.exporter.export_queryset_csv(ContactInteraction.objects.order_by('pk'), 'interactions')
+        self.assertTrue(path.endswith('.csv.gz'))
+        header, row = list(csv.reader(self.read(path).splitlines()))
+        record = dict(zip(header, row))
+        self.assertEqual(record['interaction_type'], 'call')
+        self.assertEqual(json.loads(record['click_data']), {'note': 'said "thanks", hung up'})
+        self.assertEqual(record['is_helpful'], '')
+
+    def test_json_export_keeps_document_layout(self):
+        self.interact()
+        self.interact()
+        path = self.exporter.export_queryset_json(ContactInteraction.objects.all(), 'interactions', {'export_type': 'test'})
+        document = json.loads(self.read(path))
+        self.assertEqual(document['record_count'], 2)
+        self.assertEqual(document['metadata'], {'export_type': 'test'})
+        self.assertEqual(len(document['data']), 2)
+
+    def test_incremental_export_from_watermark(self):
+        self.interact()
+        self.interact()
+        path = self.exporter.export_new_contact_interactions()
+        self.assertEqual(len(self.read(path).splitlines()), 2)
+        self.assertIsNone(self.exporter.export_new_contact_interactions())
+
+        latest = self.interact()
+        path = self.exporter.export_new_contact_interactions()
+        lines = [json.loads(line) for line in self.read(path).splitlines()]
+        self.assertEqual([line['interaction_id'] for line in lines], [latest.pk])
+        watermark = ExportWatermark.objects.get(name='contact_interactions')
+        self.assertEqual((watermark.last_id, watermark.last_key), (latest.pk, path))
@@ -263,11 +263,10 @@ class FacilityListSerializer(serializers.ModelSerializer):
     
     def get_coordinates(self, obj):
         """Get facility coordinates if available"""
-        coords = obj.facilitycoordinate_set.filter(is_active=True).first()
-        if coords and coords.latitude and coords.longitude:
+        if obj.has_coordinates:
             return {
-                'latitude': float(coords.latitude),
-                'longitude': float(coords.longitude)
+                'latitude': float(obj.primary_latitude),
+                'longitude': float(obj.primary_longitude)
             }
         return None
     
@@ -338,11 +337,10 @@ class FacilityMapSerializer(serializers.ModelSerializer):
     
     def get_coordinates(self, obj):
         """Get facility coordinates for map display"""
-        coords = obj.facilitycoordinate_set.filter(is_active=True).first()
-        if coords and coords.latitude and coords.longitude:
+        if obj.has_coordinates:
             return {
-                'latitude': float(coords.latitude),
-                'longitude': float(coords.longitude)
+                'latitude': float(obj.primary_latitude),
+                'longitude': float(obj.primary_longitude)
             }
         return None
 
@@ -490,10 +488,9 @@ class MobileAppFacilityListSerializer(serializers.ModelSerializer):
     constituency_name = serializers.CharField(source='ward.constituency.constituency_name', read_only=True)
     ward_name = serializers.CharField(source='ward.ward_name', read_only=True)
     status_name = serializers.CharField(source='operational_status.status_name', read_only=True)
-    latitude = serializers.SerializerMethodField()
-    longitude = serializers.SerializerMethodField()
-    service_count = serializers.SerializerMethodField()
-    contact_count = serializers.SerializerMethodField()
+    # Denormalized columns on Facility, so the list needs no child queries
+    latitude = serializers.FloatField(source='primary_latitude', read_only=True)
+    longitude = serializers.FloatField(source='primary_longitude', read_only=True)
     
     class Meta:
         model = Facility
@@ -503,42 +500,6 @@ class MobileAppFacilityListSerializer(serializers.ModelSerializer):
             'latitude', 'longitude', 'service_count', 'contact_count',
             'address_line_1', 'is_active'
         ]
-    
-    def get_latitude(self, obj):
-        """Get latitude from first active coordinate"""
-        coord = getattr(obj, '_prefetched_coord', None)
-        if coord:
-            return float(coord.latitude)
-        # Fallback if not prefetched
-        coord = obj.facilitycoordinate_set.filter(
-            is_active=True, latitude__isnull=False
-        ).first()
-        return float(coord.latitude) if coord else None
-    
-    def get_longitude(self, obj):
-        """Get longitude from first active coordinate"""
-        coord = getattr(obj, '_prefetched_coord', None)
-        if coord:
-            return float(coord.longitude)
-        # Fallback if not prefetched
-        coord = obj.facilitycoordinate_set.filter(
-            is_active=True, longitude__isnull=False
-        ).first()
-        return float(coord.longitude) if coord else None
-    
-    def get_service_count(self, obj):
-        """Get count of active services"""
-        services = getattr(obj, '_prefetched_services', None)
-        if services is not None:
-            return len([s for s in services if s.is_active])
-        return obj.facilityservice_set.filter(is_active=True).count()
-    
-    def get_contact_count(self, obj):
-        """Get count of active contacts"""
-        contacts = getattr(obj, '_prefetched_contacts', None)
-        if contacts is not None:
-            return len([c for c in contacts if c.is_active])
-        return obj.facilitycontact_set.filter(is_active=True).count()
 
 
 class MobileFacilityMapSerializer(serializers.ModelSerializer):
@@ -551,23 +512,10 @@ class MobileFacilityMapSerializer(serializers.ModelSerializer):
     
     def get_coordinates(self, obj):
         """Get facility coordinates for map display"""
-        # Try prefetched coordinate first
-        coord = getattr(obj, '_prefetched_map_coord', None)
-        if coord:
-            return {
-                'latitude': float(coord.latitude),
-                'longitude': float(coord.longitude)
-            }
-        # Fallback to query
-        coord = obj.facilitycoordinate_set.filter(
-            is_active=True,
-            latitude__isnull=False,
-            longitude__isnull=False
-        ).first()
-        if coord:
+        if obj.has_coordinates:
             return {
-                'latitude': float(coord.latitude),
-                'longitude': float(coord.longitude)
+                'latitude': float(obj.primary_latitude),
+                'longitude': float(obj.primary_longitude)
             }
         return None
 
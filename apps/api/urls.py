@@ -11,7 +11,7 @@ from .views import (
     # Specialized GBV endpoints
     EmergencyServicesView, GBVServicesView, ReferralChainView,
     # Analytics endpoints
-    ContactInteractionAnalyticsView, ReferralOutcomeView,
+    ContactInteractionAnalyticsView, ContactInteractionSummaryView, ReferralOutcomeView,
     # Statistics and lookup data
     StatisticsView, LookupDataView,
     # Geography endpoints
@@ -40,6 +40,7 @@ urlpatterns = [
     
     # Analytics and tracking endpoints
     path('analytics/contact-interaction/', ContactInteractionAnalyticsView.as_view(), name='contact-interaction'),
+    path('analytics/contact-interaction/summary/', ContactInteractionSummaryView.as_view(), name='contact-interaction-summary'),
     path('analytics/referral-outcome/', ReferralOutcomeView.as_view(), name='referral-outcome'),
     
     # Authentication endpoints
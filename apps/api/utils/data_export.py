@@ -2,15 +2,23 @@
 """
 Analytics Data Export Utilities for Object Storage
 Exports large datasets to S3, Azure Blob Storage, or Google Cloud Storage
+
+Exports are streamed: rows are read from the database in chunks, encoded as
+NDJSON, CSV or JSON, gzipped and uploaded in parts (multipart upload on S3,
+staged blocks on Azure, a resumable upload on GCS, a temporary file
+locally), so memory use stays flat however many rows are exported.
 """
 
-import json
+import base64
 import csv
+import gzip
+import io
+import json
 import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from django.conf import settings
-from django.db.models import QuerySet
+from django.db.models import Max, QuerySet
 from django.utils import timezone
 import logging
 
@@ -25,7 +33,7 @@ except ImportError:
     S3_AVAILABLE = False
 
 try:
-    from azure.storage.blob import BlobServiceClient
+    from azure.storage.blob import BlobBlock, BlobServiceClient, ContentSettings
     AZURE_AVAILABLE = True
 except ImportError:
     AZURE_AVAILABLE = False
@@ -37,6 +45,223 @@ except ImportError:
     GCS_AVAILABLE = False
 
 
+# Rows fetched from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+# Bytes per uploaded part; S3 needs at least 5 MiB for all but the last
+EXPORT_PART_SIZE = 8 * 1024 * 1024
+# Text handed to gzip at a time
+EXPORT_WRITE_SIZE = 64 * 1024
+EXPORT_COMPRESS_LEVEL = 6
+EXPORT_CONTENT_TYPE = 'application/gzip'
+# Incremental exports stop at ids seen this long ago (see IdWatermark)
+EXPORT_SETTLE_SECONDS = getattr(settings, 'ANALYTICS_SETTLE_SECONDS', 60)
+
+
+class _CountedRows:
+    """Iterator over exported rows that counts them as they pass"""
+    
+    def __init__(self, rows):
+        self._rows = rows
+        self.count = 0
+    
+    def __iter__(self):
+        for row in self._rows:
+            self.count += 1
+            yield row
+
+
+def _ndjson_lines(rows, fields, additional_data):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), default=str) + '\n'
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _csv_lines(rows, fields, additional_data):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_document(rows, fields, additional_data):
+    """The former single-document layout, written a row at a time"""
+    yield '{"exported_at": %s' % json.dumps(timezone.now().isoformat())
+    if additional_data:
+        yield ', "metadata": %s' % json.dumps(additional_data, default=str)
+    yield ', "data": ['
+    separator = '\n'
+    for row in rows:
+        yield separator + json.dumps(dict(zip(fields, row)), default=str)
+        separator = ',\n'
+    # Known only at the end; key order does not matter to JSON readers
+    yield '\n], "record_count": %d}\n' % rows.count
+
+
+EXPORT_FORMATS = {
+    'ndjson': _ndjson_lines,
+    'csv': _csv_lines,
+    'json': _json_document,
+}
+
+
+def _buffered(pieces, size=EXPORT_WRITE_SIZE):
+    """Join small strings into chunks of about `size` characters"""
+    chunk, length = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _PartWriter:
+    """Write-only file object that hands what it receives to an upload in fixed-size parts"""
+    
+    def __init__(self, upload, part_size: int):
+        self.upload = upload
+        self.part_size = part_size
+        self._buffer = bytearray()
+    
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self.upload.write_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def complete(self) -> str:
+        """Upload the last part and finish the upload; returns its location"""
+        if self._buffer:
+            self.upload.write_part(bytes(self._buffer))
+            self._buffer.clear()
+        return self.upload.complete()
+
+
+class _LocalUpload:
+    """Local filesystem stand-in for a multipart upload"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name so readers never see half a file
+        self._partial_path = f'{path}.part'
+        self._file = open(self._partial_path, 'wb')
+    
+    def write_part(self, data: bytes):
+        self._file.write(data)
+    
+    def complete(self) -> str:
+        self._file.close()
+        os.replace(self._partial_path, self.path)
+        logger.info(f"Export saved locally: {self.path}")
+        return self.path
+    
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+class _S3Upload:
+    """S3 multipart upload"""
+    
+    def __init__(self, client, bucket_name: str, key: str):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.parts = []
+        self.upload_id = client.create_multipart_upload(
+            Bucket=bucket_name, Key=key, ContentType=EXPORT_CONTENT_TYPE
+        )['UploadId']
+    
+    def write_part(self, data: bytes):
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=data
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+    
+    def complete(self) -> str:
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        return self.key
+    
+    def abort(self):
+        # Uploaded parts are billed until the upload is aborted
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort S3 upload of {self.key}: {e}")
+
+
+class _AzureUpload:
+    """Azure block blob written as staged blocks"""
+    
+    def __init__(self, client, container_name: str, key: str):
+        self.key = key
+        self.blob_client = client.get_blob_client(container=container_name, blob=key)
+        self.block_ids = []
+    
+    def write_part(self, data: bytes):
+        # Block IDs must all have the same length
+        block_id = base64.b64encode(f'{len(self.block_ids):08d}'.encode()).decode()
+        self.blob_client.stage_block(block_id, data)
+        self.block_ids.append(block_id)
+    
+    def complete(self) -> str:
+        self.blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in self.block_ids],
+            content_settings=ContentSettings(content_type=EXPORT_CONTENT_TYPE)
+        )
+        return self.key
+    
+    def abort(self):
+        # Uncommitted blocks are discarded by Azure after a week
+        pass
+
+
+class _GCSUpload:
+    """Google Cloud Storage resumable upload"""
+    
+    def __init__(self, client, bucket_name: str, key: str):
+        self.key = key
+        blob = client.bucket(bucket_name).blob(key)
+        self._writer = blob.open('wb', chunk_size=EXPORT_PART_SIZE, content_type=EXPORT_CONTENT_TYPE)
+    
+    def write_part(self, data: bytes):
+        self._writer.write(data)
+    
+    def complete(self) -> str:
+        self._writer.close()
+        return self.key
+    
+    def abort(self):
+        # Closing would publish the partial object; an abandoned resumable
+        # upload expires on its own
+        pass
+
+
 class AnalyticsExporter:
     """
     Export analytics data to object storage.
@@ -125,7 +350,7 @@ class AnalyticsExporter:
     def export_queryset_json(self, queryset: QuerySet, export_name: str, 
                             additional_data: Optional[Dict] = None) -> Optional[str]:
         """
-        Export queryset to JSON in object storage.
+        Export queryset to gzipped JSON in object storage.
         
         Args:
             queryset: Django QuerySet to export
@@ -135,52 +360,11 @@ class AnalyticsExporter:
         Returns:
             Export key/path in object storage, or None if failed
         """
-        try:
-            # Convert queryset to list of dicts
-            data = list(queryset.values())
-            
-            # Add metadata
-            export_data = {
-                'exported_at': timezone.now().isoformat(),
-                'record_count': len(data),
-                'data': data
-            }
-            
-            if additional_data:
-                export_data['metadata'] = additional_data
-            
-            # Generate export key
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            export_key = f'exports/{export_name}_{timestamp}.json'
-            
-            # Export to object storage
-            json_data = json.dumps(export_data, default=str, indent=2)
-            
-            if self.enabled:
-                if self.storage_type == 's3':
-                    self._upload_s3(export_key, json_data)
-                elif self.storage_type == 'azure':
-                    self._upload_azure(export_key, json_data)
-                elif self.storage_type == 'gcs':
-                    self._upload_gcs(export_key, json_data)
-            else:
-                # Fallback: save locally
-                local_path = os.path.join(settings.MEDIA_ROOT, 'exports', f'{export_name}_{timestamp}.json')
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                with open(local_path, 'w') as f:
-                    f.write(json_data)
-                logger.info(f"Export saved locally: {local_path}")
-                return local_path
-            
-            logger.info(f"Export successful: {export_key}")
-            return export_key
-        except Exception as e:
-            logger.error(f"Export failed: {e}")
-            return None
+        return self.export_queryset_stream(queryset, export_name, 'json', additional_data=additional_data)
     
     def export_queryset_csv(self, queryset: QuerySet, export_name: str) -> Optional[str]:
         """
-        Export queryset to CSV in object storage.
+        Export queryset to gzipped CSV in object storage.
         
         Args:
             queryset: Django QuerySet to export
@@ -189,80 +373,111 @@ class AnalyticsExporter:
         Returns:
             Export key/path in object storage, or None if failed
         """
+        return self.export_queryset_stream(queryset, export_name, 'csv')
+    
+    def export_queryset_stream(self, queryset: QuerySet, export_name: str, export_format: str = 'ndjson',
+                               fields: Optional[List[str]] = None, additional_data: Optional[Dict] = None,
+                               chunk_size: int = EXPORT_CHUNK_SIZE) -> Optional[str]:
+        """
+        Stream a queryset into a gzipped file in object storage.
+        
+        Rows are read chunk_size at a time, encoded, compressed and uploaded
+        in EXPORT_PART_SIZE parts as they come, so memory use does not grow
+        with the number of rows.
+        
+        Args:
+            queryset: Django QuerySet to export
+            export_name: Name for the export (used in file path)
+            export_format: 'ndjson' (one JSON object per line), 'csv' or 'json'
+            fields: Fields to export (default: all concrete fields)
+            additional_data: Metadata for the 'json' format
+            chunk_size: Rows fetched from the database at a time
+        
+        Returns:
+            Export key/path in object storage, or None if failed
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"export_format must be one of: {', '.join(EXPORT_FORMATS)}")
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        export_key = f'exports/{export_name}_{timestamp}.{export_format}.gz'
+        fields = fields or [field.attname for field in queryset.model._meta.concrete_fields]
+        rows = _CountedRows(queryset.values_list(*fields).iterator(chunk_size=chunk_size))
+        
+        upload = None
         try:
-            # Convert queryset to list of dicts
-            data = list(queryset.values())
-            
-            if not data:
-                logger.warning("No data to export")
-                return None
-            
-            # Generate CSV
-            fieldnames = data[0].keys()
-            csv_data = []
-            csv_data.append(','.join(fieldnames))
-            
-            for row in data:
-                csv_data.append(','.join(str(value) for value in row.values()))
-            
-            csv_content = '\n'.join(csv_data)
-            
-            # Generate export key
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            export_key = f'exports/{export_name}_{timestamp}.csv'
-            
-            # Export to object storage
-            if self.enabled:
-                if self.storage_type == 's3':
-                    self._upload_s3(export_key, csv_content, content_type='text/csv')
-                elif self.storage_type == 'azure':
-                    self._upload_azure(export_key, csv_content, content_type='text/csv')
-                elif self.storage_type == 'gcs':
-                    self._upload_gcs(export_key, csv_content, content_type='text/csv')
-            else:
-                # Fallback: save locally
-                local_path = os.path.join(settings.MEDIA_ROOT, 'exports', f'{export_name}_{timestamp}.csv')
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                with open(local_path, 'w') as f:
-                    f.write(csv_content)
-                logger.info(f"Export saved locally: {local_path}")
-                return local_path
-            
-            logger.info(f"Export successful: {export_key}")
-            return export_key
+            upload = self._open_upload(export_key)
+            parts = _PartWriter(upload, EXPORT_PART_SIZE)
+            with gzip.GzipFile(fileobj=parts, mode='wb', compresslevel=EXPORT_COMPRESS_LEVEL) as compressed:
+                for text in _buffered(EXPORT_FORMATS[export_format](rows, fields, additional_data)):
+                    compressed.write(text.encode('utf-8'))
+            location = parts.complete()
         except Exception as e:
             logger.error(f"Export failed: {e}")
+            if upload is not None:
+                upload.abort()
             return None
+        
+        logger.info(f"Export successful: {location} ({rows.count} records)")
+        return location
     
-    def _upload_s3(self, key: str, content: str, content_type: str = 'application/json'):
-        """Upload to S3"""
-        self.client.put_object(
-            Bucket=self.bucket_name,
-            Key=key,
-            Body=content.encode('utf-8'),
-            ContentType=content_type
-        )
-    
-    def _upload_azure(self, key: str, content: str, content_type: str = 'application/json'):
-        """Upload to Azure Blob Storage"""
-        blob_client = self.client.get_blob_client(
-            container=self.bucket_name,
-            blob=key
-        )
-        blob_client.upload_blob(
-            content.encode('utf-8'),
-            overwrite=True,
-            content_settings={'content_type': content_type}
+    def export_incremental(self, queryset: QuerySet, export_name: str, export_format: str = 'ndjson',
+                           fields: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Export the rows added since the previous incremental export.
+        
+        The last exported primary key is kept per export_name in
+        ExportWatermark and only advanced once the file is uploaded, so a
+        failed export is simply repeated by the next run. Only ids seen by
+        an earlier run at least EXPORT_SETTLE_SECONDS before are exported,
+        so rows still being committed below them are not skipped. Run one
+        export per name at a time. The queryset's model needs an integer
+        primary key.
+        
+        Args:
+            queryset: Django QuerySet to export
+            export_name: Name for the export and its watermark
+            export_format: 'ndjson', 'csv' or 'json'
+            fields: Fields to export (default: all concrete fields)
+        
+        Returns:
+            Export key/path in object storage, or None if failed or nothing new
+        """
+        from apps.analytics.models import ExportWatermark
+        
+        watermark, _ = ExportWatermark.objects.get_or_create(name=export_name)
+        # Bound the range now so rows added during the upload wait for the next run
+        latest = queryset.aggregate(last=Max('pk'))['last'] or 0
+        upper = watermark.settled_id(latest, EXPORT_SETTLE_SECONDS)
+        watermark.save(update_fields=['seen_id', 'seen_at'])
+        if upper <= watermark.last_id:
+            logger.info(f"Nothing new to export for {export_name}")
+            return None
+        
+        export_key = self.export_queryset_stream(
+            queryset.filter(pk__gt=watermark.last_id, pk__lte=upper).order_by('pk'),
+            f'{export_name}_{watermark.last_id + 1}-{upper}',
+            export_format,
+            fields=fields,
+            additional_data={'export_type': export_name, 'first_id': watermark.last_id + 1, 'last_id': upper},
         )
+        if export_key:
+            watermark.last_id = upper
+            watermark.last_key = export_key
+            watermark.save(update_fields=['last_id', 'last_key', 'updated_at'])
+        return export_key
     
-    def _upload_gcs(self, key: str, content: str, content_type: str = 'application/json'):
-        """Upload to Google Cloud Storage"""
-        bucket = self.client.bucket(self.bucket_name)
-        blob = bucket.blob(key)
-        blob.upload_from_string(
-            content,
-            content_type=content_type
-        )
+    def _open_upload(self, key: str):
+        """Start a multipart upload of `key` to the configured storage"""
+        if self.enabled:
+            if self.storage_type == 's3':
+                return _S3Upload(self.client, self.bucket_name, key)
+            elif self.storage_type == 'azure':
+                return _AzureUpload(self.client, self.bucket_name, key)
+            elif self.storage_type == 'gcs':
+                return _GCSUpload(self.client, self.bucket_name, key)
+        # Fallback: save locally
+        return _LocalUpload(os.path.join(settings.MEDIA_ROOT, key))
     
     def export_contact_interactions(self, start_date: datetime, end_date: datetime) -> Optional[str]:
         """
@@ -291,6 +506,20 @@ class AnalyticsExporter:
             }
         )
     
+    def export_new_contact_interactions(self, export_format: str = 'ndjson') -> Optional[str]:
+        """
+        Export the contact interactions recorded since the previous call.
+        
+        Args:
+            export_format: 'ndjson', 'csv' or 'json'
+        
+        Returns:
+            Export key/path, or None if failed or nothing new
+        """
+        from apps.analytics.models import ContactInteraction
+        
+        return self.export_incremental(ContactInteraction.objects.all(), 'contact_interactions', export_format)
+    
     def export_referral_outcomes(self, start_date: datetime, end_date: datetime) -> Optional[str]:
         """
         Export referral outcomes to object storage.
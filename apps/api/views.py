@@ -8,10 +8,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny, BasePermission
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Count, Prefetch
+from django.db.models import Count, Prefetch
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils.cache import get_conditional_response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -32,8 +32,17 @@ from apps.facilities.models import (
     Facility, FacilityContact, FacilityService, 
     FacilityOwner, FacilityCoordinate, FacilityGBVCategory
 )
+from apps.common.cache_utils import (
+    REFERENCE_VERSION_KEY, get_reference_version, get_version_modified, reference_data,
+)
+from apps.common.conditional import accepts_gzip, conditional_get
+from apps.facilities.cache_utils import cached_facility_data
+from apps.facilities.geo import facilities_within
+from apps.facilities.search import search_facilities
+from apps.facilities.spatial_index import get_spatial_index
 from apps.authentication.models import User, UserSession, CustomToken
 from apps.geography.models import County, Constituency, Ward
+from apps.geography.tree import get_geography_tree
 from apps.lookups.models import (
     OperationalStatus, ContactType, ServiceCategory, 
     OwnerType, GBVCategory, InfrastructureType, ConditionStatus, DocumentType
@@ -67,16 +76,15 @@ class MobileSessionPermission(BasePermission):
             return False
         
         # Check if mobile session exists and is active
-        from apps.mobile_sessions.models import MobileSession
+        from apps.mobile_sessions.resolver import resolve_session
         
-        try:
-            session = MobileSession.objects.get(device_id=device_id, is_active=True)
-            # Store session in request for use in views
-            request.mobile_session = session
-            return True
-        except MobileSession.DoesNotExist:
+        session = resolve_session(device_id, request)
+        if session is None:
             self.message = f"Mobile session not found or inactive for device_id: {device_id}. Please create a valid session first."
             return False
+        # Store session in request for use in views
+        request.mobile_session = session
+        return True
 
 
 class CustomPagination(PageNumberPagination):
@@ -129,11 +137,6 @@ class FacilityListView(generics.ListAPIView):
             'ward__constituency__county',
             'operational_status'
         ).prefetch_related(
-            Prefetch(
-                'facilitycoordinate',
-                queryset=FacilityCoordinate.objects.filter(),
-                to_attr='active_coordinates'
-            ),
             Prefetch(
                 'facilityservice_set',
                 queryset=FacilityService.objects.filter(is_active=True).select_related('service_category'),
@@ -169,8 +172,7 @@ class FacilityListView(generics.ListAPIView):
 
         has_coordinates = self.request.query_params.get('has_coordinates')
         if has_coordinates == 'true':
-            queryset = queryset.filter(facilitycoordinate__latitude__isnull=False,
-                                     facilitycoordinate__longitude__isnull=False)
+            queryset = queryset.filter(has_coordinates=True)
 
         return queryset.distinct()
 
@@ -241,20 +243,9 @@ class FacilityMapView(generics.ListAPIView):
         queryset = Facility.objects.select_related(
             'ward__constituency__county',
             'operational_status'
-        ).prefetch_related(
-            Prefetch(
-                'facilitycoordinate',
-                queryset=FacilityCoordinate.objects.filter(
-                    latitude__isnull=False,
-                    longitude__isnull=False,
-                    is_active=True
-                ),
-                to_attr='valid_coordinates'
-            )
         ).filter(
             is_active=True,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False
+            has_coordinates=True
         )
 
         # Apply viewport filtering for performance
@@ -266,10 +257,10 @@ class FacilityMapView(generics.ListAPIView):
         
         if ne_lat and ne_lng and sw_lat and sw_lng:
             queryset = queryset.filter(
-                facilitycoordinate__latitude__gte=float(sw_lat),
-                facilitycoordinate__latitude__lte=float(ne_lat),
-                facilitycoordinate__longitude__gte=float(sw_lng),
-                facilitycoordinate__longitude__lte=float(ne_lng)
+                primary_latitude__gte=float(sw_lat),
+                primary_latitude__lte=float(ne_lat),
+                primary_longitude__gte=float(sw_lng),
+                primary_longitude__lte=float(ne_lng)
             )
 
         # Apply other filters
@@ -302,7 +293,8 @@ class FacilityMapView(generics.ListAPIView):
             # Local level - show all facilities in viewport
             queryset = queryset[:10000]
 
-        return queryset.distinct()
+        # One row per facility now that coordinates are not joined in
+        return queryset
 
 
 class FacilitySearchView(generics.ListAPIView):
@@ -345,15 +337,9 @@ class FacilitySearchView(generics.ListAPIView):
         service_category_id = self.request.data.get('service_category')
         has_coordinates = self.request.data.get('has_coordinates')
 
-        # Apply search query
+        # Apply search query (precomputed search document, ranked by relevance)
         if search_query:
-            queryset = queryset.filter(
-                Q(facility_name__icontains=search_query) |
-                Q(registration_number__icontains=search_query) |
-                Q(ward__ward_name__icontains=search_query) |
-                Q(ward__constituency__constituency_name__icontains=search_query) |
-                Q(ward__constituency__county__county_name__icontains=search_query)
-            )
+            queryset = search_facilities(queryset, search_query, rank=True)
 
         # Apply filters
         if county_id:
@@ -367,10 +353,7 @@ class FacilitySearchView(generics.ListAPIView):
         if service_category_id:
             queryset = queryset.filter(facilityservice_set__service_category_id=service_category_id)
         if has_coordinates:
-            queryset = queryset.filter(
-                facilitycoordinate__latitude__isnull=False,
-                facilitycoordinate__longitude__isnull=False
-            )
+            queryset = queryset.filter(has_coordinates=True)
 
         return queryset.distinct()
 
@@ -389,9 +372,15 @@ class StatisticsView(generics.GenericAPIView):
             401: 'Unauthorized',
         }
     )
-    @method_decorator(cache_page(300))  # Cache for 5 minutes
     def get(self, request):
         """Get comprehensive statistics"""
+        # Versioned cache: any facility or place edit retires the old numbers
+        statistics = cached_facility_data('api_statistics', 300, self.build_statistics)
+        serializer = StatisticsSerializer(statistics)
+        return Response(serializer.data)
+    
+    def build_statistics(self):
+        """Compute the statistics payload"""
         # Basic counts
         total_facilities = Facility.objects.filter(is_active=True).count()
         operational_facilities = Facility.objects.filter(
@@ -407,9 +396,8 @@ class StatisticsView(generics.GenericAPIView):
         # Facilities with coordinates
         facilities_with_coordinates = Facility.objects.filter(
             is_active=True,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False
-        ).distinct().count()
+            has_coordinates=True
+        ).count()
         
         # Facilities by operational status
         facilities_by_status = Facility.objects.filter(
@@ -437,9 +425,7 @@ class StatisticsView(generics.GenericAPIView):
             'facilities_by_status': {item['operational_status__status_name']: item['count'] for item in facilities_by_status},
             'facilities_by_county': list(facilities_by_county)
         }
-        
-        serializer = StatisticsSerializer(statistics)
-        return Response(serializer.data)
+        return statistics
 
 
 class LookupDataView(generics.GenericAPIView):
@@ -456,9 +442,15 @@ class LookupDataView(generics.GenericAPIView):
             401: 'Unauthorized',
         }
     )
-    @method_decorator(cache_page(600))  # Cache for 10 minutes
     def get(self, request):
         """Get all lookup data"""
+        # Per-worker memory in front of the shared cache; edits reach every
+        # worker within seconds through the reference data version
+        lookup_data = reference_data('api_lookup_data', self.build_lookup_data)
+        return Response(lookup_data)
+    
+    def build_lookup_data(self):
+        """Serialize every lookup table"""
         lookup_data = {
             'counties': CountySerializer(County.objects.all().order_by('county_name'), many=True).data,
             'operational_statuses': OperationalStatusSerializer(OperationalStatus.objects.all().order_by('status_name'), many=True).data,
@@ -467,55 +459,76 @@ class LookupDataView(generics.GenericAPIView):
             'owner_types': OwnerTypeSerializer(OwnerType.objects.all().order_by('type_name'), many=True).data,
             'gbv_categories': GBVCategorySerializer(GBVCategory.objects.all().order_by('category_name'), many=True).data,
         }
-        
-        return Response(lookup_data)
+        return lookup_data
+
+
+def _geography_etag(request, *args, **kwargs):
+    return ('geography', get_reference_version(), request.build_absolute_uri())
 
 
-class CountyListView(generics.ListAPIView):
+def _geography_modified(request, *args, **kwargs):
+    return get_version_modified(REFERENCE_VERSION_KEY)
+
+
+class GeographyListView(generics.ListAPIView):
+    """Place lists answer If-None-Match / If-Modified-Since from the reference data version"""
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    
+    @conditional_get(etag=_geography_etag, last_modified=_geography_modified)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class CountyListView(GeographyListView):
     """Get list of counties"""
     queryset = County.objects.all().order_by('county_name')
     serializer_class = CountySerializer
-    permission_classes = [IsAuthenticated]
-    pagination_class = None
 
 
-class ConstituencyListView(generics.ListAPIView):
+class ConstituencyListView(GeographyListView):
     """Get list of constituencies with county information"""
     queryset = Constituency.objects.select_related('county').all().order_by('constituency_name')
     serializer_class = ConstituencySerializer
-    permission_classes = [IsAuthenticated]
-    pagination_class = None
 
 
-class WardListView(generics.ListAPIView):
+class WardListView(GeographyListView):
     """Get list of wards with constituency and county information"""
     queryset = Ward.objects.select_related('constituency__county').all().order_by('ward_name')
     serializer_class = WardSerializer
-    permission_classes = [IsAuthenticated]
-    pagination_class = None
 
 
-class ConsolidatedGeographyView(generics.ListAPIView):
+class ConsolidatedGeographyView(generics.GenericAPIView):
     """
     Consolidated geography endpoint that returns all counties with nested constituencies and wards.
     This provides a single API call to get the complete geographic hierarchy.
+    The tree is pre-encoded (see apps.geography.tree) and carries an ETag.
     """
-    queryset = County.objects.prefetch_related(
-        'constituency_set__ward_set'
-    ).all().order_by('county_name')
     serializer_class = ConsolidatedGeographySerializer
     permission_classes = [IsAuthenticated]
     pagination_class = None
     
     @swagger_auto_schema(
-        operation_description="Get complete geographic hierarchy including counties, constituencies, and wards in a single API call",
+        operation_description="Get complete geographic hierarchy including counties, constituencies, and wards in a single API call. Send If-None-Match with the ETag of a previous response to get 304 when unchanged.",
         responses={
-            200: ConsolidatedGeographySerializer,
+            200: ConsolidatedGeographySerializer(many=True),
+            304: 'Not Modified',
             401: 'Unauthorized',
         }
     )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        tree = get_geography_tree()
+        response = get_conditional_response(request, etag=tree['etag'])
+        if response is None:
+            if accepts_gzip(request):
+                response = HttpResponse(tree['gzipped'], content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(tree['body'], content_type='application/json')
+        response['ETag'] = tree['etag']
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 @swagger_auto_schema(
@@ -593,32 +606,31 @@ class EmergencyServicesView(generics.GenericAPIView):
         radius_km = data.get('radius_km', 10)
         service_types = data.get('service_types', ['Emergency Services', 'Security Services'])
         
-        # Calculate distance and find nearby facilities
-        from django.db.models import F, FloatField
-        from django.db.models.functions import Power, Sqrt
+        # Bounding-box prefilter on the coordinate index, then exact
+        # great-circle ranking of the rows inside the box
+        candidates = Facility.objects.filter(
+            is_active=True,
+            operational_status__status_name='Operational',
+            facilityservice__service_category__category_name__in=service_types
+        )
+        nearest = facilities_within(latitude, longitude, radius_km, facilities=candidates)[:10]  # Top 10 nearest
         
-        # Haversine formula approximation for distance calculation
-        queryset = Facility.objects.select_related(
+        facilities_by_id = Facility.objects.select_related(
             'ward__constituency__county',
             'operational_status'
         ).prefetch_related(
-            'facilityservice_set__service_category',
-            'facilitycontact_set__contact_type'
-        ).filter(
-            is_active=True,
-            operational_status__status_name='Operational',
-            facilityservice_set__service_category__category_name__in=service_types,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False
-        ).annotate(
-            distance=Sqrt(
-                Power(F('facilitycoordinate__latitude') - latitude, 2) +
-                Power(F('facilitycoordinate__longitude') - longitude, 2),
-                output_field=FloatField()
-            ) * 111.32  # Approximate conversion to km
-        ).filter(
-            distance__lte=radius_km
-        ).order_by('distance').distinct()[:10]  # Top 10 nearest
+            Prefetch(
+                'facilityservice_set',
+                queryset=FacilityService.objects.filter(is_active=True).select_related('service_category'),
+                to_attr='active_services'
+            ),
+            Prefetch(
+                'facilitycontact_set',
+                queryset=FacilityContact.objects.filter(is_active=True).select_related('contact_type'),
+                to_attr='active_contacts'
+            )
+        ).in_bulk([facility_id for facility_id, _ in nearest])
+        queryset = [facilities_by_id[facility_id] for facility_id, _ in nearest if facility_id in facilities_by_id]
         
         serializer = FacilityListSerializer(queryset, many=True)
         return Response({
@@ -927,6 +939,77 @@ class ContactInteractionAnalyticsView(generics.GenericAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ContactInteractionSummaryView(generics.GenericAPIView):
+    """
+    Contact interaction counts over time for dashboard charts.
+    Served from the hourly and daily rollups, not the raw interactions.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Get contact interaction counts per hour or day, optionally split by one dimension",
+        manual_parameters=[
+            openapi.Parameter('granularity', openapi.IN_QUERY, description="'day' (default) or 'hour'", type=openapi.TYPE_STRING),
+            openapi.Parameter('start', openapi.IN_QUERY, description="First day, YYYY-MM-DD (default: 29 days before end, or the day before end for hourly)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end', openapi.IN_QUERY, description="Last day, YYYY-MM-DD, inclusive (default: today)", type=openapi.TYPE_STRING),
+            openapi.Parameter('group_by', openapi.IN_QUERY, description="Split by facility, contact, contact_type, county or interaction_type", type=openapi.TYPE_STRING),
+            openapi.Parameter('facility', openapi.IN_QUERY, description="Filter by facility ID", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('contact', openapi.IN_QUERY, description="Filter by contact ID", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('contact_type', openapi.IN_QUERY, description="Filter by contact type ID", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('county', openapi.IN_QUERY, description="Filter by county ID", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('interaction_type', openapi.IN_QUERY, description="Filter by interaction type, e.g. call", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            200: openapi.Response('Interaction counts per bucket'),
+            400: 'Bad Request',
+            401: 'Unauthorized',
+        }
+    )
+    def get(self, request):
+        """Get interaction counts per bucket"""
+        from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+        from apps.analytics.rollups import interaction_series, rolled_up_at
+        
+        params = request.query_params
+        granularity = params.get('granularity', 'day')
+        try:
+            end = datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else timezone.now().date()
+            default_days = 1 if granularity == 'hour' else 29
+            start = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else end - timedelta(days=default_days)
+            # The range ends at midnight after `end`; 9999-12-31 has none
+            end_before = end + timedelta(days=1)
+            filters = {
+                f'{name}_id': int(params[name])
+                for name in ('facility', 'contact', 'contact_type', 'county') if params.get(name)
+            }
+        except (ValueError, OverflowError):
+            return Response({
+                'error': 'start and end must be YYYY-MM-DD dates within range and IDs must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('interaction_type'):
+            filters['interaction_type'] = params['interaction_type']
+        
+        try:
+            series = interaction_series(
+                datetime.combine(start, dt_time.min, tzinfo=dt_timezone.utc),
+                datetime.combine(end_before, dt_time.min, tzinfo=dt_timezone.utc),
+                granularity=granularity,
+                group_by=params.get('group_by') or None,
+                **filters
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'group_by': params.get('group_by') or None,
+            'as_of': rolled_up_at(),
+            'series': series,
+        })
+
+
 class ReferralOutcomeView(generics.GenericAPIView):
     """
     Track referral outcomes for inter-agency coordination effectiveness.
@@ -1322,12 +1405,25 @@ class MobileEmergencySOSView(generics.GenericAPIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # radius_km and emergency_type already set above
+        try:
+            radius_km = float(radius_km)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'Invalid radius_km value',
+                'message': 'radius_km must be a number'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Find facilities within radius (simplified distance calculation)
-        from django.db.models import F, FloatField
-        from django.db.models.functions import Power, Sqrt
+        # Candidates inside the radius come from the in-memory spatial index,
+        # already ordered by distance; SQL only checks which are operational.
+        distances = dict(get_spatial_index().within(latitude, longitude, radius_km))
+        operational_ids = set(Facility.objects.filter(
+            facility_id__in=distances.keys(),
+            is_active=True,
+            operational_status__status_name='Operational'
+        ).values_list('facility_id', flat=True))
+        nearest_ids = [facility_id for facility_id in distances if facility_id in operational_ids][:10]  # Top 10 nearest
         
-        queryset = Facility.objects.select_related(
+        facilities_by_id = Facility.objects.select_related(
             'ward__constituency__county',
             'operational_status'
         ).prefetch_related(
@@ -1335,23 +1431,15 @@ class MobileEmergencySOSView(generics.GenericAPIView):
             'facilityservice_set__service_category',
             'facilityowner_set__owner_type',
             'facilitygbvcategory_set__gbv_category',
-            'facilitycoordinate',
+            Prefetch(
+                'facilitycoordinate_set',
+                queryset=FacilityCoordinate.objects.filter(is_active=True),
+                to_attr='active_coordinates'
+            ),
             'facilityinfrastructure_set__infrastructure_type',
             'facilityinfrastructure_set__condition_status'
-        ).filter(
-            is_active=True,
-            operational_status__status_name='Operational',
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False
-        ).annotate(
-            distance=Sqrt(
-                Power(F('facilitycoordinate__latitude') - latitude, 2) +
-                Power(F('facilitycoordinate__longitude') - longitude, 2),
-                output_field=FloatField()
-            ) * 111.32  # Approximate conversion to km
-        ).filter(
-            distance__lte=radius_km
-        ).order_by('distance')[:10]  # Top 10 nearest
+        ).in_bulk(nearest_ids)
+        queryset = [facilities_by_id[facility_id] for facility_id in nearest_ids if facility_id in facilities_by_id]
         
         serializer = MobileAppFacilitySerializer(queryset, many=True)
         
@@ -1822,35 +1910,9 @@ class MobileLookupView(generics.GenericAPIView):
             mobile_session = request.mobile_session
             mobile_session.update_activity()
             
-            # Get all lookup data with optimized queries
-            lookup_data = {
-                # Geography
-                'counties': CountySerializer(County.objects.all().order_by('county_name'), many=True).data,
-                'constituencies': ConstituencySerializer(Constituency.objects.select_related('county').all().order_by('constituency_name'), many=True).data,
-                'wards': WardSerializer(Ward.objects.select_related('constituency__county').all().order_by('ward_name'), many=True).data,
-                
-                # Facility-related lookups
-                'operational_statuses': OperationalStatusSerializer(OperationalStatus.objects.all().order_by('sort_order', 'status_name'), many=True).data,
-                'service_categories': ServiceCategorySerializer(ServiceCategory.objects.all().order_by('category_name'), many=True).data,
-                'contact_types': ContactTypeSerializer(ContactType.objects.all().order_by('type_name'), many=True).data,
-                'owner_types': OwnerTypeSerializer(OwnerType.objects.all().order_by('type_name'), many=True).data,
-                'gbv_categories': GBVCategorySerializer(GBVCategory.objects.all().order_by('category_name'), many=True).data,
-                
-                # Infrastructure and equipment
-                'infrastructure_types': InfrastructureTypeSerializer(InfrastructureType.objects.all().order_by('type_name'), many=True).data,
-                'condition_statuses': ConditionStatusSerializer(ConditionStatus.objects.all().order_by('status_name'), many=True).data,
-                
-                # Document types
-                'document_types': DocumentTypeSerializer(DocumentType.objects.all().order_by('type_name'), many=True).data,
-                
-                # Metadata
-                'last_updated': timezone.now(),
-                'total_lookup_items': 0,  # Will be calculated below
-            }
-            
-            # Calculate total lookup items
-            total_items = sum(len(data) for data in lookup_data.values() if isinstance(data, list))
-            lookup_data['total_lookup_items'] = total_items
+            # Copied: the cached dict is shared by every request in this worker
+            lookup_data = dict(reference_data('mobile_lookup_data', self.build_lookup_data))
+            lookup_data['last_updated'] = timezone.now()
             
             return Response(lookup_data)
             
@@ -1859,6 +1921,37 @@ class MobileLookupView(generics.GenericAPIView):
                 'error': 'Failed to retrieve lookup data',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def build_lookup_data(self):
+        """Serialize every lookup and geography table"""
+        lookup_data = {
+            # Geography
+            'counties': CountySerializer(County.objects.all().order_by('county_name'), many=True).data,
+            'constituencies': ConstituencySerializer(Constituency.objects.select_related('county').all().order_by('constituency_name'), many=True).data,
+            'wards': WardSerializer(Ward.objects.select_related('constituency__county').all().order_by('ward_name'), many=True).data,
+            
+            # Facility-related lookups
+            'operational_statuses': OperationalStatusSerializer(OperationalStatus.objects.all().order_by('sort_order', 'status_name'), many=True).data,
+            'service_categories': ServiceCategorySerializer(ServiceCategory.objects.all().order_by('category_name'), many=True).data,
+            'contact_types': ContactTypeSerializer(ContactType.objects.all().order_by('type_name'), many=True).data,
+            'owner_types': OwnerTypeSerializer(OwnerType.objects.all().order_by('type_name'), many=True).data,
+            'gbv_categories': GBVCategorySerializer(GBVCategory.objects.all().order_by('category_name'), many=True).data,
+            
+            # Infrastructure and equipment
+            'infrastructure_types': InfrastructureTypeSerializer(InfrastructureType.objects.all().order_by('type_name'), many=True).data,
+            'condition_statuses': ConditionStatusSerializer(ConditionStatus.objects.all().order_by('status_name'), many=True).data,
+            
+            # Document types
+            'document_types': DocumentTypeSerializer(DocumentType.objects.all().order_by('type_name'), many=True).data,
+            
+            # Metadata (last_updated is stamped per response)
+            'total_lookup_items': 0,  # Will be calculated below
+        }
+        
+        # Calculate total lookup items
+        total_items = sum(len(data) for data in lookup_data.values() if isinstance(data, list))
+        lookup_data['total_lookup_items'] = total_items
+        return lookup_data
 
 
 class GameScoreUpdateView(generics.GenericAPIView):
@@ -4,19 +4,87 @@ Emergency Chat System WebSocket Consumers
 """
 
 import json
+import logging
 from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import Conversation, Message
+from .models import Conversation
 from .services import MessageService
-from apps.mobile_sessions.models import MobileSession
+from .presence import TypingThrottle, announce_join, announce_leave
+from .receipts import acknowledge, parse_message_ids
+from apps.mobile_sessions.resolver import resolve_session
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
+# Messages missed while disconnected are replayed in batches of this size,
+# up to the maximum; beyond it the client reloads the history over REST
+REPLAY_BATCH_SIZE = getattr(settings, 'CHAT_REPLAY_BATCH_SIZE', 100)
+REPLAY_MAX_MESSAGES = getattr(settings, 'CHAT_REPLAY_MAX_MESSAGES', 1000)
 
-class ChatConsumer(AsyncWebsocketConsumer):
+
+def parse_last_message_id(scope):
+    """The last_message_id a reconnecting client sent in the query string, or None"""
+    query_params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    try:
+        return int(query_params['last_message_id'][0])
+    except (KeyError, ValueError):
+        return None
+
+
+class MissedMessagesMixin:
+    """
+    Replays what a reconnecting client missed. The consumer sets
+    self.conversation before calling send_missed_messages().
+    """
+    
+    async def send_missed_messages(self):
+        """
+        Replay the messages sent after the last_message_id the client
+        reconnected with, in missed_messages batches. The room group is
+        already joined, so a message sent meanwhile may arrive twice.
+        If the replay fails the socket is closed, so the client reconnects
+        instead of silently missing messages, and disconnect() cleans up.
+        """
+        last_message_id = parse_last_message_id(self.scope)
+        if last_message_id is None:
+            return
+        try:
+            await self._replay(last_message_id)
+        except Exception:
+            logger.exception("Could not replay missed messages in conversation %s", self.conversation_id)
+            await self.close(code=4005)  # Custom close code for a failed replay
+    
+    async def _replay(self, last_message_id):
+        replayed = 0
+        while True:
+            limit = min(REPLAY_BATCH_SIZE, REPLAY_MAX_MESSAGES - replayed)
+            messages = await self.get_missed_messages(last_message_id, limit + 1)
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            await self.send(text_data=json.dumps({
+                'type': 'missed_messages',
+                'messages': messages,
+                'has_more': has_more
+            }))
+            replayed += len(messages)
+            if not has_more or replayed >= REPLAY_MAX_MESSAGES:
+                return
+            last_message_id = messages[-1]['message_id']
+    
+    @database_sync_to_async
+    def get_missed_messages(self, last_message_id, limit):
+        """Payloads of the messages after last_message_id, oldest first"""
+        return [
+            MessageService.broadcast_payload(message, self.conversation)
+            for message in MessageService.get_messages_after(self.conversation, last_message_id, limit)
+        ]
+
+
+class ChatConsumer(MissedMessagesMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time chat functionality
     
@@ -33,11 +101,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_group_name = f'chat_{self.conversation_id}'
         self.user = self.scope.get('user')
         
-        # Verify conversation exists
-        if not await self.conversation_exists():
+        # Verify conversation exists; kept for the whole connection
+        self.conversation = await self.get_conversation()
+        if not self.conversation:
             await self.close()
             return
         
+        # Only staff, or the admin the conversation is assigned to, may read it;
+        # mobile users connect through MobileChatConsumer with their device_id
+        if not self.has_access():
+            await self.close(code=4004)  # Custom close code for access denied
+            return
+        
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -53,30 +128,51 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
         
-        # Notify others that user joined
-        await self.channel_layer.group_send(
+        # Typing changes are throttled; anonymous sockets are each their own sender
+        self.typing = TypingThrottle(self.send_typing_indicator)
+        self.presence_id = f'user:{self.user.pk}' if self.user.is_authenticated else self.channel_name
+        
+        # Notify others that user joined (not again for a second tab or a quick reconnect)
+        await announce_join(
+            self.channel_layer,
             self.room_group_name,
+            self.presence_id,
             {
                 'type': 'user_joined',
-                'user_id': self.user.id if self.user.is_authenticated else None,
+                'user_id': self.user.pk if self.user.is_authenticated else None,
                 'timestamp': timezone.now().isoformat()
             }
         )
+        
+        # Last, so that disconnect() can undo everything above if it fails
+        await self.send_missed_messages()
+    
+    def has_access(self):
+        """Whether the connecting user may read this conversation"""
+        if not self.user or not self.user.is_authenticated:
+            return False
+        return self.user.is_staff or self.conversation.assigned_admin_id == self.user.pk
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        if not hasattr(self, 'typing'):
+            return
+        await self.typing.close()
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
         
-        # Notify others that user left
-        await self.channel_layer.group_send(
+        # Notify others that user left, unless they are back within the grace period
+        await announce_leave(
+            self.channel_layer,
             self.room_group_name,
+            self.presence_id,
             {
                 'type': 'user_left',
-                'user_id': self.user.id if self.user.is_authenticated else None,
+                'user_id': self.user.pk if self.user.is_authenticated else None,
                 'timestamp': timezone.now().isoformat()
             }
         )
@@ -127,7 +223,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        # Create message in database
+        # Create message in database; returns the payload to broadcast
         message = await self.create_message(
             content=content,
             message_type=message_type,
@@ -142,17 +238,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': {
-                        'message_id': message.message_id,
-                        'content': message.content,
-                        'message_type': message.message_type,
-                        'media_url': message.media_url,
-                        'is_urgent': message.is_urgent,
-                        'sender_type': message.sender_type,
-                        'sender_info': await self.get_sender_info(message),
-                        'sent_at': message.sent_at.isoformat(),
-                        'status': message.status
-                    }
+                    'message': message
                 }
             )
         else:
@@ -163,46 +249,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     async def handle_message_status(self, data):
         """Handle message status updates"""
-        message_id = data.get('message_id')
+        message_ids = parse_message_ids([data.get('message_id')])
         new_status = data.get('status')
         
-        if not message_id or new_status not in ['delivered', 'read']:
+        if not message_ids or new_status not in ['delivered', 'read']:
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid message status update'
             }))
             return
         
-        # Update message status
-        updated = await self.update_message_status(message_id, new_status)
-        
-        if updated:
-            # Broadcast status update to room
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'message_status_update',
-                    'message_id': message_id,
-                    'status': new_status,
-                    'timestamp': timezone.now().isoformat()
-                }
-            )
-        else:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Failed to update message status'
-            }))
+        # Buffered with the conversation's other acknowledgements (see receipts.py)
+        await acknowledge(
+            self.channel_layer, self.room_group_name, self.conversation.pk, new_status, message_ids
+        )
     
     async def handle_typing_indicator(self, data):
         """Handle typing indicators"""
-        is_typing = data.get('is_typing', False)
-        
-        # Broadcast typing indicator to room
+        # Only changes are broadcast, at a bounded rate (see presence.py)
+        await self.typing.update(data.get('is_typing', False))
+    
+    async def send_typing_indicator(self, is_typing):
+        """Broadcast typing indicator to room"""
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'typing_indicator',
-                'user_id': self.user.id if self.user.is_authenticated else None,
+                'user_id': self.user.pk if self.user.is_authenticated else None,
                 'is_typing': is_typing,
                 'timestamp': timezone.now().isoformat()
             }
@@ -212,22 +285,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """Handle read receipts"""
         message_ids = data.get('message_ids', [])
         
-        if not message_ids:
+        if not isinstance(message_ids, list):
             return
         
-        # Mark messages as read
-        count = await self.mark_messages_read(message_ids)
-        
-        if count > 0:
-            # Broadcast read receipt to room
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'read_receipt',
-                    'user_id': self.user.id if self.user.is_authenticated else None,
-                    'message_ids': message_ids,
-                    'timestamp': timezone.now().isoformat()
-                }
+        message_ids = parse_message_ids(message_ids)
+        if message_ids:
+            await acknowledge(
+                self.channel_layer, self.room_group_name, self.conversation.pk, 'read', message_ids
             )
     
     # WebSocket message handlers for broadcasting
@@ -239,12 +303,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
     
-    async def message_status_update(self, event):
-        """Send message status update to WebSocket"""
+    async def message_status_batch(self, event):
+        """Send the messages that became delivered or read to WebSocket"""
         await self.send(text_data=json.dumps({
-            'type': 'message_status_update',
-            'message_id': event['message_id'],
-            'status': event['status'],
+            'type': 'message_status_batch',
+            'delivered': event['delivered'],
+            'read': event['read'],
             'timestamp': event['timestamp']
         }))
     
@@ -257,15 +321,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp']
         }))
     
-    async def read_receipt(self, event):
-        """Send read receipt to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'read_receipt',
-            'user_id': event['user_id'],
-            'message_ids': event['message_ids'],
-            'timestamp': event['timestamp']
-        }))
-    
     async def user_joined(self, event):
         """Send user joined notification to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -285,23 +340,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # Database operations
     
     @database_sync_to_async
-    def conversation_exists(self):
-        """Check if conversation exists"""
+    def get_conversation(self):
+        """Get conversation by ID"""
         try:
-            return Conversation.objects.filter(conversation_id=self.conversation_id).exists()
-        except:
-            return False
+            return Conversation.objects.get(conversation_id=self.conversation_id)
+        except Conversation.DoesNotExist:
+            return None
     
     @database_sync_to_async
     def create_message(self, content, message_type, media_url, is_urgent, metadata):
-        """Create a new message"""
+        """Create a new message and return its broadcast payload"""
         try:
-            conversation = Conversation.objects.get(conversation_id=self.conversation_id)
-            
             if self.user.is_authenticated and self.user.is_staff:
                 # Admin message
-                return MessageService.create_admin_message(
-                    conversation=conversation,
+                message = MessageService.create_admin_message(
+                    conversation=self.conversation,
                     content=content,
                     admin_user=self.user,
                     message_type=message_type,
@@ -311,72 +364,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 )
             else:
                 # Mobile message (anonymous)
-                return MessageService.create_mobile_message(
-                    conversation=conversation,
+                message = MessageService.create_mobile_message(
+                    conversation=self.conversation,
                     content=content,
                     message_type=message_type,
                     media_url=media_url,
                     is_urgent=is_urgent,
                     metadata=metadata
                 )
-        except Exception as e:
-            print(f"Error creating message: {e}")
+            return MessageService.broadcast_payload(message, self.conversation)
+        except Exception:
+            logger.exception("Could not create a message in conversation %s", self.conversation_id)
             return None
     
-    @database_sync_to_async
-    def update_message_status(self, message_id, status):
-        """Update message status"""
-        try:
-            message = Message.objects.get(
-                message_id=message_id,
-                conversation__conversation_id=self.conversation_id
-            )
-            
-            if status == 'delivered':
-                MessageService.mark_message_delivered(message)
-            elif status == 'read':
-                MessageService.mark_message_read(message)
-            
-            return True
-        except Message.DoesNotExist:
-            return False
-        except Exception as e:
-            print(f"Error updating message status: {e}")
-            return False
-    
-    @database_sync_to_async
-    def mark_messages_read(self, message_ids):
-        """Mark multiple messages as read"""
-        try:
-            count = Message.objects.filter(
-                message_id__in=message_ids,
-                conversation__conversation_id=self.conversation_id,
-                status__in=['sent', 'delivered']
-            ).update(
-                status='read',
-                read_at=timezone.now()
-            )
-            return count
-        except Exception as e:
-            print(f"Error marking messages read: {e}")
-            return 0
-    
-    @database_sync_to_async
-    def get_sender_info(self, message):
-        """Get sender information for message"""
-        if message.sender_type == 'admin' and message.sender:
-            return {
-                'id': message.sender.id,
-                'username': message.sender.username,
-                'first_name': message.sender.first_name,
-                'last_name': message.sender.last_name
-            }
-        elif message.sender_type == 'mobile':
-            return {
-                'type': 'mobile_user',
-                'device_id': message.conversation.mobile_session.device_id
-            }
-        return None
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -516,7 +516,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return False
 
 
-class MobileChatConsumer(AsyncWebsocketConsumer):
+class MobileChatConsumer(MissedMessagesMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for mobile chat functionality using device_id authentication
     
@@ -528,6 +528,7 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
     - Read receipts
     
     Connection URL format: ws://host/ws/mobile/chat/{conversation_id}/?device_id=xxx
+    A reconnecting client adds &last_message_id=N to receive what it missed.
     """
     
     async def connect(self):
@@ -551,14 +552,14 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
             await self.close(code=4002)  # Custom close code for invalid device_id
             return
         
-        # Verify conversation exists and user has access
-        conversation = await self.get_conversation()
-        if not conversation:
+        # Verify conversation exists and user has access; kept for the whole connection
+        self.conversation = await self.get_conversation()
+        if not self.conversation:
             await self.close(code=4003)  # Custom close code for conversation not found
             return
         
         # Check if mobile session has access to this conversation
-        if conversation.mobile_session != self.mobile_session:
+        if self.conversation.mobile_session_id != self.mobile_session.device_id:
             await self.close(code=4004)  # Custom close code for access denied
             return
         
@@ -578,35 +579,47 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
         
-        # Notify others that mobile user joined
-        await self.channel_layer.group_send(
+        self.typing = TypingThrottle(self.send_typing_indicator)
+        
+        # Notify others that mobile user joined (not again for a quick reconnect)
+        await announce_join(
+            self.channel_layer,
             self.room_group_name,
+            f'device:{device_id}',
             {
                 'type': 'mobile_user_joined',
                 'device_id': device_id,
                 'timestamp': timezone.now().isoformat()
             }
         )
+        
+        # Last, so that disconnect() can undo everything above if it fails
+        await self.send_missed_messages()
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        # Only connections that were accepted joined the room
+        if not hasattr(self, 'typing'):
+            return
+        await self.typing.close()
+        
         # Leave room group
-        if hasattr(self, 'room_group_name'):
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
-            
-            # Notify others that mobile user left
-            if hasattr(self, 'mobile_session'):
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'mobile_user_left',
-                        'device_id': self.mobile_session.device_id,
-                        'timestamp': timezone.now().isoformat()
-                    }
-                )
+        await self.channel_layer.group_discard(
+            self.room_group_name,
+            self.channel_name
+        )
+        
+        # Notify others that mobile user left, unless it is back within the grace period
+        await announce_leave(
+            self.channel_layer,
+            self.room_group_name,
+            f'device:{self.mobile_session.device_id}',
+            {
+                'type': 'mobile_user_left',
+                'device_id': self.mobile_session.device_id,
+                'timestamp': timezone.now().isoformat()
+            }
+        )
     
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
@@ -654,7 +667,7 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
             }))
             return
         
-        # Create message in database (as mobile message)
+        # Create message in database (as mobile message); returns the payload to broadcast
         message = await self.create_mobile_message(
             content=content,
             message_type=message_type,
@@ -669,17 +682,7 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': {
-                        'message_id': message.message_id,
-                        'content': message.content,
-                        'message_type': message.message_type,
-                        'media_url': message.media_url,
-                        'is_urgent': message.is_urgent,
-                        'sender_type': message.sender_type,
-                        'sender_info': await self.get_sender_info(message),
-                        'sent_at': message.sent_at.isoformat(),
-                        'status': message.status
-                    }
+                    'message': message
                 }
             )
         else:
@@ -690,41 +693,28 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
     
     async def handle_message_status(self, data):
         """Handle message status updates"""
-        message_id = data.get('message_id')
+        message_ids = parse_message_ids([data.get('message_id')])
         new_status = data.get('status')
         
-        if not message_id or new_status not in ['delivered', 'read']:
+        if not message_ids or new_status not in ['delivered', 'read']:
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid message status update'
             }))
             return
         
-        # Update message status
-        updated = await self.update_message_status(message_id, new_status)
-        
-        if updated:
-            # Broadcast status update to room
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'message_status_update',
-                    'message_id': message_id,
-                    'status': new_status,
-                    'timestamp': timezone.now().isoformat()
-                }
-            )
-        else:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Failed to update message status'
-            }))
+        # Buffered with the conversation's other acknowledgements (see receipts.py)
+        await acknowledge(
+            self.channel_layer, self.room_group_name, self.conversation.pk, new_status, message_ids
+        )
     
     async def handle_typing_indicator(self, data):
         """Handle typing indicators"""
-        is_typing = data.get('is_typing', False)
-        
-        # Broadcast typing indicator to room
+        # Only changes are broadcast, at a bounded rate (see presence.py)
+        await self.typing.update(data.get('is_typing', False))
+    
+    async def send_typing_indicator(self, is_typing):
+        """Broadcast typing indicator to room"""
         await self.channel_layer.group_send(
             self.room_group_name,
             {
@@ -739,22 +729,13 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
         """Handle read receipts"""
         message_ids = data.get('message_ids', [])
         
-        if not message_ids:
+        if not isinstance(message_ids, list):
             return
         
-        # Mark messages as read
-        count = await self.mark_messages_read(message_ids)
-        
-        if count > 0:
-            # Broadcast read receipt to room
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'read_receipt',
-                    'device_id': self.mobile_session.device_id,
-                    'message_ids': message_ids,
-                    'timestamp': timezone.now().isoformat()
-                }
+        message_ids = parse_message_ids(message_ids)
+        if message_ids:
+            await acknowledge(
+                self.channel_layer, self.room_group_name, self.conversation.pk, 'read', message_ids
             )
     
     # WebSocket message handlers for broadcasting
@@ -766,12 +747,12 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
     
-    async def message_status_update(self, event):
-        """Send message status update to WebSocket"""
+    async def message_status_batch(self, event):
+        """Send the messages that became delivered or read to WebSocket"""
         await self.send(text_data=json.dumps({
-            'type': 'message_status_update',
-            'message_id': event['message_id'],
-            'status': event['status'],
+            'type': 'message_status_batch',
+            'delivered': event['delivered'],
+            'read': event['read'],
             'timestamp': event['timestamp']
         }))
     
@@ -785,16 +766,6 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp']
         }))
     
-    async def read_receipt(self, event):
-        """Send read receipt to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'read_receipt',
-            'device_id': event.get('device_id'),
-            'user_id': event.get('user_id'),  # For admin users
-            'message_ids': event['message_ids'],
-            'timestamp': event['timestamp']
-        }))
-    
     async def mobile_user_joined(self, event):
         """Send mobile user joined notification to WebSocket"""
         await self.send(text_data=json.dumps({
@@ -832,10 +803,7 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def validate_mobile_session(self, device_id):
         """Validate device_id and return mobile session if valid"""
-        try:
-            return MobileSession.objects.get(device_id=device_id, is_active=True)
-        except MobileSession.DoesNotExist:
-            return None
+        return resolve_session(device_id)
     
     @database_sync_to_async
     def get_conversation(self):
@@ -847,73 +815,18 @@ class MobileChatConsumer(AsyncWebsocketConsumer):
     
     @database_sync_to_async
     def create_mobile_message(self, content, message_type, media_url, is_urgent, metadata):
-        """Create a new message from mobile user"""
+        """Create a new message from mobile user and return its broadcast payload"""
         try:
-            conversation = Conversation.objects.get(conversation_id=self.conversation_id)
-            
-            return MessageService.create_mobile_message(
-                conversation=conversation,
+            message = MessageService.create_mobile_message(
+                conversation=self.conversation,
                 content=content,
                 message_type=message_type,
                 media_url=media_url,
                 is_urgent=is_urgent,
                 metadata=metadata
             )
-        except Exception as e:
-            print(f"Error creating mobile message: {e}")
+            return MessageService.broadcast_payload(message, self.conversation)
+        except Exception:
+            logger.exception("Could not create a mobile message in conversation %s", self.conversation_id)
             return None
     
-    @database_sync_to_async
-    def update_message_status(self, message_id, status):
-        """Update message status"""
-        try:
-            message = Message.objects.get(
-                message_id=message_id,
-                conversation__conversation_id=self.conversation_id
-            )
-            
-            if status == 'delivered':
-                MessageService.mark_message_delivered(message)
-            elif status == 'read':
-                MessageService.mark_message_read(message)
-            
-            return True
-        except Message.DoesNotExist:
-            return False
-        except Exception as e:
-            print(f"Error updating message status: {e}")
-            return False
-    
-    @database_sync_to_async
-    def mark_messages_read(self, message_ids):
-        """Mark multiple messages as read"""
-        try:
-            count = Message.objects.filter(
-                message_id__in=message_ids,
-                conversation__conversation_id=self.conversation_id,
-                status__in=['sent', 'delivered']
-            ).update(
-                status='read',
-                read_at=timezone.now()
-            )
-            return count
-        except Exception as e:
-            print(f"Error marking messages read: {e}")
-            return 0
-    
-    @database_sync_to_async
-    def get_sender_info(self, message):
-        """Get sender information for message"""
-        if message.sender_type == 'admin' and message.sender:
-            return {
-                'id': message.sender.id,
-                'username': message.sender.username,
-                'first_name': message.sender.first_name,
-                'last_name': message.sender.last_name
-            }
-        elif message.sender_type == 'mobile':
-            return {
-                'type': 'mobile_user',
-                'device_id': message.conversation.mobile_session.device_id
-            }
-        return None
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_message_media_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'message_id'], name='emergency_c_convers_0f5f39_idx'),
+        ),
+    ]
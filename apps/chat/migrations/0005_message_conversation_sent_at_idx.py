@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_conversation_message_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'sent_at', 'message_id'], name='emergency_c_convers_f2cc69_idx'),
+        ),
+    ]
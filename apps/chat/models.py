@@ -115,6 +115,28 @@ class Conversation(models.Model):
         self.updated_at = timezone.now()
         self.save(update_fields=['last_message', 'last_message_at', 'last_message_by', 'updated_at'])
     
+    def record_new_message(self, message):
+        """
+        Update the last-message fields and the recipient's unread count for a
+        new message, in one UPDATE. The count is incremented in the database,
+        so concurrent messages are all counted.
+        """
+        unread_field = 'unread_count_admin' if message.sender_type == 'mobile' else 'unread_count_mobile'
+        now = timezone.now()
+        self.last_message = message.content[:200]
+        self.last_message_at = now
+        self.last_message_by_id = message.sender_id
+        self.updated_at = now
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message=self.last_message,
+            last_message_at=now,
+            last_message_by_id=message.sender_id,
+            updated_at=now,
+            **{unread_field: models.F(unread_field) + 1}
+        )
+        # Keep this copy in step without reading the row back
+        setattr(self, unread_field, getattr(self, unread_field) + 1)
+    
     def assign_admin(self, admin_user):
         """Assign an admin to the conversation"""
         self.assigned_admin = admin_user
@@ -208,6 +230,10 @@ class Message(models.Model):
         db_table = 'emergency_chat_messages'
         indexes = [
             models.Index(fields=['conversation']),
+            # Range scans of a conversation's messages after a given id (reconnect replay)
+            models.Index(fields=['conversation', 'message_id']),
+            # History pages, newest first; message_id breaks ties between equal sent_at
+            models.Index(fields=['conversation', 'sent_at', 'message_id']),
             models.Index(fields=['sender']),
             models.Index(fields=['sender_type']),
             models.Index(fields=['sent_at']),
@@ -267,15 +293,8 @@ class Message(models.Model):
         super().save(*args, **kwargs)
         
         if is_new:
-            # Update conversation metadata
-            self.conversation.update_last_message(self.content, self.sender)
-            
-            # Update unread counts
-            if self.sender_type == 'mobile':
-                self.conversation.unread_count_admin += 1
-            else:
-                self.conversation.unread_count_mobile += 1
-            self.conversation.save(update_fields=['unread_count_mobile', 'unread_count_admin'])
+            # Update conversation metadata and unread counts
+            self.conversation.record_new_message(self)
 
 
 class ChatNotification(models.Model):
@@ -0,0 +1,134 @@
+# -*- encoding: utf-8 -*-
+"""
+Throttled typing indicators and debounced presence for the chat consumers.
+
+The consumers used to group_send every typing event the client emitted
+(typically one per keystroke) and a join or leave event for every socket
+that connected or dropped. On a Redis channel layer each group_send is a
+round trip, fanned out to every socket in the room, and a flaky mobile
+connection that reconnects in a loop floods the room with join/leave pairs.
+
+TypingThrottle sits on each connection and forwards typing *changes* only:
+
+* a change is sent at once if nothing was sent for CHAT_TYPING_INTERVAL_MS,
+  otherwise once that interval is over, with whatever the state is by then
+  (start-stop-start within one interval sends nothing further);
+* a sender that stops sending typing events is reported as stopped after
+  CHAT_TYPING_TIMEOUT_SECONDS, and when it disconnects.
+
+announce_join() / announce_leave() debounce presence per room and identity
+(device or user) within this process: only the first connection of an
+identity announces a join and only the last announces a leave, which is held
+back for CHAT_PRESENCE_GRACE_SECONDS. A reconnect within the grace period
+cancels it, so the room sees neither the leave nor the new join. Reconnects
+that land on another worker are announced normally.
+"""
+
+import asyncio
+
+from django.conf import settings
+
+TYPING_INTERVAL_SECONDS = getattr(settings, 'CHAT_TYPING_INTERVAL_MS', 1500) / 1000
+TYPING_TIMEOUT_SECONDS = getattr(settings, 'CHAT_TYPING_TIMEOUT_SECONDS', 5)
+PRESENCE_GRACE_SECONDS = getattr(settings, 'CHAT_PRESENCE_GRACE_SECONDS', 3)
+
+
+class TypingThrottle:
+    """Typing state of one connection, forwarded to its room at a bounded rate."""
+
+    def __init__(self, send, interval=TYPING_INTERVAL_SECONDS, timeout=TYPING_TIMEOUT_SECONDS):
+        # send(is_typing) broadcasts the state to the room
+        self._send = send
+        self.interval = interval
+        self.timeout = timeout
+        self.wanted = False
+        self.sent = False
+        self._last_sent = None
+        self._flush_task = None
+        self._stop_task = None
+
+    async def update(self, is_typing):
+        """Record the sender's latest typing state."""
+        self.wanted = bool(is_typing)
+        if self._stop_task is not None:
+            self._stop_task.cancel()
+            self._stop_task = None
+        if self.wanted:
+            self._stop_task = asyncio.ensure_future(self._stop_later())
+        await self._forward()
+
+    async def close(self):
+        """Stop all timers; report the sender as stopped if it was typing."""
+        for task in (self._flush_task, self._stop_task):
+            if task is not None:
+                task.cancel()
+        self._flush_task = self._stop_task = None
+        if self.sent:
+            self.wanted = False
+            await self._send_now()
+
+    async def _forward(self):
+        if self.wanted == self.sent or self._flush_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        wait = 0 if self._last_sent is None else self._last_sent + self.interval - loop.time()
+        if wait <= 0:
+            await self._send_now()
+        else:
+            self._flush_task = asyncio.ensure_future(self._flush_later(wait))
+
+    async def _flush_later(self, wait):
+        await asyncio.sleep(wait)
+        self._flush_task = None
+        if self.wanted != self.sent:
+            await self._send_now()
+
+    async def _stop_later(self):
+        await asyncio.sleep(self.timeout)
+        self._stop_task = None
+        self.wanted = False
+        await self._forward()
+
+    async def _send_now(self):
+        self.sent = self.wanted
+        self._last_sent = asyncio.get_running_loop().time()
+        await self._send(self.sent)
+
+
+# (group, identity) -> {'connections': open sockets, 'leave': pending leave task}
+_presence = {}
+
+
+async def announce_join(channel_layer, group, identity, event):
+    """Send the join `event` to `group` unless `identity` is already present."""
+    entry = _presence.setdefault((group, identity), {'connections': 0, 'leave': None})
+    entry['connections'] += 1
+    if entry['leave'] is not None:
+        # Back within the grace period: the room never saw it leave
+        entry['leave'].cancel()
+        entry['leave'] = None
+        return
+    if entry['connections'] == 1:
+        await channel_layer.group_send(group, event)
+
+
+async def announce_leave(channel_layer, group, identity, event, grace=PRESENCE_GRACE_SECONDS):
+    """Send the leave `event` once the last connection of `identity` has been gone for `grace` seconds."""
+    key = (group, identity)
+    entry = _presence.get(key)
+    if entry is None:
+        await channel_layer.group_send(group, event)
+        return
+    entry['connections'] = max(0, entry['connections'] - 1)
+    if entry['connections'] or entry['leave'] is not None:
+        return
+    entry['leave'] = asyncio.ensure_future(_leave_later(channel_layer, key, event, grace))
+
+
+async def _leave_later(channel_layer, key, event, grace):
+    await asyncio.sleep(grace)
+    entry = _presence.get(key)
+    if entry is None or entry['connections']:
+        return
+    del _presence[key]
+    await channel_layer.group_send(key[0], event)
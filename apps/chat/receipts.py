@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+"""
+Buffered delivery and read acknowledgements for the chat consumers.
+
+Clients acknowledge every message they display: a message_status event
+per message, or a read_receipt with a list of ids. Opening a long
+conversation produces dozens of them in a burst, and each used to cost a
+SELECT, an UPDATE, a conversation save and a broadcast of its own.
+
+acknowledge() collects the ids per conversation in this process instead.
+CHAT_STATUS_FLUSH_MS (250) after the first one arrives, flush() applies
+them all with MessageService.apply_message_statuses(), which also updates
+the conversation's unread counts, and broadcasts one message_status_batch
+event listing the ids that became delivered and read.
+
+Acknowledgements still buffered when the process exits are lost; clients
+acknowledge again the next time they display the messages.
+"""
+
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .services import MessageService
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = getattr(settings, 'CHAT_STATUS_FLUSH_MS', 250) / 1000
+STATUSES = ('delivered', 'read')
+
+# conversation_id -> {'delivered': ids, 'read': ids} waiting for the next flush
+_pending = {}
+
+
+def parse_message_ids(values):
+    """The integer message ids in `values`; anything else is skipped."""
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+async def acknowledge(channel_layer, group, conversation_id, status, message_ids, delay=None):
+    """Buffer `status` ('delivered' or 'read') for `message_ids` of a conversation."""
+    entry = _pending.get(conversation_id)
+    if entry is None:
+        entry = _pending[conversation_id] = {name: set() for name in STATUSES}
+        asyncio.ensure_future(_flush_later(
+            channel_layer, group, conversation_id, FLUSH_SECONDS if delay is None else delay
+        ))
+    entry[status].update(message_ids)
+
+
+async def _flush_later(channel_layer, group, conversation_id, delay):
+    await asyncio.sleep(delay)
+    try:
+        await flush(channel_layer, group, conversation_id)
+    except Exception:
+        logger.exception("Could not apply message statuses for conversation %s", conversation_id)
+
+
+async def flush(channel_layer, group, conversation_id):
+    """Apply and broadcast the acknowledgements buffered for a conversation."""
+    entry = _pending.pop(conversation_id, None)
+    if entry is None:
+        return {name: [] for name in STATUSES}
+    changed = await database_sync_to_async(MessageService.apply_message_statuses)(
+        conversation_id, entry['delivered'], entry['read']
+    )
+    if changed['delivered'] or changed['read']:
+        await channel_layer.group_send(group, {
+            'type': 'message_status_batch',
+            'delivered': changed['delivered'],
+            'read': changed['read'],
+            'timestamp': timezone.now().isoformat()
+        })
+    return changed
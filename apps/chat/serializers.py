@@ -6,7 +6,9 @@ Emergency Chat System Serializers
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Conversation, Message, ChatNotification
+from .services import MessageService
 from apps.mobile_sessions.models import MobileSession
+from apps.mobile_sessions.resolver import resolve_session
 
 User = get_user_model()
 
@@ -122,7 +124,8 @@ class MessageSerializer(serializers.ModelSerializer):
         elif obj.sender_type == 'mobile':
             return {
                 'type': 'mobile_user',
-                'device_id': obj.conversation.mobile_session.device_id
+                # The mobile session's primary key is its device ID
+                'device_id': obj.conversation.mobile_session_id
             }
         return None
     
@@ -222,12 +225,21 @@ class ConversationDetailSerializer(ConversationSerializer):
         fields = ConversationSerializer.Meta.fields + ['messages']
     
     def get_messages(self, obj):
-        """Get paginated messages for the conversation"""
+        """Get paginated messages for the conversation, newest first"""
         request = self.context.get('request')
         limit = int(request.query_params.get('limit', 50)) if request else 50
         offset = int(request.query_params.get('offset', 0)) if request else 0
+        # Id of the oldest message the client has; the page continues from there
+        before = request.query_params.get('before') if request else None
+        if before:
+            try:
+                before = int(before)
+            except ValueError:
+                raise serializers.ValidationError({'before': 'Must be a message ID'})
         
-        messages = obj.messages.all().order_by('-sent_at')[offset:offset + limit]
+        messages = MessageService.get_conversation_messages(
+            obj, limit=limit, offset=offset, before=before or None
+        )
         return MessageSerializer(messages, many=True, context=self.context).data
 
 
@@ -239,9 +251,7 @@ class CreateConversationSerializer(serializers.Serializer):
     
     def validate_device_id(self, value):
         """Validate device ID exists"""
-        try:
-            MobileSession.objects.get(device_id=value, is_active=True)
-        except MobileSession.DoesNotExist:
+        if resolve_session(value, self.context.get('request')) is None:
             raise serializers.ValidationError("Invalid or inactive device ID")
         return value
 
@@ -3,6 +3,8 @@
 Emergency Chat System Services
 """
 
+import logging
+
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -10,6 +12,7 @@ from typing import Optional, List, Dict, Any, TYPE_CHECKING, Union
 from .models import Conversation, Message, ChatNotification
 from apps.mobile_sessions.models import MobileSession
 from django.db import models
+from django.db.models.functions import Greatest
 
 if TYPE_CHECKING:
     from django.contrib.auth.models import AbstractUser
@@ -18,6 +21,7 @@ else:
     UserType = None
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class ConversationService:
@@ -196,29 +200,6 @@ class MessageService:
         Returns:
             Created message
         """
-        print(f"DEBUG: Creating message in conversation {conversation.conversation_id}")
-        print(f"DEBUG: Message type: {message_type}")
-        print(f"DEBUG: Content: {content[:100]}...")
-        print(f"DEBUG: Media file: {media_file}")
-        
-        if media_file:
-            print(f"DEBUG: Media file details:")
-            print(f"  - Name: {media_file.name}")
-            print(f"  - Size: {media_file.size} bytes")
-            print(f"  - Content type: {media_file.content_type}")
-            print(f"  - File object type: {type(media_file)}")
-            
-            # Check if it's a proper file object
-            if hasattr(media_file, 'read'):
-                print(f"  - Has read method: ✅")
-            else:
-                print(f"  - Has read method: ❌")
-                
-            if hasattr(media_file, 'name'):
-                print(f"  - Has name attribute: ✅")
-            else:
-                print(f"  - Has name attribute: ❌")
-        
         if not metadata:
             metadata = {}
         
@@ -234,36 +215,73 @@ class MessageService:
                 'file_type': media_file.content_type,
                 'original_name': original_filename
             })
-            print(f"DEBUG: Updated metadata: {metadata}")
-        
-        print(f"DEBUG: About to create Message object...")
-        message = Message.objects.create(
-            conversation=conversation,
-            content=content,
-            sender_type=sender_type,
-            sender=sender,
-            message_type=message_type,
-            media_file=media_file,
-            media_url=media_url,
-            is_urgent=is_urgent,
-            metadata=metadata
-        )
-        
-        print(f"DEBUG: Message created with ID: {message.message_id}")
-        print(f"DEBUG: Message media_file field: {message.media_file}")
-        if message.media_file:
-            print(f"DEBUG: Message media_file path: {message.media_file.path}")
-            print(f"DEBUG: Message media_file URL: {message.media_file.url}")
-            print(f"DEBUG: Message media_file exists: {message.media_file.storage.exists(message.media_file.name)}")
         
-        # Auto-assign admin if this is the first message and no admin assigned
-        if (sender_type == 'mobile' and 
-            conversation.status == 'new' and 
-            not conversation.assigned_admin):
-            ConversationService.auto_assign_conversation(conversation)
+        # The insert, the conversation update and any auto-assignment commit together
+        with transaction.atomic():
+            message = Message.objects.create(
+                conversation=conversation,
+                content=content,
+                sender_type=sender_type,
+                sender=sender,
+                message_type=message_type,
+                media_file=media_file,
+                media_url=media_url,
+                is_urgent=is_urgent,
+                metadata=metadata
+            )
+            logger.debug("Created message %s in conversation %s", message.message_id, conversation.conversation_id)
+            
+            # Auto-assign admin if this is the first message and no admin assigned
+            if (sender_type == 'mobile' and 
+                conversation.status == 'new' and 
+                not conversation.assigned_admin_id):
+                # Callers may hold an old copy (consumers keep theirs for the whole connection)
+                conversation.refresh_from_db(fields=['status', 'assigned_admin'])
+                if conversation.status == 'new' and not conversation.assigned_admin_id:
+                    ConversationService.auto_assign_conversation(conversation)
         
         return message
     
+    @staticmethod
+    def broadcast_payload(message: Message, conversation: Conversation) -> Dict[str, Any]:
+        """
+        The message as sent to chat WebSocket clients, built from the objects
+        in hand without further queries
+        
+        Args:
+            message: Message that was just created
+            conversation: Its conversation
+            
+        Returns:
+            Message payload for a chat_message event
+        """
+        sender_info = None
+        if message.sender_type == 'admin' and message.sender:
+            first_name, _, last_name = message.sender.full_name.partition(' ')
+            sender_info = {
+                'id': message.sender.pk,
+                'username': message.sender.username,
+                'first_name': first_name,
+                'last_name': last_name
+            }
+        elif message.sender_type == 'mobile':
+            sender_info = {
+                'type': 'mobile_user',
+                # The mobile session's primary key is its device ID
+                'device_id': conversation.mobile_session_id
+            }
+        return {
+            'message_id': message.message_id,
+            'content': message.content,
+            'message_type': message.message_type,
+            'media_url': message.media_url,
+            'is_urgent': message.is_urgent,
+            'sender_type': message.sender_type,
+            'sender_info': sender_info,
+            'sent_at': message.sent_at.isoformat(),
+            'status': message.status
+        }
+    
     @staticmethod
     def create_mobile_message(
         conversation: Conversation,
@@ -379,26 +397,125 @@ class MessageService:
         
         return message
     
+    @staticmethod
+    def apply_message_statuses(
+        conversation_id: int,
+        delivered_ids,
+        read_ids
+    ) -> Dict[str, List[int]]:
+        """
+        Apply a batch of delivery and read acknowledgements for one
+        conversation: one SELECT, one UPDATE of the messages and one UPDATE
+        of the conversation's unread counts, in one transaction. Ids of other
+        conversations and acknowledgements that change nothing are ignored.
+        
+        Args:
+            conversation_id: Conversation the messages belong to
+            delivered_ids: Ids of messages acknowledged as delivered
+            read_ids: Ids of messages acknowledged as read
+        
+        Returns:
+            The ids whose status changed, as {'delivered': [...], 'read': [...]}
+        """
+        read_ids = set(read_ids)
+        delivered_ids = set(delivered_ids) - read_ids
+        now = timezone.now()
+        with transaction.atomic():
+            rows = Message.objects.select_for_update().filter(
+                conversation_id=conversation_id,
+                message_id__in=read_ids | delivered_ids
+            ).values_list('message_id', 'status', 'sender_type')
+            read, delivered = [], []
+            unread_read = {'mobile': 0, 'admin': 0}
+            for message_id, status, sender_type in rows:
+                if message_id in read_ids and status in ('sent', 'delivered'):
+                    read.append(message_id)
+                    unread_read['mobile' if sender_type == 'mobile' else 'admin'] += 1
+                elif message_id in delivered_ids and status == 'sent':
+                    delivered.append(message_id)
+            if not read and not delivered:
+                return {'delivered': [], 'read': []}
+            
+            Message.objects.filter(message_id__in=read + delivered).update(
+                status=models.Case(
+                    models.When(message_id__in=read, then=models.Value('read')),
+                    default=models.Value('delivered')
+                ),
+                read_at=models.Case(
+                    models.When(message_id__in=read, then=models.Value(now)),
+                    default=models.F('read_at')
+                ),
+                delivered_at=models.Case(
+                    models.When(message_id__in=delivered, then=models.Value(now)),
+                    default=models.F('delivered_at')
+                )
+            )
+            if read:
+                # Messages from the mobile user were unread for the admin, and vice versa
+                Conversation.objects.filter(pk=conversation_id).update(
+                    unread_count_admin=Greatest(models.F('unread_count_admin') - unread_read['mobile'], 0),
+                    unread_count_mobile=Greatest(models.F('unread_count_mobile') - unread_read['admin'], 0)
+                )
+        return {'delivered': sorted(delivered), 'read': sorted(read)}
+    
+    @staticmethod
+    def get_messages_after(
+        conversation: Conversation,
+        last_message_id: int,
+        limit: int = 100
+    ) -> List[Message]:
+        """
+        Messages of a conversation newer than `last_message_id`, oldest first,
+        read with a range scan of the (conversation, message_id) index
+        
+        Args:
+            conversation: Conversation to get messages for
+            last_message_id: Id of the last message the client has
+            limit: Maximum number of messages to return
+            
+        Returns:
+            List of messages, with their senders
+        """
+        return list(
+            Message.objects.filter(
+                conversation=conversation,
+                message_id__gt=last_message_id
+            ).select_related('sender').order_by('message_id')[:limit]
+        )
+    
     @staticmethod
     def get_conversation_messages(
         conversation: Conversation,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        before: Optional[int] = None
     ) -> List[Message]:
         """
-        Get messages for a conversation with pagination
+        Get messages for a conversation with pagination, newest first
+        
+        Pages are read from the (conversation, sent_at, message_id) index.
+        To page back through a long conversation pass `before`, the id of the
+        oldest message already fetched, rather than a growing offset: the
+        page then starts at that message in the index instead of skipping
+        everything newer.
         
         Args:
             conversation: Conversation to get messages for
             limit: Maximum number of messages to return
             offset: Number of messages to skip
+            before: Only return messages older than this message
             
         Returns:
             List of messages
         """
-        return Message.objects.filter(
-            conversation=conversation
-        ).order_by('-sent_at')[offset:offset + limit]
+        messages = Message.objects.filter(conversation=conversation)
+        if before is not None:
+            anchor = models.Subquery(
+                Message.objects.filter(conversation=conversation, message_id=before).order_by().values('sent_at')[:1]
+            )
+            # sent_at <= anchor bounds the index scan; the exclude drops the anchor and its newer ties
+            messages = messages.filter(sent_at__lte=anchor).exclude(sent_at=anchor, message_id__gte=before)
+        return messages.select_related('sender', 'conversation').order_by('-sent_at', '-message_id')[offset:offset + limit]
     
     @staticmethod
     def mark_conversation_messages_read(
@@ -1,3 +1,387 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.mobile_sessions.models import MobileSession
+from . import consumers
+from .consumers import ChatConsumer, MobileChatConsumer
+from .models import Conversation, Message
+from .presence import TypingThrottle, announce_join, announce_leave
+from .receipts import parse_message_ids
+from .services import MessageService
+
+
+def websocket_scope(conversation, query_string=b'', user=None):
+    return {
+        'type': 'websocket',
+        'path': f'/ws/chat/{conversation.pk}/',
+        'query_string': query_string,
+        'headers': [],
+        'subprotocols': [],
+        'url_route': {'kwargs': {'conversation_id': str(conversation.pk)}},
+        'user': user,
+    }
+
+
+async def chat_over_websocket(consumer, scope, content):
+    """Connect, send one chat message and return the chat_message broadcast."""
+    communicator = ApplicationCommunicator(consumer.as_asgi(), scope)
+    await communicator.send_input({'type': 'websocket.connect'})
+    assert (await communicator.receive_output(5))['type'] == 'websocket.accept'
+    await communicator.send_input({
+        'type': 'websocket.receive',
+        'text': json.dumps({'type': 'chat_message', 'content': content}),
+    })
+    while True:
+        event = json.loads((await communicator.receive_output(5))['text'])
+        if event['type'] in ('chat_message', 'error'):
+            break
+    await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+    await communicator.wait(5)
+    return event
+
+
+class ChatConsumerMessageTest(TransactionTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='counsellor@example.com', full_name='Amina Otieno',
+            phone_number='+254700000010', password='testpass123', is_staff=True
+        )
+        self.session = MobileSession.objects.create(device_id='chat-device')
+        self.conversation = Conversation.objects.create(
+            mobile_session=self.session, status='active', assigned_admin=self.admin
+        )
+
+    def test_mobile_message_broadcast_and_counted(self):
+        event = async_to_sync(chat_over_websocket)(
+            MobileChatConsumer, websocket_scope(self.conversation, b'device_id=chat-device'), 'I need help'
+        )
+        self.assertEqual(event['type'], 'chat_message')
+        self.assertEqual(event['message']['content'], 'I need help')
+        self.assertEqual(event['message']['sender_info'], {'type': 'mobile_user', 'device_id': 'chat-device'})
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.last_message, self.conversation.unread_count_admin), ('I need help', 1))
+
+    def test_admin_message_broadcast_with_sender(self):
+        event = async_to_sync(chat_over_websocket)(
+            ChatConsumer, websocket_scope(self.conversation, user=self.admin), 'We are here'
+        )
+        self.assertEqual(event['type'], 'chat_message')
+        self.assertEqual(event['message']['sender_info'], {
+            'id': self.admin.pk, 'username': self.admin.username, 'first_name': 'Amina', 'last_name': 'Otieno',
+        })
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_count_mobile, 1)
+
+    def test_admin_socket_refused_without_staff_access(self):
+        MessageService.create_mobile_message(self.conversation, 'Please call me')
+        outsider = User.objects.create_user(
+            email='outsider@example.com', full_name='Not Staff',
+            phone_number='+254700000011', password='testpass123'
+        )
+
+        async def connect(user):
+            communicator = ApplicationCommunicator(ChatConsumer.as_asgi(), websocket_scope(
+                self.conversation, b'last_message_id=0', user=user
+            ))
+            await communicator.send_input({'type': 'websocket.connect'})
+            closed = await communicator.receive_output(5)
+            # Nothing after the close: no connection frame and no replay
+            self.assertTrue(await communicator.receive_nothing())
+            return closed
+
+        for user in (AnonymousUser(), outsider):
+            self.assertEqual(async_to_sync(connect)(user), {'type': 'websocket.close', 'code': 4004})
+
+    def test_acknowledgement_burst_broadcast_once(self):
+        replies = [
+            MessageService.create_message(self.conversation, f'Reply {n}', 'admin', sender=self.admin)
+            for n in range(3)
+        ]
+
+        async def acknowledge_all():
+            communicator = ApplicationCommunicator(
+                MobileChatConsumer.as_asgi(), websocket_scope(self.conversation, b'device_id=chat-device')
+            )
+            await communicator.send_input({'type': 'websocket.connect'})
+            await communicator.receive_output(5)
+            for reply in replies:
+                await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(
+                    {'type': 'message_status', 'message_id': reply.pk, 'status': 'delivered'}
+                )})
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(
+                {'type': 'read_receipt', 'message_ids': [reply.pk for reply in replies[:2]]}
+            )})
+            events = []
+            while True:
+                event = json.loads((await communicator.receive_output(5))['text'])
+                if event['type'] == 'message_status_batch':
+                    events.append(event)
+                    break
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(5)
+            return events
+
+        [event] = async_to_sync(acknowledge_all)()
+        self.assertEqual(event['delivered'], [replies[2].pk])
+        self.assertEqual(event['read'], [replies[0].pk, replies[1].pk])
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_count_mobile, 1)
+
+
+class MissedMessageReplayTest(TransactionTestCase):
+    def setUp(self):
+        self.session = MobileSession.objects.create(device_id='replay-device')
+        self.conversation = Conversation.objects.create(mobile_session=self.session, status='active')
+        self.messages = [
+            MessageService.create_mobile_message(self.conversation, f'Message {n}') for n in range(5)
+        ]
+        other = Conversation.objects.create(mobile_session=self.session, status='active')
+        MessageService.create_mobile_message(other, 'Elsewhere')
+
+    def replay(self, last_message_id):
+        """The missed_messages frames sent on connect, as (message ids, has_more)"""
+        async def connect():
+            communicator = ApplicationCommunicator(MobileChatConsumer.as_asgi(), websocket_scope(
+                self.conversation, f'device_id=replay-device&last_message_id={last_message_id}'.encode()
+            ))
+            await communicator.send_input({'type': 'websocket.connect'})
+            frames = []
+            while True:
+                output = await communicator.receive_output(5)
+                if output['type'] != 'websocket.send':
+                    continue
+                event = json.loads(output['text'])
+                if event['type'] == 'missed_messages':
+                    frames.append(([message['message_id'] for message in event['messages']], event['has_more']))
+                    if not event['has_more'] or sum(len(ids) for ids, _ in frames) >= consumers.REPLAY_MAX_MESSAGES:
+                        break
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(5)
+            return frames
+        return async_to_sync(connect)()
+
+    @mock.patch.object(consumers, 'REPLAY_BATCH_SIZE', 3)
+    def test_missed_messages_replayed_in_batches(self):
+        ids = [message.pk for message in self.messages]
+        self.assertEqual(self.replay(ids[0]), [(ids[1:4], True), (ids[4:], False)])
+        self.assertEqual(self.replay(ids[-1]), [([], False)])
+
+    @mock.patch.object(consumers, 'REPLAY_BATCH_SIZE', 3)
+    @mock.patch.object(consumers, 'REPLAY_MAX_MESSAGES', 2)
+    def test_replay_capped(self):
+        self.assertEqual(self.replay(0), [([self.messages[0].pk, self.messages[1].pk], True)])
+
+    def test_failed_replay_closes_and_leaves_the_room(self):
+        async def connect():
+            communicator = ApplicationCommunicator(MobileChatConsumer.as_asgi(), websocket_scope(
+                self.conversation, b'device_id=replay-device&last_message_id=0'
+            ))
+            await communicator.send_input({'type': 'websocket.connect'})
+            while True:
+                output = await communicator.receive_output(5)
+                if output['type'] == 'websocket.close':
+                    break
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': output['code']})
+            await communicator.wait(5)
+            return output['code']
+
+        failure = mock.patch.object(
+            consumers.MissedMessagesMixin, 'get_missed_messages', side_effect=DatabaseError
+        )
+        with failure, self.assertLogs('apps.chat.consumers', 'ERROR'):
+            self.assertEqual(async_to_sync(connect)(), 4005)
+        self.assertFalse(get_channel_layer().groups.get(f'chat_{self.conversation.pk}'))
+
+
+class MessageIngestTest(TestCase):
+    def setUp(self):
+        self.session = MobileSession.objects.create(device_id='ingest-device')
+        admin = User.objects.create_user(
+            email='admin@example.com', full_name='Admin User',
+            phone_number='+254700000011', password='testpass123', is_staff=True
+        )
+        self.conversation = Conversation.objects.create(
+            mobile_session=self.session, status='active', assigned_admin=admin
+        )
+
+    def test_message_stored_with_one_conversation_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            message = MessageService.create_mobile_message(self.conversation, 'Hello')
+            payload = MessageService.broadcast_payload(message, self.conversation)
+        # The insert and one conversation UPDATE; savepoints come from the test's own transaction
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+        self.assertEqual(payload['sender_info']['device_id'], 'ingest-device')
+
+    def test_unread_count_survives_stale_copies(self):
+        # Two consumers holding their own copy of the conversation
+        other_copy = Conversation.objects.get(pk=self.conversation.pk)
+        MessageService.create_mobile_message(self.conversation, 'First')
+        MessageService.create_mobile_message(other_copy, 'Second')
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_count_admin, 2)
+        self.assertEqual(self.conversation.last_message, 'Second')
+
+
+class MessageStatusBatchTest(TestCase):
+    def setUp(self):
+        session = MobileSession.objects.create(device_id='status-device')
+        self.conversation = Conversation.objects.create(mobile_session=session, status='active')
+        self.messages = [
+            MessageService.create_mobile_message(self.conversation, f'Message {n}') for n in range(3)
+        ]
+        other = Conversation.objects.create(mobile_session=session, status='active')
+        self.foreign = MessageService.create_mobile_message(other, 'Elsewhere')
+
+    def test_batch_applied_in_three_statements(self):
+        first, second, third = [message.pk for message in self.messages]
+        with CaptureQueriesContext(connection) as queries:
+            changed = MessageService.apply_message_statuses(
+                self.conversation.pk, [first, second], [second, third, self.foreign.pk]
+            )
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'UPDATE'])
+        self.assertEqual(changed, {'delivered': [first], 'read': [second, third]})
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_count_admin, 1)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'sent')
+
+        # Acknowledging again changes nothing and is not counted twice
+        self.assertEqual(
+            MessageService.apply_message_statuses(self.conversation.pk, [first], [second]),
+            {'delivered': [], 'read': []}
+        )
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.unread_count_admin, 1)
+
+    def test_message_ids_parsed_leniently(self):
+        self.assertEqual(parse_message_ids([1, '2', None, 'x', 2]), {1, 2})
+
+
+class MessageHistoryPagingTest(TestCase):
+    def setUp(self):
+        session = MobileSession.objects.create(device_id='history-device')
+        self.conversation = Conversation.objects.create(mobile_session=session, status='active')
+        sent_at = timezone.now()
+        # Pairs of messages share a sent_at, so pages have to break ties by id
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation, content=f'Message {n}', sender_type='mobile',
+                sent_at=sent_at + timedelta(seconds=n // 2)
+            )
+            for n in range(7)
+        ]
+
+    def test_pages_before_cursor_cover_history_once(self):
+        ids, before = [], None
+        while True:
+            page = [m.pk for m in MessageService.get_conversation_messages(self.conversation, limit=2, before=before)]
+            if not page:
+                break
+            ids.extend(page)
+            before = page[-1]
+        self.assertEqual(ids, [message.pk for message in reversed(self.messages)])
+
+    def test_admin_messages_before_cursor(self):
+        newest = self.messages[-1].pk
+        url = f'/chat/admin/conversations/{self.conversation.pk}/messages/'
+        response = self.client.get(url, {'before': newest, 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([m['message_id'] for m in data['results']], [m.pk for m in self.messages[3:6]])
+        self.assertEqual(data['next_before'], self.messages[3].pk)
+        self.assertIsNone(data['count'])
+        self.assertEqual(self.client.get(url).json()['count'], 7)
+        self.assertEqual(self.client.get(url, {'before': newest, 'after': self.messages[0].pk}).status_code, 400)
+
+    def test_admin_messages_first_page_is_newest_and_pages_back(self):
+        url = f'/chat/admin/conversations/{self.conversation.pk}/messages/'
+        data = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual([m['message_id'] for m in data['results']], [m.pk for m in self.messages[4:]])
+        self.assertEqual(data['count'], 7)
+        pages = [data['results']]
+        while data['next_before']:
+            data = self.client.get(url, {'limit': 3, 'before': data['next_before']}).json()
+            pages.insert(0, data['results'])
+        self.assertEqual([m['message_id'] for page in pages for m in page], [m.pk for m in self.messages])
+        # Polling for new messages continues forward, so it has no older cursor
+        data = self.client.get(url, {'limit': 3, 'after': self.messages[0].pk}).json()
+        self.assertEqual([m['message_id'] for m in data['results']], [m.pk for m in self.messages[1:4]])
+        self.assertIsNone(data['next_before'])
+
+
+class RecordingLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, event):
+        self.sent.append(event['type'])
+
+
+class TypingThrottleTest(SimpleTestCase):
+    def test_keystrokes_coalesced_into_changes(self):
+        sent = []
+
+        async def typing():
+            async def send(is_typing):
+                sent.append(is_typing)
+            throttle = TypingThrottle(send, interval=0.05, timeout=10)
+            for _ in range(20):
+                await throttle.update(True)
+            # Stop and start again within the interval: nothing new to report
+            await throttle.update(False)
+            await throttle.update(True)
+            await asyncio.sleep(0.1)
+            await throttle.update(False)
+            await asyncio.sleep(0.1)
+            await throttle.close()
+
+        asyncio.run(typing())
+        self.assertEqual(sent, [True, False])
+
+    def test_silent_sender_reported_stopped(self):
+        sent = []
+
+        async def typing():
+            async def send(is_typing):
+                sent.append(is_typing)
+            throttle = TypingThrottle(send, interval=0, timeout=0.05)
+            await throttle.update(True)
+            await asyncio.sleep(0.1)
+            await throttle.close()
+
+        asyncio.run(typing())
+        self.assertEqual(sent, [True, False])
+
+
+class PresenceDebounceTest(SimpleTestCase):
+    def test_reconnects_and_second_tabs_not_announced(self):
+        layer = RecordingLayer()
+        join, leave = {'type': 'joined'}, {'type': 'left'}
+
+        async def presence():
+            await announce_join(layer, 'chat_presence', 'device:a', join)
+            await announce_join(layer, 'chat_presence', 'device:a', join)
+            await announce_leave(layer, 'chat_presence', 'device:a', leave, grace=0.05)
+            # A reconnect storm
+            for _ in range(10):
+                await announce_leave(layer, 'chat_presence', 'device:a', leave, grace=0.05)
+                await announce_join(layer, 'chat_presence', 'device:a', join)
+            await announce_leave(layer, 'chat_presence', 'device:a', leave, grace=0.05)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(presence())
+        self.assertEqual(layer.sent, ['joined', 'left'])
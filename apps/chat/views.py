@@ -197,6 +197,9 @@ class AdminConversationViewSet(viewsets.ViewSet):
             ),
             openapi.Parameter(
                 'offset', openapi.IN_QUERY, description="Number of messages to skip", type=openapi.TYPE_INTEGER, default=0
+            ),
+            openapi.Parameter(
+                'before', openapi.IN_QUERY, description="Return messages older than this message ID (the oldest one already loaded)", type=openapi.TYPE_INTEGER
             )
         ],
         responses={
@@ -314,7 +317,10 @@ class AdminConversationViewSet(viewsets.ViewSet):
                 'offset', openapi.IN_QUERY, description="Number of messages to skip", type=openapi.TYPE_INTEGER, default=0
             ),
             openapi.Parameter(
-                'after', openapi.IN_QUERY, description="Get messages after this ID", type=openapi.TYPE_INTEGER
+                'after', openapi.IN_QUERY, description="Get messages after this ID, oldest first (not together with before). Without after or before the newest messages are returned", type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'before', openapi.IN_QUERY, description="Get the messages just before this ID (older history). The first page and before pages carry next_before to continue from; before pages have count null", type=openapi.TYPE_INTEGER
             )
         ],
         responses={
@@ -329,29 +335,49 @@ class AdminConversationViewSet(viewsets.ViewSet):
         try:
             limit = int(request.query_params.get('limit', 50))
             offset = int(request.query_params.get('offset', 0))
+            before_id = request.query_params.get('before')
+            before_id = int(before_id) if before_id else None
+            after_id = request.query_params.get('after')
+            after_id = int(after_id) if after_id else None
         except ValueError:
             return Response(
-                {'error': 'limit and offset must be integers'},
+                {'error': 'limit, offset, after and before must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if after_id is not None and before_id is not None:
+            return Response(
+                {'error': 'Use either after or before, not both'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
             conversation = get_object_or_404(Conversation, conversation_id=pk)
             
-            after_id = request.query_params.get('after')
-            
-            queryset = Message.objects.filter(conversation=conversation).order_by('sent_at')
+            queryset = Message.objects.filter(conversation=conversation)
             
-            if after_id:
+            if after_id is not None:
+                # New messages since the client's last one, oldest first
                 queryset = queryset.filter(message_id__gt=after_id)
-            
-            messages = queryset[offset:offset + limit]
+                messages = list(
+                    queryset.select_related('sender', 'conversation').order_by('sent_at', 'message_id')[offset:offset + limit]
+                )
+            else:
+                # The newest page, or with before a keyset page of older history; read
+                # newest first from the index and shown oldest first
+                messages = list(MessageService.get_conversation_messages(
+                    conversation, limit=limit, offset=offset, before=before_id
+                ))[::-1]
+            # Only the first page is counted; older pages follow next_before
+            count = queryset.count() if before_id is None else None
+            # Cursor for the page of older messages, if there may be one
+            next_before = None
+            if after_id is None and messages and len(messages) == limit:
+                next_before = messages[0].message_id
             
             # Debug information
             debug_info = {
                 'conversation_id': pk,
-                'total_messages_in_db': Message.objects.count(),
-                'messages_for_conversation': queryset.count(),
+                'messages_for_conversation': count,
                 'limit': limit,
                 'offset': offset,
                 'actual_messages_returned': len(messages)
@@ -360,9 +386,10 @@ class AdminConversationViewSet(viewsets.ViewSet):
             serializer = MessageSerializer(messages, many=True, context={'request': request})
             return Response({
                 'results': serializer.data,
-                'count': queryset.count(),
+                'count': count,
                 'limit': limit,
                 'offset': offset,
+                'next_before': next_before,
                 'debug': debug_info
             })
         except Http404:
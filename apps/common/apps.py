@@ -0,0 +1,14 @@
+# -*- encoding: utf-8 -*-
+"""
+Common app configuration
+"""
+
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.common'
+
+    def ready(self):
+        import apps.common.signals  # noqa
@@ -0,0 +1,229 @@
+# -*- encoding: utf-8 -*-
+"""
+Stampede-safe cached computations.
+
+The dashboards and statistics endpoints used a plain get-or-compute: when a
+popular entry expired under load, every worker that asked for it in the same
+moment ran the same multi-join aggregate. cached_computation() keeps the
+expensive part to one worker at a time:
+
+* entries are stored with the time they go stale and how long they took to
+  build, and kept in the cache for a further grace period after that;
+* early probabilistic refresh ("XFetch"): shortly before an entry goes
+  stale, a request may rebuild it ahead of time. The odds rise as expiry
+  nears and as the build gets costlier, so one request usually refreshes it
+  before anybody sees it expire;
+* single flight: a rebuild takes a short lock in the shared cache (an atomic
+  cache.add), so only one worker recomputes a key at a time;
+* stale while revalidate: while the lock is held, everybody else is served
+  the stale value. Only when there is no value at all do they wait briefly
+  for the lock holder's result.
+
+Reference data (lookup tables, the geography tree, ApplicationSettings)
+almost never changes but is read on nearly every request. reference_data()
+puts a small per-process LRU in front of the shared cache for it, so a hit
+costs neither a query nor a cache round trip. Entries are keyed on a shared
+"reference data version"; each process re-reads that version at most every
+REFERENCE_VERSION_CHECK_SECONDS, and the signals in apps.common.signals bump
+it on any edit, so other workers drop stale entries within that interval.
+
+get_version() and bump_version() are the shared counters behind these
+schemes; apps.common.conditional derives ETags from them as well.
+
+`stats` counts what happened in this process; benchmark_cache_stampede reads
+it to measure the recompute rate under a synthetic burst.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+
+# XFetch beta: above 1 favours earlier refreshes, below 1 later ones
+EARLY_REFRESH_BETA = 1.0
+LOCK_SECONDS = 30
+# How long a request with nothing to serve waits for another worker's build
+WAIT_SECONDS = 5
+WAIT_INTERVAL = 0.05
+
+REFERENCE_VERSION_KEY = 'reference_data_version'
+REFERENCE_VERSION_CHECK_SECONDS = 5
+REFERENCE_DATA_SECONDS = 3600
+# Documents and music, for the mobile resources list
+RESOURCES_VERSION_KEY = 'resources_version'
+LOCAL_CACHE_MAX_ENTRIES = 256
+
+stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        stats[event] += 1
+
+
+def _rebuild(key, lock_key, build, timeout, stale_seconds):
+    try:
+        started = time.time()
+        value = build()
+        cost = time.time() - started
+        _count('recomputes')
+        cache.set(key, (value, time.time() + timeout, cost), timeout + stale_seconds)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cached_computation(key, build, timeout, stale_seconds=None, beta=EARLY_REFRESH_BETA):
+    """
+    Return build() cached under `key` for `timeout` seconds.
+
+    After that the value may still be served for `stale_seconds` (default:
+    `timeout` again) while one worker rebuilds it. Values must be picklable.
+    """
+    if stale_seconds is None:
+        stale_seconds = timeout
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, fresh_until, cost = entry
+        # -log(U) is exponentially distributed: usually small, occasionally
+        # large enough to pull the refresh ahead of the real expiry
+        if time.time() - cost * beta * math.log(1.0 - random.random()) < fresh_until:
+            _count('hits')
+            return value
+        if not cache.add(lock_key, 1, LOCK_SECONDS):
+            _count('stale_served')
+            return value
+        _count('early_refreshes' if time.time() < fresh_until else 'stale_refreshes')
+        return _rebuild(key, lock_key, build, timeout, stale_seconds)
+
+    if cache.add(lock_key, 1, LOCK_SECONDS):
+        _count('misses')
+        return _rebuild(key, lock_key, build, timeout, stale_seconds)
+
+    # Someone else is building it and there is nothing stale to offer
+    deadline = time.time() + WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            _count('waited')
+            return entry[0]
+    # The lock holder died or is very slow; do not keep the caller waiting
+    _count('wait_timeouts')
+    value = build()
+    _count('recomputes')
+    return value
+
+
+class LocalCache:
+    """Bounded least-recently-used map with per-entry expiry, for one process."""
+
+    def __init__(self, max_entries=LOCAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalCache()
+_reference_version = None
+_reference_checked_at = 0.0
+_version_lock = threading.Lock()
+
+
+def get_version(key):
+    """Current value of the shared data version counter `key`."""
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock, not 1: if the counter is ever evicted, a
+        # restart from 1 could make entries from an old version live again
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Move the counter `key` on and note when, for Last-Modified headers."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not set yet: there is nothing cached under it to invalidate
+        cache.add(key, int(time.time() * 1000), None)
+    cache.set(f'{key}:modified', time.time(), None)
+
+
+def get_version_modified(key):
+    """Epoch seconds of the last bump of `key`, or None if not known."""
+    return cache.get(f'{key}:modified')
+
+
+def get_reference_version():
+    """Shared reference data version, re-read at most every few seconds."""
+    global _reference_version, _reference_checked_at
+    with _version_lock:
+        now = time.monotonic()
+        if _reference_version is not None and now - _reference_checked_at < REFERENCE_VERSION_CHECK_SECONDS:
+            return _reference_version
+        _reference_version, _reference_checked_at = get_version(REFERENCE_VERSION_KEY), now
+        return _reference_version
+
+
+def bump_reference_version():
+    """Retire every cached piece of reference data, here and in other workers."""
+    global _reference_version
+    bump_version(REFERENCE_VERSION_KEY)
+    with _version_lock:
+        _reference_version = None
+    local_cache.clear()
+
+
+def reference_data(key, build, timeout=REFERENCE_DATA_SECONDS):
+    """
+    Return build() for rarely changing reference data, from this process's
+    LRU when possible, else from the shared cache. The value is shared by
+    every caller in the process, so callers must not modify it.
+    """
+    version = get_reference_version()
+    found, value = local_cache.get((version, key))
+    if found:
+        _count('local_hits')
+        return value
+    value = cached_computation(f'reference:v{version}:{key}', build, timeout)
+    local_cache.set((version, key), value, timeout)
+    return value
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+"""
+Conditional GET for API views.
+
+Mobile clients re-fetch lookups, resources and facility pages on every
+screen, and almost always get back exactly what they already hold. The
+views rebuilt and re-serialized the full body each time only to send the
+same bytes again.
+
+conditional_get() asks cheap validator functions for an ETag and a
+Last-Modified time before the view runs. They are derived from data
+versions (see apps.common.cache_utils.get_version), never from the body,
+so a matching If-None-Match or If-Modified-Since is answered with 304
+without touching a serializer. Validators receive the view's arguments and
+return None when they cannot vouch for the response (the view then runs
+as usual, e.g. to produce a 404).
+
+An ETag validator returns the parts the response depends on (versions, the
+absolute URL including its query string, anything else it varies with);
+they are hashed into a strong ETag. Last-Modified validators return epoch
+seconds. Only 200 responses are tagged.
+
+Views that keep a pre-compressed body check accepts_gzip() before sending
+it; it honours q-values, so "gzip;q=0" gets the plain body.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Strong ETag from the string forms of `parts`."""
+    digest = hashlib.md5('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def accepts_gzip(request):
+    """Whether the request's Accept-Encoding allows a gzip-encoded body."""
+    qualities = {}
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+# Let clients keep the body but ask before reusing it
+REVALIDATE = {'private': True, 'no_cache': True}
+
+
+def conditional_get(etag=None, last_modified=None, on_not_modified=None, cache_control=REVALIDATE):
+    """
+    Decorate a view method so GET and HEAD revalidate against validators.
+
+    `etag(request, *args, **kwargs)` returns a tuple of parts or None;
+    `last_modified(...)` returns epoch seconds or None. `on_not_modified`
+    is called with the request when a 304 replaces the view, for side
+    effects the view would otherwise have had. `cache_control` goes on
+    both the 200 and the 304, unless the view set its own header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(self, request, *args, **kwargs)
+
+            parts = etag(request, *args, **kwargs) if etag else None
+            tag = make_etag(*parts) if parts is not None else None
+            modified = last_modified(request, *args, **kwargs) if last_modified else None
+            modified = int(modified) if modified is not None else None
+
+            response = get_conditional_response(request, etag=tag, last_modified=modified)
+            if response is None:
+                response = view(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            elif on_not_modified:
+                on_not_modified(request)
+
+            if tag and not response.has_header('ETag'):
+                response['ETag'] = tag
+            if modified is not None and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(modified)
+            if cache_control and not response.has_header('Cache-Control'):
+                patch_cache_control(response, **cache_control)
+            return response
+        return wrapper
+    return decorator
@@ -3,6 +3,7 @@
 Context processors for common app
 """
 
+from .cache_utils import reference_data
 from .models import ApplicationSettings
 
 
@@ -32,16 +33,22 @@ def chat_notifications(request):
         }
 
 
+def _load_application_settings():
+    settings = ApplicationSettings.get_settings()
+    return {
+        'app_settings': settings,
+        'theme_css_variables': settings.get_theme_css_variables(),
+    }
+
+
 def application_settings(request):
     """
     Add application settings to template context
     """
     try:
-        settings = ApplicationSettings.get_settings()
-        return {
-            'app_settings': settings,
-            'theme_css_variables': settings.get_theme_css_variables(),
-        }
+        # Rendered on every page: kept in this worker's memory, and dropped
+        # within seconds of an edit through the reference data version
+        return reference_data('application_settings', _load_application_settings)
     except Exception:
         # Return default values if settings can't be loaded
         return {
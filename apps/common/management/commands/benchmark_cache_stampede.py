@@ -0,0 +1,112 @@
+"""
+Measure how often a cached aggregate is recomputed under a request burst.
+
+Threads stand in for gunicorn workers: they share the configured cache and
+ask for the same key in a tight loop while its entry keeps expiring. Each
+recomputation sleeps for --cost seconds, like a slow aggregate query. The
+command runs the burst twice, first with the old get-or-compute pattern and
+then with cached_computation(), and reports recomputations per expiry and
+request latency for both.
+
+Nothing is written to the database. With a per-process cache (LocMemCache)
+the threads still share it, so the numbers hold for one worker's threads;
+against Redis or Memcached they hold across workers.
+
+Usage:
+    python manage.py benchmark_cache_stampede
+    python manage.py benchmark_cache_stampede --threads 64 --ttl 30 --cost 0.2 --duration 120
+
+Keep --ttl well above --cost, as in production (300 s entries, sub-second
+aggregates). At extreme request rates the early refresh fires about
+cost * ln(requests per second) before expiry.
+"""
+import statistics
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from apps.common import cache_utils
+from apps.common.cache_utils import cached_computation
+
+
+def _ms(samples):
+    """Return (p50, p95, max) of a list of seconds, in milliseconds."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return statistics.median(ordered) * 1000, p95 * 1000, ordered[-1] * 1000
+
+
+def _get_or_compute(key, build, timeout):
+    """The pattern the statistics helpers used before cached_computation."""
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+class Command(BaseCommand):
+    help = "Benchmark recomputation rates of cached aggregates under a burst."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=32, help="Concurrent clients (default: %(default)s)")
+        parser.add_argument("--duration", type=float, default=20.0, help="Seconds per run (default: %(default)s)")
+        parser.add_argument("--ttl", type=float, default=5.0, help="Entry lifetime in seconds (default: %(default)s)")
+        parser.add_argument("--cost", type=float, default=0.05, help="Seconds per recomputation (default: %(default)s)")
+
+    def _burst(self, fetch, options, key):
+        recomputes = []
+        timings = []
+        lock = threading.Lock()
+
+        def build():
+            time.sleep(options["cost"])
+            with lock:
+                recomputes.append(time.perf_counter())
+            return {'total_facilities': len(recomputes)}
+
+        def client():
+            own = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                fetch(key, build, options["ttl"])
+                own.append(time.perf_counter() - started)
+            with lock:
+                timings.extend(own)
+
+        cache.delete(key)
+        deadline = time.perf_counter() + options["duration"]
+        threads = [threading.Thread(target=client) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        cache.delete(key)
+        return len(recomputes), timings
+
+    def _report(self, label, recomputes, timings, options):
+        expiries = max(1.0, options["duration"] / options["ttl"])
+        p50, p95, worst = _ms(timings)
+        self.stdout.write(
+            f"{label}: {len(timings)} requests, {recomputes} recomputations "
+            f"({recomputes / expiries:.1f} per expiry); "
+            f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, max {worst:.0f} ms"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['threads']} threads for {options['duration']:.0f} s, "
+            f"ttl {options['ttl']} s, recompute cost {options['cost'] * 1000:.0f} ms"
+        )
+
+        recomputes, timings = self._burst(_get_or_compute, options, 'benchmark_stampede_plain')
+        self._report("get-or-compute     ", recomputes, timings, options)
+
+        cache_utils.stats.clear()
+        recomputes, timings = self._burst(cached_computation, options, 'benchmark_stampede_guarded')
+        self._report("cached_computation ", recomputes, timings, options)
+        self.stdout.write(
+            "  " + ", ".join(f"{event} {count}" for event, count in sorted(cache_utils.stats.items()))
+        )
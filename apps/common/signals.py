@@ -0,0 +1,47 @@
+# -*- encoding: utf-8 -*-
+"""
+Signal handlers for common app
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from apps.documents.models import Document
+from apps.geography.models import Constituency, County, Ward
+from apps.lookups.models import (
+    ConditionStatus, ContactType, DocumentType, GBVCategory, InfrastructureType,
+    OperationalStatus, OwnerType, ServiceCategory
+)
+from apps.music.models import Music
+
+from .cache_utils import RESOURCES_VERSION_KEY, bump_reference_version, bump_version
+from .models import ApplicationSettings
+
+# Models whose rows are served through reference_data()
+REFERENCE_MODELS = [
+    ApplicationSettings,
+    County, Constituency, Ward,
+    ConditionStatus, ContactType, DocumentType, GBVCategory, InfrastructureType,
+    OperationalStatus, OwnerType, ServiceCategory,
+]
+
+
+def reference_data_changed(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_reference_version)
+
+
+for model in REFERENCE_MODELS:
+    post_save.connect(reference_data_changed, sender=model, dispatch_uid=f'reference_data_saved_{model.__name__}')
+    post_delete.connect(reference_data_changed, sender=model, dispatch_uid=f'reference_data_deleted_{model.__name__}')
+
+
+def resources_changed(sender, raw=False, **kwargs):
+    """Moves the ETag of the mobile resources list."""
+    if not raw:
+        transaction.on_commit(lambda: bump_version(RESOURCES_VERSION_KEY))
+
+
+for model in (Document, Music):
+    post_save.connect(resources_changed, sender=model, dispatch_uid=f'resources_saved_{model.__name__}')
+    post_delete.connect(resources_changed, sender=model, dispatch_uid=f'resources_deleted_{model.__name__}')
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from apps.lookups.models import ContactType
+
+from .cache_utils import LocalCache, cached_computation, reference_data
+
+
+class CachedComputationTest(SimpleTestCase):
+    def setUp(self):
+        self.builds = []
+        cache.delete_many(['test_cached_computation', 'test_cached_computation:lock'])
+
+    def build(self):
+        self.builds.append(1)
+        return len(self.builds)
+
+    def test_value_is_built_once_while_fresh(self):
+        self.assertEqual(cached_computation('test_cached_computation', self.build, 60), 1)
+        self.assertEqual(cached_computation('test_cached_computation', self.build, 60), 1)
+        self.assertEqual(len(self.builds), 1)
+
+    def test_stale_value_served_while_another_worker_rebuilds(self):
+        cache.set('test_cached_computation', ('old', 0, 0.0), 60)
+        cache.add('test_cached_computation:lock', 1, 30)
+        self.assertEqual(cached_computation('test_cached_computation', self.build, 60), 'old')
+        self.assertEqual(self.builds, [])
+
+    def test_stale_value_rebuilt_by_lock_holder(self):
+        cache.set('test_cached_computation', ('old', 0, 0.0), 60)
+        self.assertEqual(cached_computation('test_cached_computation', self.build, 60), 1)
+        self.assertIsNone(cache.get('test_cached_computation:lock'))
+
+
+class LocalCacheTest(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        local = LocalCache(max_entries=2)
+        local.set('a', 1, 60)
+        local.set('b', 2, 60)
+        local.get('a')
+        local.set('c', 3, 60)
+        self.assertEqual(local.get('a'), (True, 1))
+        self.assertEqual(local.get('b'), (False, None))
+
+    def test_expired_entry_is_a_miss(self):
+        local = LocalCache()
+        local.set('a', None, -1)
+        self.assertEqual(local.get('a'), (False, None))
+
+
+class ReferenceDataTest(TestCase):
+    def test_lookup_edit_replaces_cached_reference_data(self):
+        def names():
+            return list(ContactType.objects.values_list('type_name', flat=True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            contact_type = ContactType.objects.create(type_name='Phone')
+        self.assertEqual(reference_data('test_contact_types', names), ['Phone'])
+        contact_type.type_name = 'SMS'
+        with self.captureOnCommitCallbacks(execute=True):
+            contact_type.save()
+        self.assertEqual(reference_data('test_contact_types', names), ['SMS'])
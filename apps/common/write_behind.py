@@ -0,0 +1,266 @@
+# -*- encoding: utf-8 -*-
+"""
+Write-behind queue for high-volume, fire-and-forget inserts.
+
+Contact interactions, music plays, feature usage and audit rows are written
+for reporting only; nobody reads them back in the request that produced
+them. Inserting them inline costs each request a round trip and a commit,
+and under load those inserts queue up behind (and slow down) the writes
+that matter. write_behind.enqueue(instance) hands an unsaved model instance
+to a bounded queue in this process instead. A background flusher thread
+takes up to WRITE_BEHIND_BATCH_SIZE rows at a time and writes them with one
+bulk_create per model:
+
+* a batch is written when it is full or WRITE_BEHIND_FLUSH_SECONDS after its
+  first row arrived, whichever comes first;
+* when the queue is full, enqueue() waits up to WRITE_BEHIND_BLOCK_SECONDS
+  for room (backpressure) and then drops the row, counting it;
+* the queue is drained when the process exits: gunicorn's worker_exit hook
+  (see gunicorn-cfg.py) calls stop(), which covers max_requests recycling
+  and graceful restarts, and an atexit handler covers everything else;
+* when a batch fails, its rows are retried one at a time, so one bad row
+  does not lose the others; rows that still fail are logged and counted.
+  Each attempt is atomic (a savepoint when the caller is in a
+  transaction), so a failure leaves no partial batch and does not break
+  the caller's transaction.
+
+Models that need more than an insert register a writer: register_writer()
+maps a model to a function that receives a list of its instances. Work
+that must only happen once the rows exist (such as remembering them for
+deduplication) belongs in the writer too.
+
+stats() reports queue depth, counters and flush latency for this process;
+the monitoring app serves them (monitoring.views.write_behind_metrics, and
+within application_metrics).
+
+With WRITE_BEHIND_ENABLED = False, as in the test settings, rows are
+written immediately in the caller's thread.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MAX_SIZE = getattr(settings, 'WRITE_BEHIND_MAX_SIZE', 10000)
+WRITE_BEHIND_BATCH_SIZE = getattr(settings, 'WRITE_BEHIND_BATCH_SIZE', 500)
+WRITE_BEHIND_FLUSH_SECONDS = getattr(settings, 'WRITE_BEHIND_FLUSH_SECONDS', 2.0)
+WRITE_BEHIND_BLOCK_SECONDS = getattr(settings, 'WRITE_BEHIND_BLOCK_SECONDS', 0.05)
+STOP_TIMEOUT_SECONDS = 10
+
+_writers = {}
+
+
+def register_writer(model, writer):
+    """Write queued `model` instances with writer(instances) instead of bulk_create."""
+    _writers[model] = writer
+
+
+def _bulk_create(model, instances):
+    model.objects.bulk_create(instances, batch_size=WRITE_BEHIND_BATCH_SIZE)
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue of model instances, flushed in batches."""
+
+    def __init__(self, max_size=WRITE_BEHIND_MAX_SIZE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_seconds=WRITE_BEHIND_FLUSH_SECONDS, block_seconds=WRITE_BEHIND_BLOCK_SECONDS,
+                 autostart=True):
+        self.autostart = autostart
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.block_seconds = block_seconds
+        self._queue = queue.Queue(maxsize=max_size)
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._flush_ms = {'last': 0.0, 'max': 0.0, 'total': 0.0}
+
+    def _count(self, event, amount=1):
+        with self._counters_lock:
+            self._counters[event] += amount
+
+    def enqueue(self, instance):
+        """Queue an unsaved model instance for insertion. False if dropped."""
+        if not getattr(settings, 'WRITE_BEHIND_ENABLED', True):
+            self.write([instance])
+            return True
+        if self.autostart:
+            self._ensure_started()
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            self._count('blocked')
+            try:
+                self._queue.put(instance, timeout=self.block_seconds)
+            except queue.Full:
+                self._count('dropped')
+                logger.warning("Write-behind queue full; dropped a %s", type(instance).__name__)
+                return False
+        self._count('enqueued')
+        return True
+
+    def enqueue_many(self, instances):
+        """
+        Queue `instances` in order. Returns how many were queued: when the
+        queue fills up the rest are dropped, so the caller can report them.
+        """
+        instances = list(instances)
+        if not getattr(settings, 'WRITE_BEHIND_ENABLED', True):
+            self.write(instances)
+            return len(instances)
+        for queued, instance in enumerate(instances):
+            if not self.enqueue(instance):
+                self._count('dropped', len(instances) - queued - 1)
+                return queued
+        return len(instances)
+
+    def write(self, instances):
+        """Write `instances` now, grouped by model. Returns rows written."""
+        by_model = {}
+        for instance in instances:
+            by_model.setdefault(type(instance), []).append(instance)
+        written = 0
+        started = time.perf_counter()
+        for model, rows in by_model.items():
+            writer = _writers.get(model) or (lambda rows, model=model: _bulk_create(model, rows))
+            try:
+                written += self._attempt(writer, rows)
+            except Exception:
+                if len(rows) == 1:
+                    logger.exception("Write-behind could not write a %s row", model.__name__)
+                    self._count('failed')
+                    continue
+                logger.warning("Write-behind could not write %d %s rows; retrying one at a time",
+                               len(rows), model.__name__, exc_info=True)
+                self._count('retried', len(rows))
+                for row in rows:
+                    try:
+                        written += self._attempt(writer, [row])
+                    except Exception:
+                        logger.exception("Write-behind could not write a %s row", model.__name__)
+                        self._count('failed')
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._counters_lock:
+            self._counters['written'] += written
+            self._counters['flushes'] += 1
+            self._flush_ms['last'] = elapsed
+            self._flush_ms['max'] = max(self._flush_ms['max'], elapsed)
+            self._flush_ms['total'] += elapsed
+        return written
+
+    @staticmethod
+    def _attempt(writer, rows):
+        with transaction.atomic():
+            writer(rows)
+        return len(rows)
+
+    def _take_batch(self, wait=0):
+        """
+        Up to batch_size queued rows. With `wait`, block up to that long for
+        the first row, then up to flush_seconds more for the batch to fill.
+        """
+        try:
+            batch = [self._queue.get(timeout=wait) if wait else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds if wait else 0
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Take whatever else is already waiting, without blocking
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far, in the caller's thread."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return written
+                written += self.write(batch)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch(wait=self.flush_seconds)
+            if not batch:
+                continue
+            close_old_connections()
+            with self._flush_lock:
+                self.write(batch)
+        close_old_connections()
+
+    def _ensure_started(self):
+        # Threads do not survive a fork: a worker forked from a preloaded
+        # master starts its own flusher on first use
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT_SECONDS):
+        """Stop the flusher and write whatever is still queued."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        self._thread = None
+        written = self.flush()
+        close_old_connections()
+        return written
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self._counters)
+            flush_ms = dict(self._flush_ms)
+        flushes = counters.get('flushes', 0)
+        return {
+            'pid': os.getpid(),
+            'running': self._thread is not None and self._thread.is_alive(),
+            'depth': self._queue.qsize(),
+            'capacity': self._queue.maxsize,
+            'enqueued': counters.get('enqueued', 0),
+            'written': counters.get('written', 0),
+            'blocked': counters.get('blocked', 0),
+            'dropped': counters.get('dropped', 0),
+            'retried': counters.get('retried', 0),
+            'failed': counters.get('failed', 0),
+            'flushes': flushes,
+            'flush_ms': {
+                'last': round(flush_ms['last'], 2),
+                'max': round(flush_ms['max'], 2),
+                'avg': round(flush_ms['total'] / flushes, 2) if flushes else 0.0,
+            },
+        }
+
+
+write_behind = WriteBehindQueue()
+atexit.register(write_behind.stop)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FacilitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.facilities'
+
+    def ready(self):
+        import apps.facilities.signals  # noqa
@@ -1,17 +1,34 @@
 # -*- encoding: utf-8 -*-
 """
 Caching utilities for facilities app to handle millions of records efficiently
+
+Cached facility data is invalidated by version rather than by deleting keys.
+A global "facility data version" counter and one counter per county live in
+the cache; every key built by versioned_key() embeds the current value, so
+bumping a counter makes the old entries unreachable and they simply expire.
+Nothing has to enumerate keys, which most cache backends cannot do.
+
+Edits bump the global counter and the counters of the counties involved
+(signals cover the admin, the facility forms and the API alike). Responses
+filtered to one county are keyed on that county's counter, so they stay
+warm while other counties are being edited.
+
+Everything is built through apps.common.cache_utils.cached_computation, so
+an expiring entry is rebuilt by one worker while the rest serve it stale.
 """
 
-from django.core.cache import cache
-from django.conf import settings
-from django.db.models import Count, Q
-from .models import Facility, FacilityCoordinate
-from apps.geography.models import County
-from apps.lookups.models import OperationalStatus
-import json
 import hashlib
 
+from django.db import transaction
+from django.db.models import Count
+from .models import Facility
+from .search import search_facilities
+from apps.common.cache_utils import bump_version, cached_computation, get_version, get_version_modified
+from apps.geography.models import County
+
+FACILITY_VERSION_KEY = 'facility_data_version'
+COUNTY_VERSION_KEY = 'facility_data_version:county:{}'
+
 
 def get_cache_key(prefix, **kwargs):
     """Generate a consistent cache key from parameters"""
@@ -21,12 +38,51 @@ def get_cache_key(prefix, **kwargs):
     return hashlib.md5(key_string.encode()).hexdigest()
 
 
+def _version_key(county_id=None):
+    return FACILITY_VERSION_KEY if county_id is None else COUNTY_VERSION_KEY.format(county_id)
+
+
+def get_data_version(county_id=None):
+    """Current facility data version, globally or for one county."""
+    return get_version(_version_key(county_id))
+
+
+def get_data_modified(county_id=None):
+    """Epoch seconds of the last facility edit, globally or in one county."""
+    return get_version_modified(_version_key(county_id))
+
+
+def bump_facility_version(*county_ids):
+    """Move the global counter and those of `county_ids` past their cached entries."""
+    bump_version(_version_key())
+    for county_id in set(county_ids):
+        bump_version(_version_key(county_id))
+
+
+def versioned_key(prefix, county_id=None, **kwargs):
+    """
+    Cache key for `prefix` and parameters that embeds the data version, of
+    `county_id` when the data is limited to one county, else the global one.
+    """
+    try:
+        scope = int(county_id) if county_id not in (None, '') else None
+    except (TypeError, ValueError):
+        # Not a county ID: the filter matches nothing county-specific
+        scope = None
+    version = get_data_version(scope)
+    return f"{prefix}:v{version}:{get_cache_key(prefix, county_id=county_id, **kwargs)}"
+
+
+def cached_facility_data(prefix, timeout, build, county_id=None, **kwargs):
+    """Return build() through the versioned, stampede-safe cache."""
+    return cached_computation(versioned_key(prefix, county_id=county_id, **kwargs), build, timeout)
+
+
 def get_facility_statistics():
     """Get cached facility statistics"""
-    cache_key = 'facility_statistics'
-    cached_stats = cache.get(cache_key)
+    cache_key = versioned_key('facility_statistics')
     
-    if cached_stats is None:
+    def build():
         # Calculate statistics
         total_facilities = Facility.objects.filter(is_active=True).count()
         operational_facilities = Facility.objects.filter(
@@ -36,9 +92,8 @@ def get_facility_statistics():
         counties_count = County.objects.count()
         facilities_with_coordinates = Facility.objects.filter(
             is_active=True,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False
-        ).distinct().count()
+            has_coordinates=True
+        ).count()
         
         cached_stats = {
             'total_facilities': total_facilities,
@@ -47,18 +102,17 @@ def get_facility_statistics():
             'facilities_with_coordinates': facilities_with_coordinates,
         }
         
-        # Cache for 5 minutes
-        cache.set(cache_key, cached_stats, 300)
+        return cached_stats
     
-    return cached_stats
+    # Cache for 5 minutes
+    return cached_computation(cache_key, build, 300)
 
 
 def get_facilities_by_county():
     """Get cached facilities count by county"""
-    cache_key = 'facilities_by_county'
-    cached_data = cache.get(cache_key)
+    cache_key = versioned_key('facilities_by_county')
     
-    if cached_data is None:
+    def build():
         facilities_by_county = Facility.objects.filter(
             is_active=True
         ).values(
@@ -69,18 +123,17 @@ def get_facilities_by_county():
         
         cached_data = list(facilities_by_county)
         
-        # Cache for 10 minutes
-        cache.set(cache_key, cached_data, 600)
+        return cached_data
     
-    return cached_data
+    # Cache for 10 minutes
+    return cached_computation(cache_key, build, 600)
 
 
 def get_facilities_by_status():
     """Get cached facilities count by operational status"""
-    cache_key = 'facilities_by_status'
-    cached_data = cache.get(cache_key)
+    cache_key = versioned_key('facilities_by_status')
     
-    if cached_data is None:
+    def build():
         facilities_by_status = Facility.objects.filter(
             is_active=True
         ).values('operational_status__status_name').annotate(
@@ -89,15 +142,15 @@ def get_facilities_by_status():
         
         cached_data = {item['operational_status__status_name']: item['count'] for item in facilities_by_status}
         
-        # Cache for 10 minutes
-        cache.set(cache_key, cached_data, 600)
+        return cached_data
     
-    return cached_data
+    # Cache for 10 minutes
+    return cached_computation(cache_key, build, 600)
 
 
 def get_facilities_in_viewport(ne_lat, ne_lng, sw_lat, sw_lng, zoom_level=7, **filters):
     """Get cached facilities in a specific viewport"""
-    cache_key = get_cache_key(
+    cache_key = versioned_key(
         'facilities_viewport',
         ne_lat=ne_lat,
         ne_lng=ne_lng,
@@ -107,22 +160,19 @@ def get_facilities_in_viewport(ne_lat, ne_lng, sw_lat, sw_lng, zoom_level=7, **f
         **filters
     )
     
-    cached_data = cache.get(cache_key)
-    
-    if cached_data is None:
+    def build():
         # Build queryset
         queryset = Facility.objects.filter(
             is_active=True,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False,
-            facilitycoordinate__latitude__gte=float(sw_lat),
-            facilitycoordinate__latitude__lte=float(ne_lat),
-            facilitycoordinate__longitude__gte=float(sw_lng),
-            facilitycoordinate__longitude__lte=float(ne_lng)
+            has_coordinates=True,
+            primary_latitude__gte=float(sw_lat),
+            primary_latitude__lte=float(ne_lat),
+            primary_longitude__gte=float(sw_lng),
+            primary_longitude__lte=float(ne_lng)
         ).select_related(
             'ward__constituency__county',
             'operational_status'
-        ).prefetch_related('facilitycoordinate_set')
+        )
         
         # Apply additional filters
         if 'county_id' in filters:
@@ -141,57 +191,49 @@ def get_facilities_in_viewport(ne_lat, ne_lng, sw_lat, sw_lng, zoom_level=7, **f
         # Serialize data
         facilities_data = []
         for facility in queryset:
-            coords = facility.facilitycoordinate_set.filter(is_active=True).first()
-            if coords:
-                facilities_data.append({
-                    'facility': {
-                        'facility_id': facility.facility_id,
-                        'facility_name': facility.facility_name,
-                        'registration_number': facility.registration_number,
-                        'ward': {
-                            'ward_name': facility.ward.ward_name,
-                            'constituency': {
-                                'county': {
-                                    'county_name': facility.ward.constituency.county.county_name
-                                }
+            facilities_data.append({
+                'facility': {
+                    'facility_id': facility.facility_id,
+                    'facility_name': facility.facility_name,
+                    'registration_number': facility.registration_number,
+                    'ward': {
+                        'ward_name': facility.ward.ward_name,
+                        'constituency': {
+                            'county': {
+                                'county_name': facility.ward.constituency.county.county_name
                             }
-                        },
-                        'operational_status': {
-                            'status_name': facility.operational_status.status_name
                         }
                     },
-                    'coordinates': {
-                        'latitude': float(coords.latitude),
-                        'longitude': float(coords.longitude)
+                    'operational_status': {
+                        'status_name': facility.operational_status.status_name
                     }
-                })
+                },
+                'coordinates': {
+                    'latitude': float(facility.primary_latitude),
+                    'longitude': float(facility.primary_longitude)
+                }
+            })
         
         cached_data = facilities_data
         
-        # Cache for 2 minutes (shorter for viewport data)
-        cache.set(cache_key, cached_data, 120)
+        return cached_data
     
-    return cached_data
+    # Cache for 2 minutes (shorter for viewport data)
+    return cached_computation(cache_key, build, 120)
 
 
-def invalidate_facility_cache():
-    """Invalidate all facility-related cache"""
-    cache_keys = [
-        'facility_statistics',
-        'facilities_by_county',
-        'facilities_by_status',
-    ]
-    
-    for key in cache_keys:
-        cache.delete(key)
-    
-    # Clear viewport cache patterns
-    cache.delete_many(cache.keys('facilities_viewport:*'))
+def invalidate_facility_cache(*county_ids):
+    """
+    Invalidate facility-related cache, globally and for `county_ids`. Inside
+    a transaction this waits for the commit, so no request can cache the old
+    rows under the new version.
+    """
+    transaction.on_commit(lambda: bump_facility_version(*county_ids))
 
 
 def get_paginated_facilities(page=1, page_size=50, search_query='', **filters):
     """Get cached paginated facilities"""
-    cache_key = get_cache_key(
+    cache_key = versioned_key(
         'facilities_paginated',
         page=page,
         page_size=page_size,
@@ -199,9 +241,7 @@ def get_paginated_facilities(page=1, page_size=50, search_query='', **filters):
         **filters
     )
     
-    cached_data = cache.get(cache_key)
-    
-    if cached_data is None:
+    def build():
         from django.core.paginator import Paginator
         
         # Build queryset
@@ -217,13 +257,7 @@ def get_paginated_facilities(page=1, page_size=50, search_query='', **filters):
         
         # Apply search
         if search_query:
-            queryset = queryset.filter(
-                Q(facility_name__icontains=search_query) |
-                Q(registration_number__icontains=search_query) |
-                Q(ward__ward_name__icontains=search_query) |
-                Q(ward__constituency__constituency_name__icontains=search_query) |
-                Q(ward__constituency__county__county_name__icontains=search_query)
-            )
+            queryset = search_facilities(queryset, search_query, rank=True)
         
         # Apply filters
         if 'county_id' in filters:
@@ -231,8 +265,9 @@ def get_paginated_facilities(page=1, page_size=50, search_query='', **filters):
         if 'status_id' in filters:
             queryset = queryset.filter(operational_status_id=filters['status_id'])
         
-        # Order and paginate
-        queryset = queryset.order_by('facility_id')
+        # Order and paginate (searches are already in relevance order)
+        if not search_query:
+            queryset = queryset.order_by('facility_id')
         paginator = Paginator(queryset, page_size)
         
         try:
@@ -259,7 +294,7 @@ def get_paginated_facilities(page=1, page_size=50, search_query='', **filters):
                 'next_page_number': None,
             }
         
-        # Cache for 5 minutes
-        cache.set(cache_key, cached_data, 300)
+        return cached_data
     
-    return cached_data
+    # Cache for 5 minutes
+    return cached_computation(cache_key, build, 300)
@@ -0,0 +1,185 @@
+# -*- encoding: utf-8 -*-
+"""
+Zoom-aware clustering of facilities for the mobile map.
+
+Below street level the map cannot show thousands of separate pins anyway, so
+instead of shipping raw points the endpoint can return one marker per grid
+cell with a count and the centroid of its members. Cells are sized to the
+zoom level, about a quarter of a 256 px tile on each side. Cells holding a
+single facility come back as plain points. From CLUSTER_MAX_ZOOM upwards
+every facility is a point.
+
+The cells for every zoom band are built once from the points already held by
+the spatial index, so panning only reads the cells under the viewport. The
+cluster index is rebuilt whenever get_spatial_index() hands back a new grid,
+and so shares its freshness rules.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from .spatial_index import get_spatial_index
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_MIN_ZOOM = 1
+CLUSTER_MAX_ZOOM = 16
+# Fraction of a tile's width covered by one cluster cell
+CELLS_PER_TILE = 4
+
+
+def cell_size_for_zoom(zoom):
+    """Cluster cell edge in degrees at `zoom`."""
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+class ClusterIndex:
+    """
+    Cells per zoom band: {zoom: {(row, col): (members, summary)}}, where
+    members is a list of (facility_id, lat, lng) and summary the ready-made
+    cluster marker (None for single-facility cells).
+
+    Like SpatialGrid, immutable once built and swapped wholesale on refresh.
+    """
+
+    def __init__(self, points, names=None):
+        points = [(facility_id, float(lat), float(lng)) for facility_id, lat, lng in points]
+        self.names = names or {}
+        self.bands = {}
+        for zoom in range(CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM):
+            size = cell_size_for_zoom(zoom)
+            grouped = {}
+            for point in points:
+                key = (math.floor(point[1] / size), math.floor(point[2] / size))
+                grouped.setdefault(key, []).append(point)
+            self.bands[zoom] = {
+                key: (members, _summarize(members) if len(members) > 1 else None)
+                for key, members in grouped.items()
+            }
+        self.points = points
+
+    def _cells_in_view(self, zoom, bbox):
+        cells = self.bands[zoom]
+        if bbox is None:
+            return cells.values()
+        south, west, north, east = bbox
+        size = cell_size_for_zoom(zoom)
+        row_lo, row_hi = math.floor(south / size), math.floor(north / size)
+        if west > east:
+            # Viewport crosses the antimeridian
+            col_ranges = [(math.floor(west / size), math.floor(180.0 / size)),
+                          (math.floor(-180.0 / size), math.floor(east / size))]
+        else:
+            col_ranges = [(math.floor(west / size), math.floor(east / size))]
+        span = (row_hi - row_lo + 1) * sum(hi - lo + 1 for lo, hi in col_ranges)
+        if span > len(cells):
+            # Zoomed-out viewport: cheaper to test every occupied cell
+            return [
+                cell for (row, col), cell in cells.items()
+                if row_lo <= row <= row_hi and any(lo <= col <= hi for lo, hi in col_ranges)
+            ]
+        found = []
+        for row in range(row_lo, row_hi + 1):
+            for col_lo, col_hi in col_ranges:
+                for col in range(col_lo, col_hi + 1):
+                    cell = cells.get((row, col))
+                    if cell:
+                        found.append(cell)
+        return found
+
+    def _point(self, facility_id, lat, lng):
+        return {
+            'facility_id': facility_id,
+            'facility_name': self.names.get(facility_id, ''),
+            'coordinates': {'latitude': lat, 'longitude': lng},
+        }
+
+    def query(self, zoom, bbox=None, allowed=None):
+        """
+        Return (clusters, points) for the viewport `bbox` as
+        (south, west, north, east), or the whole country when None.
+
+        `allowed` restricts counts and points to a set of facility IDs (for
+        the location and status filters); centroids are then computed over
+        the allowed members only.
+        """
+        if zoom >= CLUSTER_MAX_ZOOM:
+            return [], [
+                self._point(*point) for point in self.points
+                if (allowed is None or point[0] in allowed) and _in_box(point, bbox)
+            ]
+
+        zoom = max(zoom, CLUSTER_MIN_ZOOM)
+        clusters = []
+        points = []
+        for members, summary in self._cells_in_view(zoom, bbox):
+            if allowed is not None:
+                members = [point for point in members if point[0] in allowed]
+                summary = _summarize(members) if len(members) > 1 else None
+            if summary is not None:
+                clusters.append(summary)
+            elif members:
+                points.append(self._point(*members[0]))
+        clusters.sort(key=lambda cluster: -cluster['count'])
+        points.sort(key=lambda point: point['facility_id'])
+        return clusters, points
+
+
+def _summarize(members):
+    lats = [point[1] for point in members]
+    lngs = [point[2] for point in members]
+    return {
+        'count': len(members),
+        'latitude': round(sum(lats) / len(members), 6),
+        'longitude': round(sum(lngs) / len(members), 6),
+        'bounds': {
+            'sw_lat': min(lats), 'sw_lng': min(lngs),
+            'ne_lat': max(lats), 'ne_lng': max(lngs),
+        },
+    }
+
+
+def _in_box(point, bbox):
+    if bbox is None:
+        return True
+    south, west, north, east = bbox
+    _, lat, lng = point
+    if not south <= lat <= north:
+        return False
+    if west > east:
+        return lng >= west or lng <= east
+    return west <= lng <= east
+
+
+_lock = threading.Lock()
+_clusters = None
+_source_grid = None
+
+
+def get_cluster_index(fresh=False):
+    """
+    Return this worker's cluster index, rebuilt if the spatial index moved on.
+    `fresh` is passed through to get_spatial_index().
+    """
+    global _clusters, _source_grid
+    from .models import Facility
+
+    grid = get_spatial_index(fresh=fresh)
+    if _clusters is not None and _source_grid is grid:
+        return _clusters
+
+    with _lock:
+        if _clusters is not None and _source_grid is grid:
+            return _clusters
+        started = time.perf_counter()
+        points = [point for members in grid.cells.values() for point in members]
+        names = dict(Facility.objects.filter(is_active=True).values_list('facility_id', 'facility_name'))
+        _clusters = ClusterIndex(points, names)
+        _source_grid = grid
+        logger.info(
+            'Facility cluster index built: %d facilities, %d zoom bands, %.1f ms',
+            len(points), len(_clusters.bands), (time.perf_counter() - started) * 1000,
+        )
+        return _clusters
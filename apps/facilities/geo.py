@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+"""
+Great-circle distance helpers shared by every distance-ranked endpoint.
+
+The views used to multiply the planar distance in degrees by 111.32. That is
+only right north-south; a degree of longitude shrinks with latitude, and the
+Sqrt(Power(...)) expression could not use the (latitude, longitude) index on
+FacilityCoordinate, so every radius filter scanned the table.
+
+The approach here is two steps:
+  1. a lat/lng bounding box around the search circle, expressed as plain
+     range predicates the coordinate index can serve;
+  2. exact haversine distances for the few rows inside the box, computed in
+     Python, then filtered to the circle and sorted.
+"""
+
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    phi1 = math.radians(float(lat1))
+    phi2 = math.radians(float(lat2))
+    dphi = phi2 - phi1
+    dlmb = math.radians(float(lng2) - float(lng1))
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (south, west, north, east) enclosing the circle of `radius_km`.
+
+    The longitude half-width is taken at the latitude furthest from the
+    equator, so the box never clips the circle. Longitudes are clamped rather
+    than wrapped; nothing GVRC serves is near the antimeridian.
+    """
+    lat = float(lat)
+    lng = float(lng)
+    dlat = float(radius_km) / KM_PER_DEGREE_LAT
+    south = max(lat - dlat, -90.0)
+    north = min(lat + dlat, 90.0)
+    widest = max(abs(south), abs(north))
+    if widest >= 89.0:
+        return south, -180.0, north, 180.0
+    dlng = float(radius_km) / (KM_PER_DEGREE_LAT * math.cos(math.radians(widest)))
+    return south, max(lng - dlng, -180.0), north, min(lng + dlng, 180.0)
+
+
+def bbox_q(south, west, north, east, prefix=''):
+    """
+    Range predicates on latitude/longitude for a box, usable by the
+    coordinate index. `prefix` is the relation path, e.g.
+    'facilitycoordinate__'. A box with west > east crosses the antimeridian.
+    """
+    lat_q = Q(**{f'{prefix}latitude__gte': south, f'{prefix}latitude__lte': north})
+    if west > east:
+        return lat_q & (Q(**{f'{prefix}longitude__gte': west}) | Q(**{f'{prefix}longitude__lte': east}))
+    return lat_q & Q(**{f'{prefix}longitude__gte': west, f'{prefix}longitude__lte': east})
+
+
+def rank_by_distance(rows, lat, lng, radius_km=None):
+    """
+    Rank (facility_id, latitude, longitude) rows by haversine distance.
+
+    Returns [(facility_id, distance_km)] closest first, one entry per
+    facility (its nearest coordinate), dropping anything beyond `radius_km`.
+    """
+    best = {}
+    for facility_id, plat, plng in rows:
+        distance = haversine_km(lat, lng, plat, plng)
+        if radius_km is not None and distance > radius_km:
+            continue
+        if facility_id not in best or distance < best[facility_id]:
+            best[facility_id] = distance
+    return sorted(best.items(), key=lambda item: (item[1], item[0]))
+
+
+def facilities_within(lat, lng, radius_km, facilities=None):
+    """
+    Facilities with an active coordinate inside `radius_km`, closest first.
+
+    The bounding box goes to SQL against FacilityCoordinate; only rows inside
+    it come back for exact ranking. `facilities` optionally restricts the
+    search to a Facility queryset (it is used as a subquery).
+    """
+    from .models import FacilityCoordinate
+
+    south, west, north, east = bounding_box(lat, lng, radius_km)
+    rows = FacilityCoordinate.objects.filter(
+        bbox_q(south, west, north, east),
+        is_active=True,
+        facility__is_active=True,
+    )
+    if facilities is not None:
+        rows = rows.filter(facility__in=facilities.values('facility_id'))
+    return rank_by_distance(
+        rows.values_list('facility_id', 'latitude', 'longitude'), lat, lng, radius_km
+    )
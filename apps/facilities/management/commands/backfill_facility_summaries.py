@@ -0,0 +1,76 @@
+"""
+Recompute the denormalized summary columns on Facility (primary_latitude,
+primary_longitude, has_coordinates, service_count, contact_count) and the
+search_document used by facility text search.
+
+Signals keep the columns current for edits made through the ORM, and the
+migrations that add the columns fill them for existing rows. Run this after
+imports that write contacts, services or coordinates with bulk_create() or
+raw SQL.
+
+Facilities are updated in primary-key batches so each UPDATE stays short and
+does not hold locks on the whole table.
+
+Usage:
+    python manage.py backfill_facility_summaries
+    python manage.py backfill_facility_summaries --batch-size 5000
+    python manage.py backfill_facility_summaries --facility 12 --facility 40
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from apps.facilities.models import Facility
+from apps.facilities.search import refresh_search_documents
+from apps.facilities.summary import refresh_facility_summaries
+
+
+class Command(BaseCommand):
+    help = "Backfill Facility's denormalized coordinate, counter and search columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Facilities per UPDATE (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--facility",
+            type=int,
+            action="append",
+            dest="facility_ids",
+            help="Only refresh this facility ID (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        if options["facility_ids"]:
+            updated = refresh_facility_summaries(options["facility_ids"])
+            refresh_search_documents(options["facility_ids"])
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} facilities."))
+            return
+
+        batch_size = max(1, options["batch_size"])
+        last_id = Facility.objects.aggregate(last=Max("facility_id"))["last"] or 0
+        updated = 0
+        for start in range(0, last_id + 1, batch_size):
+            ids = list(
+                Facility.objects.filter(
+                    facility_id__gte=start, facility_id__lt=start + batch_size
+                ).values_list("facility_id", flat=True)
+            )
+            if not ids:
+                continue
+            with transaction.atomic():
+                updated += refresh_facility_summaries(ids)
+                refresh_search_documents(ids)
+            self.stdout.write(f"  {updated} facilities refreshed (up to ID {ids[-1]})")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {updated} facilities in {elapsed:.1f}s."
+        ))
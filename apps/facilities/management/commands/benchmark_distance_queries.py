@@ -0,0 +1,114 @@
+"""
+Capture query plans and timings for the radius search, before and after the
+move to bounding box + haversine (apps/facilities/geo.py).
+
+Synthetic facilities are bulk-inserted inside a transaction and rolled back
+afterwards. For each probe point the command runs:
+
+  planar    the old Sqrt(Power(...)) * 111.32 annotate + filter + order_by
+  bbox      geo.facilities_within(): range predicates on the coordinate
+            index, exact haversine ranking in Python
+
+and prints EXPLAIN output for one probe of each, so the plan change (full scan
+vs. index range scan) can be pasted into a review.
+
+Usage:
+    python manage.py benchmark_distance_queries
+    python manage.py benchmark_distance_queries --size 100000 --radius 25
+    python manage.py benchmark_distance_queries --no-explain
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Power, Sqrt
+
+from apps.facilities.geo import bbox_q, bounding_box, facilities_within
+from apps.facilities.models import Facility, FacilityCoordinate
+
+from .benchmark_spatial_index import LAT_RANGE, LNG_RANGE, _ms, _Rollback, insert_synthetic_facilities
+
+
+def planar_queryset(lat, lng, radius_km):
+    """The distance query the views ran before geo.py."""
+    return Facility.objects.filter(
+        is_active=True,
+        facilitycoordinate__is_active=True,
+    ).annotate(
+        distance_km=Sqrt(
+            Power(F("facilitycoordinate__latitude") - lat, 2)
+            + Power(F("facilitycoordinate__longitude") - lng, 2),
+            output_field=FloatField(),
+        ) * 111.32
+    ).filter(distance_km__lte=radius_km).order_by("distance_km").distinct()
+
+
+class Command(BaseCommand):
+    help = "Compare plans and timings of the planar and bounding-box distance queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=20_000, help="Synthetic facilities (default: %(default)s)")
+        parser.add_argument("--queries", type=int, default=20, help="Probes per path (default: %(default)s)")
+        parser.add_argument("--radius", type=float, default=10.0, help="Radius in km (default: %(default)s)")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--no-explain", action="store_true", help="Skip the EXPLAIN output.")
+
+    # ------------------------------------------------------------------
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        radius = options["radius"]
+        points = [
+            (i + 1, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+            for i in range(options["size"])
+        ]
+        probes = [
+            (rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+            for _ in range(options["queries"])
+        ]
+
+        try:
+            with transaction.atomic():
+                insert_synthetic_facilities(points)
+                self._run(probes, radius, explain=not options["no_explain"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, probes, radius, explain):
+        planar_samples = []
+        bbox_samples = []
+        mismatches = 0
+        for lat, lng in probes:
+            t0 = time.perf_counter()
+            planar = list(planar_queryset(lat, lng, radius).values_list("facility_id", flat=True))
+            t1 = time.perf_counter()
+            ranked = facilities_within(lat, lng, radius)
+            t2 = time.perf_counter()
+            planar_samples.append(t1 - t0)
+            bbox_samples.append(t2 - t1)
+            # The planar query over-reaches east-west, so it may hold extra
+            # rows; anything haversine finds must be in it or be near the rim.
+            mismatches += len({facility_id for facility_id, _ in ranked} - set(planar))
+
+        planar_mean, planar_p95 = _ms(planar_samples)
+        bbox_mean, bbox_p95 = _ms(bbox_samples)
+        self.stdout.write(self.style.SUCCESS(f"radius {radius:g} km, {len(probes)} probes"))
+        self.stdout.write(f"  planar Sqrt/Power   mean {planar_mean:8.3f} ms   p95 {planar_p95:8.3f} ms")
+        self.stdout.write(f"  bbox + haversine    mean {bbox_mean:8.3f} ms   p95 {bbox_p95:8.3f} ms")
+        self.stdout.write(f"  found only by haversine: {mismatches}")
+
+        if explain:
+            lat, lng = probes[0]
+            south, west, north, east = bounding_box(lat, lng, radius)
+            bbox_rows = FacilityCoordinate.objects.filter(
+                bbox_q(south, west, north, east),
+                is_active=True,
+                facility__is_active=True,
+            ).values_list("facility_id", "latitude", "longitude")
+            self.stdout.write(self.style.SUCCESS("\nEXPLAIN planar"))
+            self.stdout.write(planar_queryset(lat, lng, radius).explain())
+            self.stdout.write(self.style.SUCCESS("\nEXPLAIN bbox"))
+            self.stdout.write(bbox_rows.explain())
@@ -0,0 +1,121 @@
+"""
+Measure the facility autocomplete index on a Kenya-sized directory.
+
+Places come from the database when the geography tables are populated, and
+otherwise from the ward list shipped with the geography app, padded with
+generated names to Kenya's 47 counties, 290 constituencies and 1,450 wards.
+Facility names are generated from place names and common facility words.
+Nothing is written to the database.
+
+The command reports the build time, then latency percentiles for queries
+sampled from the indexed names: random-length prefixes, half of them with
+one typo. It finishes with the cost of patching single facilities in place,
+as the incremental refresh does.
+
+Usage:
+    python manage.py benchmark_facility_suggest
+    python manage.py benchmark_facility_suggest --facilities 50000 --queries 5000
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.facilities.suggest import SuggestIndex, place_entries
+from apps.geography.management.commands.kenya_ward_data import KENYA_WARDS_DATA
+
+COUNTIES, CONSTITUENCIES, WARDS = 47, 290, 1450
+FACILITY_WORDS = [
+    'Hospital', 'Health Centre', 'Dispensary', 'Police Station', 'Legal Aid Centre',
+    'Rescue Centre', 'Counselling Centre', 'Women Support Group', 'Children Office',
+    'Law Courts', 'Mission Hospital', 'Sub-County Hospital', 'Community Clinic',
+]
+
+
+def _ms(samples):
+    """Return (p50, p95, max) of a list of seconds, in milliseconds."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return statistics.median(ordered) * 1000, p95 * 1000, ordered[-1] * 1000
+
+
+def _with_typo(rng, text):
+    """Apply one random substitution, deletion, insertion or swap."""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    return rng.choice([
+        text[:i] + letter + text[i + 1:],
+        text[:i] + text[i + 1:],
+        text[:i] + letter + text[i:],
+        text[:i - 1] + text[i] + text[i - 1] + text[i + 1:],
+    ])
+
+
+def _places(rng):
+    places = list(place_entries())
+    if len(places) >= WARDS:
+        return places, [label for (kind, _), label, _ in places if kind == 'ward']
+
+    ward_names = [ward['name'] for ward in KENYA_WARDS_DATA]
+    syllables = ['ka', 'ki', 'ma', 'mu', 'nya', 'ngo', 'to', 'ri', 'wa', 'lo', 'si', 'bu']
+    while len(ward_names) < WARDS:
+        ward_names.append(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title())
+    places = [(('county', i), f'County {i}', 'County') for i in range(COUNTIES)]
+    places += [(('constituency', i), ward_names[i * 5], 'Constituency') for i in range(CONSTITUENCIES)]
+    places += [(('ward', i), name, 'Ward') for i, name in enumerate(ward_names[:WARDS])]
+    return places, ward_names[:WARDS]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the typo-tolerant facility suggest index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--facilities", type=int, default=10_000, help="Synthetic facilities (default: %(default)s)")
+        parser.add_argument("--queries", type=int, default=2_000, help="Queries to time (default: %(default)s)")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        places, ward_names = _places(rng)
+        facilities = [
+            (('facility', i), f'{rng.choice(ward_names)} {rng.choice(FACILITY_WORDS)}', '')
+            for i in range(options["facilities"])
+        ]
+
+        started = time.perf_counter()
+        index = SuggestIndex(places + facilities)
+        self.stdout.write(
+            f"Built {len(index)} entries ({len(index.vocabulary)} words) "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+        labels = [label for _, label, _ in places + facilities]
+        queries = []
+        for _ in range(options["queries"]):
+            label = rng.choice(labels).lower()
+            text = label[:rng.randint(3, len(label))] if len(label) > 3 else label
+            queries.append(_with_typo(rng, text) if rng.random() < 0.5 else text)
+
+        timings = []
+        empty = 0
+        for text in queries:
+            started = time.perf_counter()
+            if not index.query(text):
+                empty += 1
+            timings.append(time.perf_counter() - started)
+        p50, p95, worst = _ms(timings)
+        self.stdout.write(
+            f"{len(queries)} queries: p50 {p50:.2f} ms, p95 {p95:.2f} ms, max {worst:.2f} ms; "
+            f"{empty} with no suggestion"
+        )
+
+        timings = []
+        for key, label, context in rng.sample(facilities, min(200, len(facilities))):
+            started = time.perf_counter()
+            index.add(key, label.replace(' ', ' Renamed ', 1), context)
+            timings.append(time.perf_counter() - started)
+        p50, p95, worst = _ms(timings)
+        self.stdout.write(f"Single-facility patch: p50 {p50:.3f} ms, p95 {p95:.3f} ms")
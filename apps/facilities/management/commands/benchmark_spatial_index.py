@@ -0,0 +1,193 @@
+"""
+Compare the in-process facility spatial index with the ORM distance query it
+replaced, on synthetic facilities scattered across Kenya.
+
+For each size the command builds a SpatialGrid and times k-nearest and radius
+queries from random points. Unless --skip-orm is given it also bulk-inserts the
+same number of Facility/FacilityCoordinate rows inside a transaction, times
+the old Sqrt(Power(...)) * 111.32 annotate/order/count query against them, and
+rolls everything back.
+
+Usage:
+    python manage.py benchmark_spatial_index
+    python manage.py benchmark_spatial_index --sizes 10000 100000
+    python manage.py benchmark_spatial_index --sizes 1000000 --skip-orm
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Power, Sqrt
+from django.utils import timezone
+
+from apps.facilities.models import Facility, FacilityCoordinate
+from apps.facilities.search import refresh_search_documents
+from apps.facilities.spatial_index import SpatialGrid
+from apps.facilities.summary import refresh_facility_summaries
+from apps.geography.models import County, Constituency, Ward
+from apps.lookups.models import OperationalStatus
+
+# Kenya's bounding box
+LAT_RANGE = (-4.7, 5.0)
+LNG_RANGE = (33.9, 41.9)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _ms(samples):
+    """Return (mean, p95) of a list of seconds, in milliseconds."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return statistics.mean(ordered) * 1000, p95 * 1000
+
+
+def insert_synthetic_facilities(points):
+    """Bulk-insert one Facility and FacilityCoordinate per (id, lat, lng) point."""
+    county = County.objects.create(county_name="Benchmark", county_code="BENCH")
+    constituency = Constituency.objects.create(
+        constituency_name="Benchmark", constituency_code="BENCH", county=county
+    )
+    ward = Ward.objects.create(ward_name="Benchmark", ward_code="BENCH", constituency=constituency)
+    status, _ = OperationalStatus.objects.get_or_create(status_name="Operational")
+    user = get_user_model().objects.create_user(
+        email="benchmark@hodi.invalid",
+        full_name="Benchmark",
+        phone_number="+254799999999",
+        password=None,
+    )
+    today = timezone.now().date()
+
+    batch = 5000
+    for offset in range(0, len(points), batch):
+        chunk = points[offset : offset + batch]
+        facilities = Facility.objects.bulk_create([
+            Facility(
+                facility_name=f"Benchmark {i}",
+                facility_code=f"BENCH{i}",
+                registration_number=f"BENCH{i}",
+                operational_status=status,
+                ward=ward,
+                created_by=user,
+            )
+            for i, _, _ in chunk
+        ])
+        FacilityCoordinate.objects.bulk_create([
+            FacilityCoordinate(
+                facility_id=facility.facility_id,
+                latitude=round(lat, 8),
+                longitude=round(lng, 8),
+                collection_date=today,
+            )
+            for facility, (_, lat, lng) in zip(facilities, chunk)
+        ])
+        # bulk_create skips signals, so fill the denormalized columns here
+        refresh_facility_summaries([facility.facility_id for facility in facilities])
+        refresh_search_documents([facility.facility_id for facility in facilities])
+
+
+class Command(BaseCommand):
+    help = "Benchmark the facility spatial index against the ORM distance query."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Synthetic facility counts to test (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=200,
+            help="Index queries per size (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--orm-queries",
+            type=int,
+            default=5,
+            help="ORM queries per size (default: %(default)s)",
+        )
+        parser.add_argument("--k", type=int, default=20, help="Neighbours per query (default: %(default)s)")
+        parser.add_argument("--radius", type=float, default=10.0, help="Radius in km (default: %(default)s)")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--skip-orm",
+            action="store_true",
+            help="Only benchmark the index; do not insert rows into the database.",
+        )
+
+    # ------------------------------------------------------------------
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        k = options["k"]
+        radius = options["radius"]
+
+        for size in options["sizes"]:
+            points = [
+                (i + 1, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+                for i in range(size)
+            ]
+            probes = [
+                (rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+                for _ in range(options["queries"])
+            ]
+
+            started = time.perf_counter()
+            grid = SpatialGrid(points)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            nearest_samples = []
+            within_samples = []
+            for lat, lng in probes:
+                t0 = time.perf_counter()
+                grid.nearest(lat, lng, k=k)
+                t1 = time.perf_counter()
+                grid.within(lat, lng, radius)
+                t2 = time.perf_counter()
+                nearest_samples.append(t1 - t0)
+                within_samples.append(t2 - t1)
+
+            nearest_mean, nearest_p95 = _ms(nearest_samples)
+            within_mean, within_p95 = _ms(within_samples)
+            self.stdout.write(self.style.SUCCESS(f"{size:,} facilities"))
+            self.stdout.write(f"  index build          {build_ms:10.1f} ms")
+            self.stdout.write(f"  index nearest k={k:<4} mean {nearest_mean:8.3f} ms   p95 {nearest_p95:8.3f} ms")
+            self.stdout.write(f"  index within {radius:g}km  mean {within_mean:8.3f} ms   p95 {within_p95:8.3f} ms")
+
+            if not options["skip_orm"]:
+                orm_mean, orm_p95 = self._benchmark_orm(points, probes[: options["orm_queries"]], k)
+                self.stdout.write(f"  ORM annotate+count   mean {orm_mean:8.3f} ms   p95 {orm_p95:8.3f} ms")
+
+    def _benchmark_orm(self, points, probes, k):
+        """Insert the points, time the pre-index query, then roll back."""
+        samples = []
+        try:
+            with transaction.atomic():
+                insert_synthetic_facilities(points)
+                for lat, lng in probes:
+                    t0 = time.perf_counter()
+                    queryset = Facility.objects.filter(
+                        is_active=True,
+                        facilitycoordinate__is_active=True,
+                    ).annotate(
+                        distance_km=Sqrt(
+                            Power(F("facilitycoordinate__latitude") - lat, 2)
+                            + Power(F("facilitycoordinate__longitude") - lng, 2),
+                            output_field=FloatField(),
+                        ) * 111.32
+                    ).order_by("distance_km", "facility_name").distinct()
+                    queryset.count()
+                    list(queryset[:k])
+                    samples.append(time.perf_counter() - t0)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return _ms(samples)
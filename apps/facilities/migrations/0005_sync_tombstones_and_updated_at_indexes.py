@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0004_add_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilitySyncTombstone',
+            fields=[
+                ('tombstone_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('facility', 'Facility'), ('contact', 'Contact'), ('service', 'Service'), ('coordinate', 'Coordinate')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('facility_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'facility_sync_tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['updated_at'], name='facilities_updated_200e9e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facilitycontact',
+            index=models.Index(fields=['updated_at'], name='facility_co_updated_aef1b9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facilitycoordinate',
+            index=models.Index(fields=['updated_at'], name='facility_co_updated_3076ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facilityservice',
+            index=models.Index(fields=['updated_at'], name='facility_se_updated_fdce60_idx'),
+        ),
+    ]
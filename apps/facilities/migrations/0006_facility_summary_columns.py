@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_summaries(apps, schema_editor):
+    """Fill the new columns for existing facilities, a batch per UPDATE"""
+    from apps.facilities.summary import summary_columns
+
+    Facility = apps.get_model('facilities', 'Facility')
+    columns = summary_columns(
+        apps.get_model('facilities', 'FacilityCoordinate'),
+        apps.get_model('facilities', 'FacilityService'),
+        apps.get_model('facilities', 'FacilityContact'),
+    )
+    ids = list(Facility.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), BACKFILL_BATCH_SIZE):
+        Facility.objects.filter(pk__in=ids[start:start + BACKFILL_BATCH_SIZE]).update(**columns)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0005_sync_tombstones_and_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facility',
+            name='contact_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='has_coordinates',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='primary_latitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='primary_longitude',
+            field=models.DecimalField(blank=True, decimal_places=8, editable=False, max_digits=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='service_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['primary_latitude', 'primary_longitude'], name='facilities_primary_d16b68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['is_active', 'has_coordinates'], name='facilities_is_acti_12f751_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+# PostgreSQL only: trigram index for LIKE '%word%' and a full-text index.
+# Other backends (SQLite in tests) search the column without an index.
+POSTGRES_INDEXES = [
+    (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        None,
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS facilities_search_document_trgm "
+        "ON facilities USING gin (search_document gin_trgm_ops)",
+        "DROP INDEX IF EXISTS facilities_search_document_trgm",
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS facilities_search_document_fts "
+        "ON facilities USING gin (to_tsvector('simple', search_document))",
+        "DROP INDEX IF EXISTS facilities_search_document_fts",
+    ),
+]
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Build the document for existing facilities, before the indexes exist"""
+    from apps.facilities.search import refresh_search_documents
+
+    refresh_search_documents(
+        batch_size=1000,
+        facility_model=apps.get_model('facilities', 'Facility'),
+        service_model=apps.get_model('facilities', 'FacilityService'),
+    )
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for create, _ in POSTGRES_INDEXES:
+        schema_editor.execute(create)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for _, drop in reversed(POSTGRES_INDEXES):
+        if drop:
+            schema_editor.execute(drop)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0006_facility_summary_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facility',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
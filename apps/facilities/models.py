@@ -29,6 +29,16 @@ class Facility(models.Model):
     updated_at = models.DateTimeField(default=timezone.now, blank=True, null=True)
     created_by = models.ForeignKey('authentication.User', on_delete=models.CASCADE, related_name='facilities_created', db_column='created_by', null=False)
     updated_by = models.ForeignKey('authentication.User', on_delete=models.SET_NULL, blank=True, null=True, related_name='facilities_updated', db_column='updated_by')
+    # Denormalized from the child tables so list and map queries read one row
+    # per facility. Maintained by signals (see summary.py); never set by hand.
+    primary_latitude = models.DecimalField(max_digits=10, decimal_places=8, blank=True, null=True, editable=False)
+    primary_longitude = models.DecimalField(max_digits=11, decimal_places=8, blank=True, null=True, editable=False)
+    has_coordinates = models.BooleanField(default=False, null=False, editable=False)
+    service_count = models.PositiveIntegerField(default=0, null=False, editable=False)
+    contact_count = models.PositiveIntegerField(default=0, null=False, editable=False)
+    # Normalized name, registration number, geography and service categories
+    # for text search (see search.py); trigram-indexed on PostgreSQL
+    search_document = models.TextField(blank=True, default='', editable=False)
     
     def __str__(self):
         return f"{self.facility_name} - {self.ward.ward_name}"
@@ -44,6 +54,9 @@ class Facility(models.Model):
             models.Index(fields=['registration_number']),  # For search optimization
             models.Index(fields=['ward', 'operational_status']),  # Composite index for filtering
             models.Index(fields=['is_active', 'operational_status']),  # Composite index for active operational facilities
+            models.Index(fields=['updated_at']),  # For mobile delta sync
+            models.Index(fields=['primary_latitude', 'primary_longitude']),  # For map viewport queries
+            models.Index(fields=['is_active', 'has_coordinates']),  # For map and has_coordinates filters
         ]
 
 
@@ -71,6 +84,7 @@ class FacilityContact(models.Model):
             models.Index(fields=['facility']),
             models.Index(fields=['contact_type']),
             models.Index(fields=['is_primary']),
+            models.Index(fields=['updated_at']),  # For mobile delta sync
         ]
 
 
@@ -101,6 +115,7 @@ class FacilityCoordinate(models.Model):
             models.Index(fields=['is_active']),
             models.Index(fields=['latitude', 'longitude']),  # Composite index for coordinate queries
             models.Index(fields=['is_active', 'latitude', 'longitude']),  # For map queries
+            models.Index(fields=['updated_at']),  # For mobile delta sync
         ]
 
 
@@ -131,6 +146,7 @@ class FacilityService(models.Model):
             models.Index(fields=['facility']),
             models.Index(fields=['service_category']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['updated_at']),  # For mobile delta sync
         ]
 
 
@@ -201,3 +217,29 @@ class FacilityGBVCategory(models.Model):
             models.Index(fields=['facility']),
             models.Index(fields=['gbv_category']),
         ]
+
+
+class FacilitySyncTombstone(models.Model):
+    """
+    Record of a hard-deleted facility or facility child row, so mobile delta
+    sync can tell devices to drop it. Soft deletes (is_active=False) need no
+    tombstone; the row itself carries the change.
+    """
+    ENTITY_CHOICES = [
+        ('facility', 'Facility'),
+        ('contact', 'Contact'),
+        ('service', 'Service'),
+        ('coordinate', 'Coordinate'),
+    ]
+
+    tombstone_id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.IntegerField()
+    facility_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} deleted {self.deleted_at}"
+
+    class Meta:
+        db_table = 'facility_sync_tombstones'
@@ -0,0 +1,129 @@
+# -*- encoding: utf-8 -*-
+"""
+Facility text search over a precomputed search document.
+
+Search used to OR icontains across the facility name, registration number
+and three geography tables. That needs the joins on every query, and a
+leading-wildcard LIKE cannot use an ordinary index, so every search scanned
+the whole directory.
+
+Each facility now keeps `search_document`: its name, registration number,
+ward, constituency, county and service categories, lowercased with accents
+stripped. A search only reads that one column:
+
+* every word in the query must appear somewhere in the document, so
+  "kisumu counselling" finds a counselling centre in Kisumu;
+* on PostgreSQL the column has a pg_trgm GIN index (migration 0007), which
+  the planner uses for LIKE '%word%' directly. A full-text GIN index on
+  to_tsvector('simple', ...) is there too for callers that want it;
+* SQLite, used by the tests, has no such index. It still scans one column
+  with no joins, which is the portable fallback.
+
+Results can be ranked: an exact name match first, then names starting with
+the query, then names containing it, then the rest. On PostgreSQL trigram
+similarity breaks ties.
+
+refresh_search_documents() rebuilds documents; signals call it when a
+facility, its services, or a place name changes.
+"""
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Facility, FacilityService
+
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_search_text(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _SPACE.sub(' ', text.lower()).strip()
+
+
+def build_search_document(*parts):
+    """Join the non-empty `parts` into one normalized document."""
+    return normalize_search_text(' '.join(part for part in parts if part))
+
+
+def refresh_search_documents(facility_ids=None, batch_size=500,
+                             facility_model=Facility, service_model=FacilityService):
+    """
+    Rebuild search_document for `facility_ids`, or for every facility when
+    None. Only rows whose document changed are written. Returns that count.
+    Migrations pass their historical models.
+    """
+    facilities = facility_model.objects.all()
+    services = service_model.objects.filter(is_active=True)
+    if facility_ids is not None:
+        facility_ids = list(facility_ids)
+        facilities = facilities.filter(facility_id__in=facility_ids)
+        services = services.filter(facility_id__in=facility_ids)
+
+    categories = {}
+    for facility_id, category in services.values_list(
+        'facility_id', 'service_category__category_name'
+    ).distinct():
+        categories.setdefault(facility_id, set()).add(category)
+
+    changed = []
+    for row in facilities.values_list(
+        'facility_id', 'facility_name', 'registration_number', 'ward__ward_name',
+        'ward__constituency__constituency_name',
+        'ward__constituency__county__county_name', 'search_document',
+    ).iterator(chunk_size=2000):
+        facility_id, current = row[0], row[-1]
+        document = build_search_document(
+            *row[1:-1], *sorted(categories.get(facility_id, ()))
+        )
+        if document != current:
+            changed.append((document, facility_id))
+
+    # Plain UPDATEs, not save(): no signals, so no recursion and no tile or
+    # spatial index churn for a column only search reads. executemany is far
+    # cheaper than bulk_update's CASE expression over thousands of rows.
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} = %s WHERE {} = %s'.format(
+        quote(facility_model._meta.db_table), quote('search_document'), quote('facility_id')
+    )
+    with connection.cursor() as cursor:
+        for offset in range(0, len(changed), batch_size):
+            cursor.executemany(sql, changed[offset:offset + batch_size])
+    return len(changed)
+
+
+def search_facilities(queryset, query, rank=False):
+    """
+    Narrow a Facility queryset to rows matching every word of `query`.
+
+    With rank=True the result is annotated with search_rank and ordered by
+    relevance (facility_id breaks remaining ties); otherwise the queryset's
+    own ordering is kept, as the cursor-paginated lists need.
+    """
+    query = normalize_search_text(query)
+    if not query:
+        return queryset
+    for word in query.split(' '):
+        queryset = queryset.filter(search_document__contains=word)
+    if not rank:
+        return queryset
+
+    queryset = queryset.annotate(search_rank=Case(
+        When(facility_name__iexact=query, then=Value(3)),
+        When(facility_name__istartswith=query, then=Value(2)),
+        When(facility_name__icontains=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    if connection.vendor == 'postgresql':
+        # Imported here: contrib.postgres needs psycopg, absent on SQLite setups
+        from django.contrib.postgres.search import TrigramSimilarity
+        queryset = queryset.annotate(
+            search_similarity=TrigramSimilarity('search_document', query)
+        )
+        return queryset.order_by('-search_rank', '-search_similarity', 'facility_id')
+    return queryset.order_by('-search_rank', 'facility_id')
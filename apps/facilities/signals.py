@@ -0,0 +1,245 @@
+# -*- encoding: utf-8 -*-
+"""
+Signal handlers for facilities app
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.geography.models import Constituency, County, Ward
+
+from .cache_utils import invalidate_facility_cache
+from .models import (
+    Facility, FacilityContact, FacilityCoordinate, FacilityGBVCategory, FacilityInfrastructure,
+    FacilityOwner, FacilityService, FacilitySyncTombstone
+)
+from .search import refresh_search_documents
+from .spatial_index import invalidate_spatial_index
+from .suggest import invalidate_suggest_index, note_facility_changed
+from .summary import refresh_facility_summaries
+from .tiles import invalidate_tiles_at
+
+
+@receiver(post_save, sender=Facility)
+@receiver(post_delete, sender=Facility)
+@receiver(post_save, sender=FacilityCoordinate)
+@receiver(post_delete, sender=FacilityCoordinate)
+def facility_location_changed(sender, **kwargs):
+    """Rebuild the spatial index once the edit is visible to other workers."""
+    transaction.on_commit(invalidate_spatial_index)
+
+
+@receiver(pre_save, sender=FacilityCoordinate)
+def remember_previous_position(sender, instance, **kwargs):
+    """Keep the stored position so a move clears the tiles it left as well."""
+    instance._previous_position = None
+    if instance.pk:
+        instance._previous_position = (
+            FacilityCoordinate.objects.filter(pk=instance.pk)
+            .values_list('latitude', 'longitude').first()
+        )
+
+
+@receiver(post_save, sender=FacilityCoordinate)
+@receiver(post_delete, sender=FacilityCoordinate)
+def coordinate_tiles_changed(sender, instance, **kwargs):
+    positions = [(instance.latitude, instance.longitude)]
+    previous = getattr(instance, '_previous_position', None)
+    if previous:
+        positions.append(previous)
+    transaction.on_commit(lambda: invalidate_tiles_at(*positions))
+
+
+@receiver(post_save, sender=Facility)
+def facility_tiles_changed(sender, instance, **kwargs):
+    """Name, status or activity changes show on every tile holding the facility."""
+    positions = list(
+        FacilityCoordinate.objects.filter(facility_id=instance.pk)
+        .values_list('latitude', 'longitude')
+    )
+    if positions:
+        transaction.on_commit(lambda: invalidate_tiles_at(*positions))
+
+
+@receiver(pre_save, sender=Facility)
+@receiver(pre_save, sender=FacilityContact)
+@receiver(pre_save, sender=FacilityService)
+@receiver(pre_save, sender=FacilityCoordinate)
+def stamp_updated_at(sender, instance, raw=False, **kwargs):
+    """
+    updated_at only has a default, so edits never moved it. Mobile delta sync
+    reads it as the change watermark, so every save stamps it. Callers using
+    save(update_fields=...) or queryset .update() must include updated_at
+    themselves, as the chat models already do.
+    """
+    if not raw:
+        instance.updated_at = timezone.now()
+
+
+TOMBSTONE_ENTITIES = {
+    Facility: 'facility',
+    FacilityContact: 'contact',
+    FacilityService: 'service',
+    FacilityCoordinate: 'coordinate',
+}
+
+
+@receiver(post_delete, sender=Facility)
+@receiver(post_delete, sender=FacilityContact)
+@receiver(post_delete, sender=FacilityService)
+@receiver(post_delete, sender=FacilityCoordinate)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Hard deletes leave no row behind for delta sync to find, so note them."""
+    FacilitySyncTombstone.objects.create(
+        entity=TOMBSTONE_ENTITIES[sender],
+        object_id=instance.pk,
+        facility_id=instance.pk if sender is Facility else instance.facility_id,
+    )
+
+
+@receiver(post_save, sender=FacilityContact)
+@receiver(post_delete, sender=FacilityContact)
+@receiver(post_save, sender=FacilityService)
+@receiver(post_delete, sender=FacilityService)
+@receiver(post_save, sender=FacilityCoordinate)
+@receiver(post_delete, sender=FacilityCoordinate)
+def facility_summary_changed(sender, instance, raw=False, **kwargs):
+    """Keep Facility's denormalized coordinate and counters in step."""
+    if not raw:
+        refresh_facility_summaries([instance.facility_id])
+
+
+@receiver(post_save, sender=Facility)
+def facility_search_document_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=FacilityService)
+@receiver(post_delete, sender=FacilityService)
+def service_search_document_changed(sender, instance, raw=False, **kwargs):
+    """Service categories are part of the facility's search document."""
+    if not raw:
+        refresh_search_documents([instance.facility_id])
+
+
+GEOGRAPHY_FACILITY_FILTERS = {
+    Ward: 'ward_id',
+    Constituency: 'ward__constituency_id',
+    County: 'ward__constituency__county_id',
+}
+
+
+@receiver(post_save, sender=Ward)
+@receiver(post_save, sender=Constituency)
+@receiver(post_save, sender=County)
+def place_name_changed(sender, instance, created=False, raw=False, **kwargs):
+    """
+    A renamed place changes the search document of every facility inside
+    it, and the place names their sync records carry: updated_at moves on
+    so the next delta resends them.
+    """
+    if created or raw:
+        return
+    facilities = Facility.objects.filter(**{GEOGRAPHY_FACILITY_FILTERS[sender]: instance.pk})
+    facility_ids = list(facilities.values_list('facility_id', flat=True))
+    Facility.objects.filter(facility_id__in=facility_ids).update(updated_at=timezone.now())
+    refresh_search_documents(facility_ids)
+
+
+@receiver(post_save, sender=Facility)
+@receiver(post_delete, sender=Facility)
+def facility_suggestions_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        facility_id = instance.pk
+        transaction.on_commit(lambda: note_facility_changed(facility_id))
+
+
+@receiver(post_save, sender=Ward)
+@receiver(post_delete, sender=Ward)
+@receiver(post_save, sender=Constituency)
+@receiver(post_delete, sender=Constituency)
+@receiver(post_save, sender=County)
+@receiver(post_delete, sender=County)
+def place_suggestions_changed(sender, raw=False, **kwargs):
+    """Place names are few and rarely edited, so rebuild rather than patch."""
+    if not raw:
+        transaction.on_commit(invalidate_suggest_index)
+
+
+def _county_of_ward(ward_id):
+    return (
+        Ward.objects.filter(pk=ward_id)
+        .values_list('constituency__county_id', flat=True).first()
+    )
+
+
+@receiver(pre_save, sender=Facility)
+def remember_previous_county(sender, instance, raw=False, **kwargs):
+    """A facility moved to another county changes the cached data of both."""
+    instance._previous_county_id = None
+    if instance.pk and not raw:
+        instance._previous_county_id = (
+            Facility.objects.filter(pk=instance.pk)
+            .values_list('ward__constituency__county_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Facility)
+@receiver(post_delete, sender=Facility)
+@receiver(post_save, sender=FacilityContact)
+@receiver(post_delete, sender=FacilityContact)
+@receiver(post_save, sender=FacilityService)
+@receiver(post_delete, sender=FacilityService)
+@receiver(post_save, sender=FacilityCoordinate)
+@receiver(post_delete, sender=FacilityCoordinate)
+@receiver(post_save, sender=FacilityOwner)
+@receiver(post_delete, sender=FacilityOwner)
+@receiver(post_save, sender=FacilityGBVCategory)
+@receiver(post_delete, sender=FacilityGBVCategory)
+@receiver(post_save, sender=FacilityInfrastructure)
+@receiver(post_delete, sender=FacilityInfrastructure)
+def facility_data_changed(sender, instance, raw=False, **kwargs):
+    """
+    Bump the cache versions of every county the edit touched. Owners,
+    categories and infrastructure only show in the facility detail, but its
+    ETag is keyed on the county version too.
+    """
+    if raw:
+        return
+    if sender is Facility:
+        county_ids = {
+            _county_of_ward(instance.ward_id),
+            getattr(instance, '_previous_county_id', None),
+        }
+    else:
+        county_ids = {
+            Facility.objects.filter(pk=instance.facility_id)
+            .values_list('ward__constituency__county_id', flat=True).first()
+        }
+    county_ids.discard(None)
+    invalidate_facility_cache(*county_ids)
+
+
+@receiver(post_save, sender=Ward)
+@receiver(post_delete, sender=Ward)
+@receiver(post_save, sender=Constituency)
+@receiver(post_delete, sender=Constituency)
+@receiver(post_save, sender=County)
+@receiver(post_delete, sender=County)
+def place_data_changed(sender, instance, raw=False, **kwargs):
+    """Place names appear in cached responses; counts feed the statistics."""
+    if raw:
+        return
+    if sender is County:
+        county_id = instance.pk
+    elif sender is Constituency:
+        county_id = instance.county_id
+    else:
+        county_id = (
+            Constituency.objects.filter(pk=instance.constituency_id)
+            .values_list('county_id', flat=True).first()
+        )
+    invalidate_facility_cache(*([county_id] if county_id else []))
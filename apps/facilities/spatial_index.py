@@ -0,0 +1,258 @@
+# -*- encoding: utf-8 -*-
+"""
+In-process spatial index over active facility coordinates.
+
+The mobile list, contact and SOS endpoints used to rank facilities by
+annotating every joined FacilityCoordinate row with Sqrt(Power(...)) and
+sorting in SQL, which scans the whole coordinate table on every request. The
+directory only holds a few thousand points and changes a handful of times a
+day, so each worker keeps them in a uniform lat/lng grid instead and answers
+nearest and radius queries in memory, using the haversine distance from
+geo.py. Views get back ordered facility IDs and load just those rows for the
+serializers.
+
+Freshness: a save or delete on Facility/FacilityCoordinate bumps a version
+key in the shared cache (see signals.py). Workers compare against it at most
+every VERSION_CHECK_SECONDS and rebuild when it moved. Bulk updates bypass
+signals, so an index is also rebuilt once it is MAX_AGE_SECONDS old.
+"""
+
+import heapq
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+from .geo import KM_PER_DEGREE_LAT, bounding_box, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# 0.1 degree is about 11 km at the equator: a few dozen facilities per cell in
+# Nairobi, and most rural cells empty.
+CELL_SIZE_DEG = 0.1
+
+VERSION_CACHE_KEY = 'facility_spatial_index_version'
+VERSION_CHECK_SECONDS = 5
+MAX_AGE_SECONDS = 600
+
+
+class SpatialGrid:
+    """
+    Uniform grid of (facility_id, latitude, longitude) points.
+
+    Immutable once built; a refresh builds a new grid and swaps the reference,
+    so readers never need a lock.
+    """
+
+    def __init__(self, points, cell_size_deg=CELL_SIZE_DEG):
+        self.cell_size = cell_size_deg
+        self.cells = {}
+        self.facility_ids = set()
+        max_abs_lat = 0.0
+        for facility_id, lat, lng in points:
+            lat = float(lat)
+            lng = float(lng)
+            self.cells.setdefault(self._cell(lat, lng), []).append((facility_id, lat, lng))
+            self.facility_ids.add(facility_id)
+            max_abs_lat = max(max_abs_lat, abs(lat))
+
+        if self.cells:
+            rows = [row for row, _ in self.cells]
+            cols = [col for _, col in self.cells]
+            self._row_range = (min(rows), max(rows))
+            self._col_range = (min(cols), max(cols))
+        else:
+            self._row_range = self._col_range = (0, 0)
+
+        # Smallest ground distance one cell step can represent. Used as the
+        # lower bound that lets nearest() stop expanding rings early.
+        cos_lat = max(math.cos(math.radians(min(max_abs_lat + cell_size_deg, 89.0))), 0.01)
+        self._min_cell_km = cell_size_deg * KM_PER_DEGREE_LAT * cos_lat
+
+    def __len__(self):
+        return len(self.facility_ids)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def _ring(self, row, col, ring):
+        """Yield the cells exactly `ring` steps (Chebyshev) from (row, col)."""
+        if ring == 0:
+            yield (row, col)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (row - ring, c)
+            yield (row + ring, c)
+        for r in range(row - ring + 1, row + ring):
+            yield (r, col - ring)
+            yield (r, col + ring)
+
+    def _max_ring(self, row, col):
+        """Ring beyond which no cell of this grid can exist."""
+        return max(
+            abs(row - self._row_range[0]), abs(row - self._row_range[1]),
+            abs(col - self._col_range[0]), abs(col - self._col_range[1]),
+        )
+
+    def count(self, allowed=None):
+        """Number of indexed facilities, optionally restricted to `allowed` IDs."""
+        if allowed is None:
+            return len(self.facility_ids)
+        return len(self.facility_ids.intersection(allowed))
+
+    def nearest(self, lat, lng, k=10, radius_km=None, allowed=None, after=None):
+        """
+        Return up to `k` (facility_id, distance_km) pairs, closest first.
+
+        Rings of cells are scanned outwards from the query cell until the k-th
+        best distance is no further than anything an unscanned ring could hold.
+
+        `after` is a (distance_km, facility_id) key from a previous page; only
+        points ordered strictly after it are returned, and rings that lie
+        entirely closer than it are skipped.
+        """
+        if k <= 0 or not self.cells:
+            return []
+        lat = float(lat)
+        lng = float(lng)
+        row, col = self._cell(lat, lng)
+        max_ring = self._max_ring(row, col)
+        best = []  # max-heap on distance via negation
+
+        ring = 0
+        if after is not None:
+            # A point in ring r is at most r + 1 cells away along each axis,
+            # and a degree of longitude is never longer than one of latitude.
+            cell_km = self.cell_size * KM_PER_DEGREE_LAT
+            ring = max(0, int(after[0] // (2 * cell_km)) - 1)
+        while ring <= max_ring:
+            for cell in self._ring(row, col, ring):
+                for facility_id, plat, plng in self.cells.get(cell, ()):
+                    if allowed is not None and facility_id not in allowed:
+                        continue
+                    distance = haversine_km(lat, lng, plat, plng)
+                    if radius_km is not None and distance > radius_km:
+                        continue
+                    if after is not None and (distance, facility_id) <= after:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, facility_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, facility_id))
+            # Every point in ring + 1 and beyond is at least `ring` full cells
+            # away from the query point.
+            bound = ring * self._min_cell_km
+            if radius_km is not None and bound > radius_km:
+                break
+            if len(best) == k and -best[0][0] <= bound:
+                break
+            ring += 1
+
+        return sorted(((facility_id, -neg) for neg, facility_id in best), key=lambda item: (item[1], item[0]))
+
+    def within(self, lat, lng, radius_km, allowed=None):
+        """Return every (facility_id, distance_km) within `radius_km`, closest first."""
+        if not self.cells:
+            return []
+        lat = float(lat)
+        lng = float(lng)
+        radius_km = float(radius_km)
+        south, west, north, east = bounding_box(lat, lng, radius_km)
+        row_lo, col_lo = self._cell(south, west)
+        row_hi, col_hi = self._cell(north, east)
+        row_lo = max(row_lo, self._row_range[0])
+        row_hi = min(row_hi, self._row_range[1])
+        col_lo = max(col_lo, self._col_range[0])
+        col_hi = min(col_hi, self._col_range[1])
+
+        found = []
+        for r in range(row_lo, row_hi + 1):
+            for c in range(col_lo, col_hi + 1):
+                for facility_id, plat, plng in self.cells.get((r, c), ()):
+                    if allowed is not None and facility_id not in allowed:
+                        continue
+                    distance = haversine_km(lat, lng, plat, plng)
+                    if distance <= radius_km:
+                        found.append((facility_id, distance))
+        found.sort(key=lambda item: (item[1], item[0]))
+        return found
+
+
+def load_points():
+    """
+    One (facility_id, lat, lng) per active facility: its latest active
+    coordinate, matching what the list serializers display.
+    """
+    from .models import FacilityCoordinate
+
+    rows = FacilityCoordinate.objects.filter(
+        is_active=True,
+        facility__is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).order_by('facility_id', '-created_at', '-coordinate_id').values_list(
+        'facility_id', 'latitude', 'longitude'
+    )
+    seen = set()
+    for facility_id, lat, lng in rows.iterator(chunk_size=2000):
+        if facility_id in seen:
+            continue
+        seen.add(facility_id)
+        yield facility_id, lat, lng
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_built_at = 0.0
+_checked_at = 0.0
+_dirty = False
+
+
+def get_spatial_index(fresh=False):
+    """
+    Return this worker's grid, rebuilding it first if it is out of date.
+
+    With `fresh` the shared version key is checked now rather than up to
+    VERSION_CHECK_SECONDS later. Use it where the result is cached beyond
+    this request, such as map tiles.
+    """
+    global _index, _index_version, _built_at, _checked_at, _dirty
+
+    now = time.monotonic()
+    if (not fresh and _index is not None and not _dirty
+            and now - _checked_at < VERSION_CHECK_SECONDS
+            and now - _built_at < MAX_AGE_SECONDS):
+        return _index
+
+    with _lock:
+        now = time.monotonic()
+        version = cache.get(VERSION_CACHE_KEY)
+        _checked_at = now
+        if (_index is not None and not _dirty
+                and version == _index_version
+                and now - _built_at < MAX_AGE_SECONDS):
+            return _index
+
+        started = time.perf_counter()
+        # Clear the flag before reading so an edit that lands mid-build marks
+        # the fresh index dirty again instead of being lost.
+        _dirty = False
+        index = SpatialGrid(load_points())
+        _index = index
+        _index_version = version
+        _built_at = time.monotonic()
+        logger.info(
+            'Facility spatial index built: %d facilities, %d cells, %.1f ms',
+            len(index), len(index.cells), (time.perf_counter() - started) * 1000,
+        )
+        return index
+
+
+def invalidate_spatial_index():
+    """Mark the index stale in this worker and, via the cache, in every other."""
+    global _dirty
+    _dirty = True
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
@@ -0,0 +1,406 @@
+# -*- encoding: utf-8 -*-
+"""
+Typo-tolerant autocomplete over facility and place names.
+
+Users look for help while under stress, on small keyboards, and often in
+Kiswahili, so "hospitl", "nairbi" and "kliniki kibera" have to find something.
+A database LIKE either finds nothing or scans every row. Each worker
+therefore keeps a small index over the words of every active facility name
+and every ward, constituency and county name:
+
+* a sorted vocabulary answers prefix lookups ("kib" -> kibera, kibra) with a
+  bisect;
+* a trigram map from word to candidate words finds near misses, which are
+  then confirmed with a bounded edit distance (1 edit from 4 letters,
+  2 edits from 8);
+* English words in names are also indexed under their Kiswahili forms
+  (KISWAHILI_ALIASES), so "hospitali" matches "hospital".
+
+Every query word must match some word of a suggestion. The last word may be
+a prefix, because the user is still typing it. Exact words score highest,
+then prefixes, then typos. Facilities outrank places when the scores tie.
+
+Freshness works like the spatial index, but incrementally. A facility
+save or delete appends its ID to a change log in the shared cache
+(note_facility_changed). Workers check the log at most every
+VERSION_CHECK_SECONDS and reload just those facilities. A place rename, or
+a gap in the log, bumps the version (invalidate_suggest_index) and workers
+rebuild from scratch.
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+from .search import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'facility_suggest_version'
+SEQUENCE_CACHE_KEY = 'facility_suggest_sequence'
+CHANGE_CACHE_KEY = 'facility_suggest_change:{}'
+CHANGE_CACHE_SECONDS = 86400
+VERSION_CHECK_SECONDS = 5
+# Past this many pending changes a full rebuild is cheaper than patching
+MAX_INCREMENTAL_CHANGES = 500
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# English words common in facility and place names, with the Kiswahili
+# words people type for them
+KISWAHILI_ALIASES = {
+    'hospital': ['hospitali'],
+    'clinic': ['kliniki'],
+    'dispensary': ['zahanati'],
+    'health': ['afya'],
+    'centre': ['kituo'],
+    'center': ['kituo'],
+    'police': ['polisi'],
+    'station': ['kituo'],
+    'court': ['mahakama'],
+    'legal': ['kisheria', 'sheria'],
+    'counselling': ['ushauri'],
+    'counseling': ['ushauri'],
+    'shelter': ['makazi', 'hifadhi'],
+    'rescue': ['uokoaji'],
+    'women': ['wanawake'],
+    'children': ['watoto'],
+    'child': ['mtoto'],
+    'youth': ['vijana'],
+    'church': ['kanisa'],
+    'mosque': ['msikiti'],
+    'school': ['shule'],
+    'office': ['ofisi'],
+    'county': ['kaunti'],
+    'ward': ['wadi'],
+    'constituency': ['eneo bunge'],
+    'referral': ['rufaa'],
+    'support': ['msaada'],
+    'help': ['msaada'],
+    'community': ['jamii'],
+    'mission': ['misheni'],
+    'medical': ['matibabu'],
+}
+
+# Near-miss words checked with edit_distance per query word, best trigram
+# overlap first
+MAX_FUZZY_CANDIDATES = 60
+
+# Scores for how a query word matched an indexed word
+EXACT, PREFIX, ONE_EDIT, TWO_EDITS = 1.0, 0.85, 0.7, 0.5
+# Facilities before places on equal scores
+KIND_ORDER = {'facility': 0, 'ward': 1, 'constituency': 2, 'county': 3}
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word):
+    """Typos tolerated in a query word of this length."""
+    if len(word) >= 8:
+        return 2
+    if len(word) >= 4:
+        return 1
+    return 0
+
+
+def edit_distance(a, b, limit, prefix=False):
+    """
+    Optimal string alignment distance (adjacent swaps count as one edit),
+    or limit + 1 as soon as it is certain to exceed `limit`.
+
+    With `prefix`, the distance from `a` to the closest-matching start of
+    `b`, for a word that is still being typed.
+    """
+    if prefix:
+        b = b[:len(a) + limit]
+    elif abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(b) < len(a) - limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        best = i
+        for j, cb in enumerate(b, 1):
+            value = previous[j - 1] if ca == cb else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous2 is not None and j > 1 and ca == b[j - 2]
+                    and a[i - 2] == cb and previous2[j - 2] + 1 < value):
+                value = previous2[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    if prefix:
+        # The last row holds the distance to every prefix of b
+        return min(previous[max(0, len(a) - limit):])
+    return previous[-1]
+
+
+class SuggestIndex:
+    """
+    Entries keyed by (kind, id), each with a label, a context line (where it
+    is) and its indexed words. Unlike SpatialGrid it is patched in place, so
+    callers hold _lock while reading or writing it.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        self.postings = {}
+        self.vocabulary = []
+        self.trigrams = {}
+        for key, label, context in entries:
+            self.add(key, label, context)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _words(label):
+        words = set(normalize_search_text(label).replace('/', ' ').replace('-', ' ').split())
+        for word in list(words):
+            for alias in KISWAHILI_ALIASES.get(word, ()):
+                words.update(alias.split())
+        return words
+
+    def add(self, key, label, context=''):
+        self.remove(key)
+        words = self._words(label)
+        self.entries[key] = (label, context, words)
+        for word in words:
+            keys = self.postings.get(word)
+            if keys is None:
+                keys = self.postings[word] = set()
+                bisect.insort(self.vocabulary, word)
+                for trigram in _trigrams(word):
+                    self.trigrams.setdefault(trigram, set()).add(word)
+            keys.add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for word in entry[2]:
+            keys = self.postings[word]
+            keys.discard(key)
+            if not keys:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+                for trigram in _trigrams(word):
+                    words = self.trigrams[trigram]
+                    words.discard(word)
+                    if not words:
+                        del self.trigrams[trigram]
+
+    def _matches(self, word, is_prefix):
+        """{indexed_word: score} for one query word."""
+        matches = {}
+        if word in self.postings:
+            matches[word] = EXACT
+        if is_prefix:
+            start = bisect.bisect_left(self.vocabulary, word)
+            for candidate in self.vocabulary[start:start + 200]:
+                if not candidate.startswith(word):
+                    break
+                matches.setdefault(candidate, PREFIX)
+
+        limit = max_edits(word)
+        if limit:
+            # One edit breaks at most four of the word's trigrams (a swap of
+            # two letters), so a candidate within `limit` edits still shares
+            # the rest. A word being typed has no end yet, so its closing
+            # trigram is dropped.
+            trigrams = _trigrams(word)
+            if is_prefix:
+                trigrams.discard(f'{word[-2:]} ')
+            counts = {}
+            for trigram in trigrams:
+                for candidate in self.trigrams.get(trigram, ()):
+                    counts[candidate] = counts.get(candidate, 0) + 1
+            needed = max(1, len(trigrams) - 4 * limit)
+            candidates = heapq.nlargest(
+                MAX_FUZZY_CANDIDATES,
+                (item for item in counts.items() if item[1] >= needed and item[0] not in matches),
+                key=lambda item: item[1],
+            )
+            for candidate, _ in candidates:
+                distance = edit_distance(word, candidate, limit, prefix=is_prefix)
+                if distance <= limit:
+                    matches[candidate] = ONE_EDIT if distance <= 1 else TWO_EDITS
+        return matches
+
+    def query(self, text, limit=DEFAULT_LIMIT):
+        """Return up to `limit` suggestions for `text`, best first."""
+        words = normalize_search_text(text).replace('/', ' ').replace('-', ' ').split()
+        if not words:
+            return []
+
+        matches = [
+            self._matches(word, position == len(words) - 1)
+            for position, word in enumerate(words)
+        ]
+        if not all(matches):
+            return []
+
+        # Expand the most selective query word through the postings, then
+        # check the survivors' own words against the other query words
+        sizes = [sum(len(self.postings[word]) for word in found) for found in matches]
+        first = sizes.index(min(sizes))
+        scores = {}
+        for candidate, score in matches[first].items():
+            for key in self.postings[candidate]:
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        for position, found in enumerate(matches):
+            if position == first:
+                continue
+            narrowed = {}
+            for key, total in scores.items():
+                best = max((found.get(word, 0) for word in self.entries[key][2]), default=0)
+                if best:
+                    narrowed[key] = total + best
+            scores = narrowed
+            if not scores:
+                return []
+
+        best = heapq.nsmallest(
+            limit, scores.items(),
+            key=lambda item: (-item[1], KIND_ORDER[item[0][0]], len(self.entries[item[0]][0]), item[0][1]),
+        )
+        results = []
+        for (kind, object_id), score in best:
+            label, context, _ = self.entries[(kind, object_id)]
+            results.append({
+                'type': kind,
+                'id': object_id,
+                'label': label,
+                'context': context,
+                'score': round(score / len(words), 3),
+            })
+        return results
+
+
+def facility_entries(facility_ids=None):
+    """(key, label, context) for active facilities, optionally only `facility_ids`."""
+    from .models import Facility
+
+    facilities = Facility.objects.filter(is_active=True)
+    if facility_ids is not None:
+        facilities = facilities.filter(facility_id__in=facility_ids)
+    for facility_id, name, ward, county in facilities.values_list(
+        'facility_id', 'facility_name', 'ward__ward_name',
+        'ward__constituency__county__county_name',
+    ).iterator(chunk_size=2000):
+        yield ('facility', facility_id), name, ', '.join(part for part in (ward, county) if part)
+
+
+def place_entries():
+    """(key, label, context) for every ward, constituency and county."""
+    from apps.geography.models import Constituency, County, Ward
+
+    for county_id, name in County.objects.values_list('county_id', 'county_name'):
+        yield ('county', county_id), name, 'County'
+    for constituency_id, name, county in Constituency.objects.values_list(
+        'constituency_id', 'constituency_name', 'county__county_name'
+    ):
+        yield ('constituency', constituency_id), name, f'Constituency, {county}'
+    for ward_id, name, constituency, county in Ward.objects.values_list(
+        'ward_id', 'ward_name', 'constituency__constituency_name',
+        'constituency__county__county_name',
+    ).iterator(chunk_size=2000):
+        yield ('ward', ward_id), name, f'Ward, {constituency}, {county}'
+
+
+_lock = threading.RLock()
+_index = None
+_index_version = None
+_sequence = 0
+_checked_at = 0.0
+
+
+def _refresh():
+    """Bring this worker's index up to date. Caller holds _lock."""
+    global _index, _index_version, _sequence, _checked_at
+
+    _checked_at = time.monotonic()
+    state = cache.get_many([VERSION_CACHE_KEY, SEQUENCE_CACHE_KEY])
+    version = state.get(VERSION_CACHE_KEY)
+    sequence = state.get(SEQUENCE_CACHE_KEY) or 0
+
+    if _index is not None and version == _index_version:
+        if sequence == _sequence:
+            return
+        pending = range(_sequence + 1, sequence + 1)
+        if 0 < len(pending) <= MAX_INCREMENTAL_CHANGES:
+            changes = cache.get_many([CHANGE_CACHE_KEY.format(n) for n in pending])
+            if len(changes) == len(pending):
+                started = time.perf_counter()
+                changed_ids = set(changes.values())
+                for facility_id in changed_ids:
+                    _index.remove(('facility', facility_id))
+                for key, label, context in facility_entries(changed_ids):
+                    _index.add(key, label, context)
+                _sequence = sequence
+                logger.info(
+                    'Facility suggest index patched: %d facilities, %.1f ms',
+                    len(changed_ids), (time.perf_counter() - started) * 1000,
+                )
+                return
+
+    # First use, a place change, or log entries expired: start over. The
+    # sequence is read before loading, so changes made during the build are
+    # applied again next time, which is harmless.
+    started = time.perf_counter()
+    index = SuggestIndex(place_entries())
+    for key, label, context in facility_entries():
+        index.add(key, label, context)
+    _index = index
+    _index_version = version
+    _sequence = sequence
+    logger.info(
+        'Facility suggest index built: %d entries, %d words, %.1f ms',
+        len(index), len(index.vocabulary), (time.perf_counter() - started) * 1000,
+    )
+
+
+def suggest(text, limit=DEFAULT_LIMIT):
+    """Top `limit` facility and place suggestions for the partial query `text`."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    with _lock:
+        if _index is None or time.monotonic() - _checked_at >= VERSION_CHECK_SECONDS:
+            _refresh()
+        return _index.query(text, limit)
+
+
+def note_facility_changed(facility_id):
+    """Queue one facility for every worker to reload into its index."""
+    global _checked_at
+    try:
+        sequence = cache.incr(SEQUENCE_CACHE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_CACHE_KEY, 0, None)
+        sequence = cache.incr(SEQUENCE_CACHE_KEY)
+    cache.set(CHANGE_CACHE_KEY.format(sequence), facility_id, CHANGE_CACHE_SECONDS)
+    # This worker picks the change up on its next query
+    _checked_at = 0.0
+
+
+def invalidate_suggest_index():
+    """Make every worker rebuild its index from scratch (place names changed)."""
+    global _checked_at
+    _checked_at = 0.0
+    cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
@@ -0,0 +1,73 @@
+# -*- encoding: utf-8 -*-
+"""
+Denormalized per-facility summary columns.
+
+List and map serializers used to look up each facility's current coordinate
+and count its active services and contacts row by row, or through sliced
+prefetches that still cost three extra queries per page. Facility now carries
+the answers itself:
+
+* primary_latitude / primary_longitude: the newest active coordinate, the
+  same one the spatial index and the map endpoints pick;
+* has_coordinates: whether such a coordinate exists;
+* service_count / contact_count: active services and contacts.
+
+refresh_facility_summaries() recomputes them in a single UPDATE with
+correlated subqueries, so the database does the work and the result is
+correct whatever order concurrent edits land in. Signals call it for the
+facility behind every saved or deleted contact, service or coordinate.
+Queryset .update() and bulk_create() skip signals, so code using them must
+call it too. Migration 0006 fills the columns for existing facilities;
+the backfill_facility_summaries command repairs everything.
+"""
+
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Facility, FacilityContact, FacilityCoordinate, FacilityService
+
+
+def _active_count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(facility_id=OuterRef('pk'), is_active=True)
+            .order_by().values('facility_id')
+            .annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def summary_columns(coordinate_model=FacilityCoordinate, service_model=FacilityService,
+                    contact_model=FacilityContact):
+    """
+    The summary columns as expressions over the child tables, for
+    Facility.objects.update(). Migrations pass their historical models.
+    """
+    latest = coordinate_model.objects.filter(
+        facility_id=OuterRef('pk'),
+        is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).order_by('-created_at', '-coordinate_id')
+    return {
+        'primary_latitude': Subquery(latest.values('latitude')[:1]),
+        'primary_longitude': Subquery(latest.values('longitude')[:1]),
+        'has_coordinates': Exists(latest),
+        'service_count': _active_count(service_model),
+        'contact_count': _active_count(contact_model),
+    }
+
+
+def refresh_facility_summaries(facility_ids=None):
+    """
+    Recompute the summary columns for `facility_ids`, or for every facility
+    when None. Returns the number of facilities updated.
+    """
+    facilities = Facility.objects.all()
+    if facility_ids is not None:
+        facilities = facilities.filter(facility_id__in=list(facility_ids))
+    # .update() on purpose: no save signals, so tiles, the spatial index and
+    # updated_at are left alone; the child edit already accounted for them
+    return facilities.update(**summary_columns())
@@ -0,0 +1,232 @@
+# -*- encoding: utf-8 -*-
+"""
+Offline delta sync of the facility directory for the mobile app.
+
+The app used to page through /mobile/facilities/list on every launch to keep
+its offline copy current, downloading the whole directory even when nothing
+had changed. Sync works from a watermark instead:
+
+* without `since` the client gets a snapshot of every active facility,
+  with its active contacts, services and current coordinates;
+* with the `watermark` from its previous response it gets only the
+  facilities that changed after it, plus the IDs of facilities that were
+  deactivated or deleted (tombstones) so they can be dropped locally.
+
+The unit of sync is the facility. A facility is resent whole when it or any
+of its contacts, services or coordinates changed, and the client replaces
+its local record, so a deactivated contact simply disappears from the list.
+Hard deletes leave no row to find, so the signals record them in
+FacilitySyncTombstone.
+
+The watermark handed out lags the clock by SYNC_SAFETY_LAG. A transaction
+that stamped updated_at just before the response but committed just after
+it would otherwise never be seen. Records inside the lag are sent twice,
+which is harmless because the client upserts.
+
+A client whose watermark is older than the tombstone retention, or that has
+fallen too far behind, gets a fresh snapshot flagged with reset=true and
+must replace its local copy.
+"""
+
+import gzip
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    Facility, FacilityContact, FacilityCoordinate, FacilityService, FacilitySyncTombstone
+)
+
+SYNC_SAFETY_LAG = timedelta(seconds=60)
+TOMBSTONE_RETENTION = timedelta(days=90)
+# Past this many changed facilities the cached snapshot is cheaper to serve
+MAX_DELTA_FACILITIES = 2000
+
+SNAPSHOT_CACHE_KEY = 'facility_sync_snapshot'
+SNAPSHOT_CACHE_SECONDS = 300
+
+
+class InvalidWatermark(ValueError):
+    """The `since` value is not a watermark this endpoint handed out."""
+
+
+def parse_watermark(value):
+    """Return the aware datetime in `value`, or None for a first sync."""
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise InvalidWatermark('since must be the watermark from a previous sync response')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def build_records(facility_ids=None):
+    """
+    Serialize facilities with their active children in three flat queries.
+    `facility_ids` limits the output; None means every active facility.
+    """
+    facilities = Facility.objects.filter(is_active=True)
+    contacts = FacilityContact.objects.filter(is_active=True, facility__is_active=True)
+    services = FacilityService.objects.filter(is_active=True, facility__is_active=True)
+    if facility_ids is not None:
+        facilities = facilities.filter(facility_id__in=facility_ids)
+        contacts = contacts.filter(facility_id__in=facility_ids)
+        services = services.filter(facility_id__in=facility_ids)
+
+    records = {}
+    for row in facilities.order_by('facility_id').values(
+        'facility_id', 'facility_name', 'facility_code', 'registration_number',
+        'address_line_1', 'address_line_2', 'description', 'website_url',
+        'operational_status__status_name', 'ward_id', 'ward__ward_name',
+        'ward__constituency__constituency_name',
+        'ward__constituency__county__county_name', 'primary_latitude',
+        'primary_longitude', 'has_coordinates', 'updated_at',
+    ):
+        records[row['facility_id']] = {
+            'facility_id': row['facility_id'],
+            'facility_name': row['facility_name'],
+            'facility_code': row['facility_code'],
+            'registration_number': row['registration_number'],
+            'address_line_1': row['address_line_1'],
+            'address_line_2': row['address_line_2'],
+            'description': row['description'],
+            'website_url': row['website_url'],
+            'operational_status': row['operational_status__status_name'],
+            'ward_id': row['ward_id'],
+            'ward_name': row['ward__ward_name'],
+            'constituency_name': row['ward__constituency__constituency_name'],
+            'county_name': row['ward__constituency__county__county_name'],
+            'coordinates': {
+                'latitude': float(row['primary_latitude']),
+                'longitude': float(row['primary_longitude']),
+            } if row['has_coordinates'] else None,
+            'contacts': [],
+            'services': [],
+            'updated_at': _iso(row['updated_at']),
+        }
+
+    for row in contacts.order_by('-is_primary', 'contact_id').values(
+        'contact_id', 'facility_id', 'contact_type__type_name', 'contact_value',
+        'contact_person_name', 'is_primary',
+    ):
+        record = records.get(row['facility_id'])
+        if record is not None:
+            record['contacts'].append({
+                'contact_id': row['contact_id'],
+                'contact_type': row['contact_type__type_name'],
+                'contact_value': row['contact_value'],
+                'contact_person_name': row['contact_person_name'],
+                'is_primary': row['is_primary'],
+            })
+
+    for row in services.order_by('service_id').values(
+        'service_id', 'facility_id', 'service_category__category_name', 'service_name',
+        'service_description', 'is_free', 'cost_range', 'currency',
+        'availability_hours', 'availability_days', 'appointment_required',
+    ):
+        record = records.get(row['facility_id'])
+        if record is not None:
+            record['services'].append({
+                'service_id': row['service_id'],
+                'service_category': row['service_category__category_name'],
+                'service_name': row['service_name'],
+                'service_description': row['service_description'],
+                'is_free': row['is_free'],
+                'cost_range': row['cost_range'],
+                'currency': row['currency'],
+                'availability_hours': row['availability_hours'],
+                'availability_days': row['availability_days'],
+                'appointment_required': row['appointment_required'],
+            })
+
+    return list(records.values())
+
+
+def changed_facility_ids(since):
+    """
+    (changed, removed) facility IDs since `since`. `changed` are active
+    facilities to resend; `removed` are facilities the client should drop.
+    """
+    changed = set(
+        FacilityContact.objects.filter(updated_at__gt=since).values_list('facility_id', flat=True)
+    )
+    changed.update(
+        FacilityService.objects.filter(updated_at__gt=since).values_list('facility_id', flat=True)
+    )
+    changed.update(
+        FacilityCoordinate.objects.filter(updated_at__gt=since).values_list('facility_id', flat=True)
+    )
+    changed.update(
+        FacilitySyncTombstone.objects.filter(deleted_at__gt=since)
+        .exclude(entity='facility').values_list('facility_id', flat=True)
+    )
+
+    removed = set(
+        FacilitySyncTombstone.objects.filter(deleted_at__gt=since, entity='facility')
+        .values_list('facility_id', flat=True)
+    )
+    states = Facility.objects.filter(
+        Q(updated_at__gt=since) | Q(facility_id__in=changed)
+    ).values_list('facility_id', 'is_active')
+    active = set()
+    for facility_id, is_active in states:
+        (active if is_active else removed).add(facility_id)
+    # A facility whose row is gone entirely is also removed
+    removed.update(changed - active - removed)
+    return active, removed
+
+
+def _snapshot_body():
+    """Gzipped JSON of the full snapshot, shared between workers for a few minutes."""
+    body = cache.get(SNAPSHOT_CACHE_KEY)
+    if body is None:
+        watermark = timezone.now() - SYNC_SAFETY_LAG
+        payload = {
+            'watermark': watermark.isoformat(),
+            'reset': True,
+            'facilities': build_records(),
+            'deleted': [],
+        }
+        body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        cache.set(SNAPSHOT_CACHE_KEY, body, SNAPSHOT_CACHE_SECONDS)
+        # Rebuilt at most every few minutes, so a cheap place to prune
+        FacilitySyncTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION
+        ).delete()
+    return body
+
+
+def get_sync_body(since=None):
+    """
+    Return the gzipped JSON sync response for a client at watermark `since`
+    (None for a first sync). Callers decompress it for clients that do not
+    accept gzip.
+    """
+    if since is None or since < timezone.now() - TOMBSTONE_RETENTION:
+        return _snapshot_body()
+
+    watermark = timezone.now() - SYNC_SAFETY_LAG
+    active, removed = changed_facility_ids(since)
+    if len(active) + len(removed) > MAX_DELTA_FACILITIES:
+        return _snapshot_body()
+
+    payload = {
+        'watermark': watermark.isoformat(),
+        'reset': False,
+        'facilities': build_records(active) if active else [],
+        'deleted': sorted(removed),
+    }
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
@@ -1,10 +1,28 @@
-from django.test import TestCase, Client
+import gzip
+import json
+import random
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.test import SimpleTestCase, TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from .models import Facility, FacilityCoordinate
+from django.utils import timezone
+from .models import Facility, FacilityContact, FacilityCoordinate, FacilityService
 from apps.geography.models import County, Constituency, Ward
-from apps.lookups.models import OperationalStatus
+from apps.lookups.models import ContactType, OperationalStatus, ServiceCategory
+from apps.mobile_sessions.models import MobileSession
+from .cache_utils import get_data_version, get_facility_statistics
 from .forms import FacilityForm
+from .clustering import CLUSTER_MAX_ZOOM, ClusterIndex
+from .geo import bbox_q, bounding_box, facilities_within, haversine_km
+from .spatial_index import SpatialGrid, get_spatial_index, invalidate_spatial_index
+from .suggest import SuggestIndex, edit_distance, invalidate_suggest_index, suggest
+from .search import normalize_search_text, search_facilities
+from .summary import refresh_facility_summaries
+from .sync import get_sync_body
+from .tiles import get_tile, tile_bounds, tile_for_point, tiles_touched
 
 User = get_user_model()
 
@@ -216,3 +234,487 @@ class FacilityFormTest(TestCase):
         # Check that ward queryset is not filtered (simplified approach)
         ward_queryset = form.fields['ward'].queryset
         self.assertTrue(ward_queryset.count() > 0)
+
+
+class SpatialGridTest(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [
+            (i, rng.uniform(-4.7, 5.0), rng.uniform(33.9, 41.9))
+            for i in range(1, 2001)
+        ]
+        self.grid = SpatialGrid(self.points)
+
+    def _brute_force(self, lat, lng, radius_km=None, allowed=None):
+        ranked = sorted(
+            ((fid, haversine_km(lat, lng, plat, plng)) for fid, plat, plng in self.points
+             if allowed is None or fid in allowed),
+            key=lambda item: (item[1], item[0])
+        )
+        if radius_km is not None:
+            ranked = [item for item in ranked if item[1] <= radius_km]
+        return ranked
+
+    def test_haversine_known_distance(self):
+        """Nairobi CBD to Mombasa CBD is roughly 440 km as the crow flies"""
+        self.assertAlmostEqual(haversine_km(-1.2864, 36.8172, -4.0435, 39.6682), 440, delta=5)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lng in [(-1.2921, 36.8219), (0.5143, 35.2698), (4.9, 41.8), (-4.6, 34.0)]:
+            expected = self._brute_force(lat, lng)[:15]
+            self.assertEqual(self.grid.nearest(lat, lng, k=15), expected)
+
+    def test_nearest_respects_radius_and_allowed(self):
+        allowed = {fid for fid, _, _ in self.points if fid % 3 == 0}
+        expected = self._brute_force(-1.2921, 36.8219, radius_km=80, allowed=allowed)[:10]
+        self.assertEqual(
+            self.grid.nearest(-1.2921, 36.8219, k=10, radius_km=80, allowed=allowed),
+            expected
+        )
+
+    def test_within_matches_brute_force(self):
+        expected = self._brute_force(0.0, 37.9, radius_km=60)
+        self.assertEqual(self.grid.within(0.0, 37.9, 60), expected)
+
+    def test_nearest_after_key_pages_through_everything(self):
+        """Chaining `after` keys visits every point once, in distance order"""
+        lat, lng = -1.2921, 36.8219
+        pages = []
+        after = None
+        while True:
+            page = self.grid.nearest(lat, lng, k=150, after=after)
+            if not page:
+                break
+            pages.extend(page)
+            after = (page[-1][1], page[-1][0])
+        self.assertEqual(pages, self._brute_force(lat, lng))
+
+    def test_empty_grid(self):
+        grid = SpatialGrid([])
+        self.assertEqual(grid.nearest(0, 0, k=5), [])
+        self.assertEqual(grid.within(0, 0, 10), [])
+        self.assertEqual(grid.count(), 0)
+
+
+class ClusterIndexTest(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.points = [
+            (i, rng.uniform(-4.7, 5.0), rng.uniform(33.9, 41.9))
+            for i in range(1, 1001)
+        ]
+        self.index = ClusterIndex(self.points, {i: f'Facility {i}' for i, _, _ in self.points})
+
+    def test_every_facility_counted_once_per_zoom(self):
+        for zoom in (1, 6, 10, 14):
+            clusters, points = self.index.query(zoom)
+            self.assertEqual(sum(c['count'] for c in clusters) + len(points), len(self.points))
+
+    def test_allowed_restricts_counts(self):
+        allowed = {i for i, _, _ in self.points if i % 2}
+        clusters, points = self.index.query(6, allowed=allowed)
+        self.assertEqual(sum(c['count'] for c in clusters) + len(points), len(allowed))
+        self.assertTrue(all(p['facility_id'] in allowed for p in points))
+
+    def test_high_zoom_returns_points_in_viewport(self):
+        bbox = (-1.5, 36.5, -1.0, 37.0)
+        clusters, points = self.index.query(CLUSTER_MAX_ZOOM, bbox=bbox)
+        expected = sorted(i for i, lat, lng in self.points if -1.5 <= lat <= -1.0 and 36.5 <= lng <= 37.0)
+        self.assertEqual(clusters, [])
+        self.assertEqual(sorted(p['facility_id'] for p in points), expected)
+
+    def test_cluster_centroid_inside_bounds(self):
+        clusters, _ = self.index.query(4)
+        for cluster in clusters:
+            self.assertLessEqual(cluster['bounds']['sw_lat'], cluster['latitude'])
+            self.assertLessEqual(cluster['latitude'], cluster['bounds']['ne_lat'])
+
+
+class SuggestIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = SuggestIndex([
+            (('facility', 1), 'Kenyatta National Hospital', 'Nairobi'),
+            (('facility', 2), 'Kibera Legal Aid Centre', 'Kibra, Nairobi'),
+            (('ward', 3), 'Kibra', 'Ward, Kibra, Nairobi'),
+            (('county', 4), 'Nairobi', 'County'),
+        ])
+
+    def _labels(self, text):
+        return [suggestion['label'] for suggestion in self.index.query(text)]
+
+    def test_prefix_typos_and_kiswahili(self):
+        self.assertEqual(self._labels('kib'), ['Kibera Legal Aid Centre', 'Kibra'])
+        self.assertEqual(self._labels('kenyata hosp'), ['Kenyatta National Hospital'])
+        self.assertEqual(self._labels('nairbi'), ['Nairobi'])
+        self.assertEqual(self._labels('hospitali'), ['Kenyatta National Hospital'])
+        self.assertEqual(self._labels('legal mombasa'), [])
+
+    def test_remove_drops_unused_words(self):
+        self.index.remove(('facility', 2))
+        self.assertEqual(self._labels('kibe'), ['Kibra'])
+        self.assertNotIn('legal', self.index.vocabulary)
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('mutkoa', 'mutoka', 1), 1)
+        self.assertEqual(edit_distance('nairo', 'nairobi', 1, prefix=True), 0)
+        self.assertEqual(edit_distance('kisumu', 'nakuru', 2), 3)
+
+
+class TileMathTest(SimpleTestCase):
+    def test_point_falls_inside_its_tile(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            lat, lng, z = rng.uniform(-80, 80), rng.uniform(-179, 179), rng.randint(0, 18)
+            south, west, north, east = tile_bounds(z, *tile_for_point(lat, lng, z))
+            self.assertTrue(south <= lat <= north and west <= lng <= east)
+
+    def test_touched_tiles_include_point_tile_at_every_zoom(self):
+        touched = tiles_touched(-1.2921, 36.8219)
+        for z in range(19):
+            self.assertIn((z, *tile_for_point(-1.2921, 36.8219, z)), touched)
+
+
+class FacilityTestCase(TestCase):
+    """Starts every test with self.facility: active, in Test Ward, with a coordinate in Nairobi"""
+
+    def setUp(self):
+        user = User.objects.create_user(
+            email='test@example.com',
+            full_name='Test User',
+            phone_number='+254700000000',
+            password='testpass123'
+        )
+        county = County.objects.create(county_name='Test County', county_code='TC001')
+        constituency = Constituency.objects.create(
+            constituency_name='Test Constituency', constituency_code='TC001', county=county
+        )
+        ward = Ward.objects.create(ward_name='Test Ward', ward_code='TW001', constituency=constituency)
+        status = OperationalStatus.objects.create(status_name='Operational', sort_order=1)
+        facility = Facility.objects.create(
+            facility_name='Test Facility',
+            facility_code='TF001',
+            registration_number='REG001',
+            operational_status=status,
+            ward=ward,
+            is_active=True,
+            created_by=user
+        )
+        FacilityCoordinate.objects.create(
+            facility=facility,
+            latitude=-1.2921,
+            longitude=36.8219,
+            collection_date='2024-01-01'
+        )
+        self.facility = facility
+
+
+class SpatialIndexTest(FacilityTestCase):
+    def test_index_contains_active_facilities_with_coordinates(self):
+        invalidate_spatial_index()
+        index = get_spatial_index()
+        self.assertEqual(index.nearest(-1.29, 36.82, k=5)[0][0], self.facility.facility_id)
+
+    def test_index_skips_inactive_facilities(self):
+        self.facility.is_active = False
+        self.facility.save()
+        invalidate_spatial_index()
+        self.assertEqual(len(get_spatial_index()), 0)
+
+    def test_facilities_within_uses_great_circle_distance(self):
+        results = facilities_within(-1.30, 36.82, 5)
+        self.assertEqual([facility_id for facility_id, _ in results], [self.facility.facility_id])
+        self.assertAlmostEqual(results[0][1], haversine_km(-1.30, 36.82, -1.2921, 36.8219), places=6)
+        self.assertEqual(facilities_within(-1.30, 36.92, 5), [])
+
+    def test_non_finite_radius_rejected(self):
+        MobileSession.objects.create(device_id='radius-test-device', latitude=-1.29, longitude=36.82)
+        for path in ('/mobile/facilities/list/', '/mobile/contacts/list/'):
+            for radius in ('nan', 'inf', '-5'):
+                response = self.client.get(path, {'device_id': 'radius-test-device', 'radius_km': radius})
+                self.assertEqual(response.status_code, 400, (path, radius))
+
+    def test_invalid_map_viewport_rejected(self):
+        MobileSession.objects.create(device_id='viewport-test-device')
+        viewport = {'ne_lat': '-1.0', 'ne_lng': '37.0', 'sw_lat': '-1.5', 'sw_lng': '36.5'}
+        for field, value in (('ne_lat', 'nan'), ('sw_lng', 'inf'), ('sw_lat', '-91'), ('ne_lng', '181')):
+            response = self.client.get('/mobile/facilities/map/', {
+                'device_id': 'viewport-test-device', 'cluster': 'true', **viewport, field: value
+            })
+            self.assertEqual(response.status_code, 400, (field, value))
+
+    def test_bbox_q_across_antimeridian(self):
+        crossing = FacilityCoordinate.objects.filter(bbox_q(-2.0, 170.0, 0.0, 40.0))
+        self.assertEqual(crossing.count(), 1)
+        self.assertEqual(FacilityCoordinate.objects.filter(bbox_q(-2.0, 170.0, 0.0, 30.0)).count(), 0)
+
+
+class TileCacheTest(FacilityTestCase):
+    def _tile_ids(self, z, lat, lng):
+        body, _ = get_tile(z, *tile_for_point(lat, lng, z))
+        return [row[0] for row in json.loads(body)['facilities']]
+
+    def test_tile_cache_invalidated_when_coordinate_moves(self):
+        invalidate_spatial_index()
+        self.assertEqual(self._tile_ids(17, -1.2921, 36.8219), [self.facility.facility_id])
+        coordinate = FacilityCoordinate.objects.get(facility=self.facility)
+        coordinate.latitude = -4.0435
+        coordinate.longitude = 39.6682
+        with self.captureOnCommitCallbacks(execute=True):
+            coordinate.save()
+        self.assertEqual(self._tile_ids(17, -1.2921, 36.8219), [])
+        self.assertEqual(self._tile_ids(17, -4.0435, 39.6682), [self.facility.facility_id])
+
+    def test_tile_revalidates_by_etag(self):
+        MobileSession.objects.create(device_id='tile-test-device')
+        url = '/mobile/facilities/tiles/{}/{}/{}/'.format(12, *tile_for_point(-1.2921, 36.8219, 12))
+        response = self.client.get(url, HTTP_X_DEVICE_ID='tile-test-device')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for if_none_match in (etag, 'W/' + etag, f'"other", {etag}', '*'):
+            revalidated = self.client.get(url, HTTP_X_DEVICE_ID='tile-test-device', HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(revalidated.status_code, 304, if_none_match)
+            self.assertEqual(revalidated['ETag'], etag)
+        stale = self.client.get(url, HTTP_X_DEVICE_ID='tile-test-device', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+
+class FacilitySyncTest(FacilityTestCase):
+    def _sync(self, since=None):
+        return json.loads(gzip.decompress(get_sync_body(since)))
+
+    def test_sync_delta_returns_only_changed_facilities(self):
+        snapshot = self._sync()
+        self.assertTrue(snapshot['reset'])
+        self.assertEqual(snapshot['facilities'][0]['coordinates']['latitude'], -1.2921)
+
+        since = timezone.now()
+        self.assertEqual(self._sync(since)['facilities'], [])
+        self.facility.facility_name = 'Renamed Facility'
+        self.facility.save()
+        delta = self._sync(since)
+        self.assertFalse(delta['reset'])
+        self.assertEqual([f['facility_name'] for f in delta['facilities']], ['Renamed Facility'])
+
+    def test_sync_sends_tombstones_for_deactivated_and_deleted_facilities(self):
+        since = timezone.now() - timedelta(seconds=1)
+        self.facility.is_active = False
+        self.facility.save()
+        delta = self._sync(since)
+        self.assertEqual(delta['facilities'], [])
+        self.assertEqual(delta['deleted'], [self.facility.facility_id])
+
+        facility_id = self.facility.facility_id
+        self.facility.delete()
+        self.assertEqual(self._sync(since)['deleted'], [facility_id])
+
+    def test_sync_view_honours_gzip_quality(self):
+        MobileSession.objects.create(device_id='sync-test-device')
+        url = '/mobile/facilities/sync/?device_id=sync-test-device'
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip;q=0.5')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        for accept_encoding in ('gzip;q=0', 'identity', '*;q=0'):
+            plain = self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertFalse(plain.has_header('Content-Encoding'), accept_encoding)
+            self.assertEqual(len(json.loads(plain.content)['facilities']), 1)
+
+    def test_sync_delta_resends_facilities_in_a_renamed_place(self):
+        since = timezone.now() - timedelta(seconds=1)
+        Facility.objects.update(updated_at=since - timedelta(days=1))
+        FacilityCoordinate.objects.update(updated_at=since - timedelta(days=1))
+        self.assertEqual(self._sync(since)['facilities'], [])
+        county = self.facility.ward.constituency.county
+        county.county_name = 'Renamed County'
+        county.save()
+        delta = self._sync(since)
+        self.assertEqual([f['county_name'] for f in delta['facilities']], ['Renamed County'])
+
+
+class FacilitySummaryTest(FacilityTestCase):
+    def test_summary_columns_follow_child_edits(self):
+        self.facility.refresh_from_db()
+        self.assertTrue(self.facility.has_coordinates)
+        self.assertEqual(float(self.facility.primary_latitude), -1.2921)
+        self.assertEqual(self.facility.contact_count, 0)
+
+        contact = FacilityContact.objects.create(
+            facility=self.facility,
+            contact_type=ContactType.objects.create(type_name='Phone'),
+            contact_value='+254700000001',
+            created_by=self.facility.created_by
+        )
+        FacilityCoordinate.objects.filter(facility=self.facility).delete()
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.contact_count, 1)
+        self.assertFalse(self.facility.has_coordinates)
+        self.assertIsNone(self.facility.primary_latitude)
+
+        # Queryset updates skip signals until refreshed explicitly
+        FacilityContact.objects.filter(pk=contact.pk).update(is_active=False)
+        refresh_facility_summaries([self.facility.facility_id])
+        self.facility.refresh_from_db()
+        self.assertEqual(self.facility.contact_count, 0)
+
+    def test_migration_backfills_existing_facilities(self):
+        backfill = import_module('apps.facilities.migrations.0006_facility_summary_columns').backfill_summaries
+        Facility.objects.update(has_coordinates=False, primary_latitude=None, primary_longitude=None)
+
+        backfill(django_apps, None)
+        self.facility.refresh_from_db()
+        self.assertTrue(self.facility.has_coordinates)
+        self.assertEqual(float(self.facility.primary_latitude), -1.2921)
+
+
+class FacilitySearchTest(FacilityTestCase):
+    def _search(self, query):
+        return list(search_facilities(
+            Facility.objects.filter(is_active=True), query, rank=True
+        ).values_list('facility_name', flat=True))
+
+    def test_search_document_covers_geography_and_services(self):
+        FacilityService.objects.create(
+            facility=self.facility,
+            service_category=ServiceCategory.objects.create(category_name='Counselling'),
+            service_name='Trauma counselling'
+        )
+        self.assertEqual(self._search('test ward counselling'), ['Test Facility'])
+        self.assertEqual(self._search('reg001'), ['Test Facility'])
+        self.assertEqual(self._search('legal aid'), [])
+
+        ward = self.facility.ward
+        ward.ward_name = 'Kibra'
+        ward.save()
+        self.assertEqual(self._search('kibra'), ['Test Facility'])
+
+    def test_search_ranks_name_matches_first(self):
+        Facility.objects.create(
+            facility_name='Shelter near Test Facility',
+            facility_code='TF002',
+            registration_number='REG002',
+            operational_status=self.facility.operational_status,
+            ward=self.facility.ward,
+            created_by=self.facility.created_by
+        )
+        self.assertEqual(self._search('test facility'), ['Test Facility', 'Shelter near Test Facility'])
+        self.assertEqual(normalize_search_text('  Café   NAIROBI '), 'cafe nairobi')
+
+    def test_migration_backfills_existing_facilities(self):
+        backfill = import_module('apps.facilities.migrations.0007_facility_search_document').backfill_search_documents
+        Facility.objects.update(search_document='')
+
+        backfill(django_apps, None)
+        self.assertEqual(self._search('reg001'), ['Test Facility'])
+
+
+class SuggestRefreshTest(FacilityTestCase):
+    def test_suggest_picks_up_saved_facilities(self):
+        invalidate_suggest_index()
+        self.assertEqual(suggest('test facil')[0]['id'], self.facility.facility_id)
+        self.facility.facility_name = 'Tumaini Rescue Centre'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.facility.save()
+        labels = [suggestion['label'] for suggestion in suggest('tumaini')]
+        self.assertEqual(labels, ['Tumaini Rescue Centre'])
+        self.assertEqual(suggest('test facil'), [])
+
+
+class DataVersionTest(FacilityTestCase):
+    def test_facility_edit_bumps_global_and_county_versions(self):
+        county_id = self.facility.ward.constituency.county_id
+        other = County.objects.create(county_name='Other County', county_code='OC001')
+        self.assertEqual(get_facility_statistics()['total_facilities'], 1)
+        versions = (get_data_version(), get_data_version(county_id), get_data_version(other.pk))
+        self.facility.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.facility.save()
+        self.assertGreater(get_data_version(), versions[0])
+        self.assertGreater(get_data_version(county_id), versions[1])
+        self.assertEqual(get_data_version(other.pk), versions[2])
+        self.assertEqual(get_facility_statistics()['total_facilities'], 0)
+
+    def test_contact_edit_refreshes_cached_mobile_contacts(self):
+        contact_type = ContactType.objects.create(type_name='Phone')
+        with self.captureOnCommitCallbacks(execute=True):
+            contact = FacilityContact.objects.create(
+                facility=self.facility, contact_type=contact_type, contact_value='0700000001',
+                created_by=self.facility.created_by
+            )
+        MobileSession.objects.create(device_id='cache-test-device')
+        url = '/mobile/contacts/list/?device_id=cache-test-device'
+        self.assertEqual(self.client.get(url).json()['results'][0]['contact_value'], '0700000001')
+        contact.contact_value = '0700000002'
+        with self.captureOnCommitCallbacks(execute=True):
+            contact.save()
+        self.assertEqual(self.client.get(url).json()['results'][0]['contact_value'], '0700000002')
+
+
+class ConditionalGetTest(FacilityTestCase):
+    def test_unchanged_facility_list_answers_304_before_rendering(self):
+        MobileSession.objects.create(device_id='etag-test-device')
+        url = '/mobile/facilities/list/?device_id=etag-test-device'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=30')
+        # The header is only accepted on tiles, whose URLs are shared between devices
+        self.assertEqual(
+            self.client.get('/mobile/facilities/list/', HTTP_X_DEVICE_ID='etag-test-device').status_code, 403
+        )
+        # The session is cached, activity is written later, nothing is serialized
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.facility.facility_name = 'Renamed Facility'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.facility.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['results'][0]['facility_name'], 'Renamed Facility')
+
+    def test_facility_detail_revalidates_on_modified_since(self):
+        MobileSession.objects.create(device_id='etag-test-device')
+        url = f'/mobile/facilities/{self.facility.pk}/detail/?device_id=etag-test-device'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.facility.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        self.assertEqual(self.client.get('/mobile/facilities/999999/detail/?device_id=etag-test-device').status_code, 404)
+
+    def test_facility_list_modified_after_the_session_moves(self):
+        session = MobileSession.objects.create(device_id='etag-test-device')
+        url = '/mobile/facilities/list/?device_id=etag-test-device'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.facility.save()
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        # The list is ranked from the session's location
+        with self.captureOnCommitCallbacks(execute=True):
+            session.update_location(-1.30, 36.80)
+        MobileSession.objects.filter(pk=session.pk).update(
+            location_updated_at=timezone.now() + timedelta(seconds=5)
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200
+        )
+
+
+class BoundingBoxTest(SimpleTestCase):
+    def test_box_contains_circle(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            lat = rng.uniform(-60, 60)
+            lng = rng.uniform(-170, 170)
+            radius = rng.uniform(1, 300)
+            south, west, north, east = bounding_box(lat, lng, radius)
+            # Points due north/south/east/west on the circle must be inside
+            for bearing_lat, bearing_lng in ((north, lng), (south, lng), (lat, east), (lat, west)):
+                self.assertGreaterEqual(haversine_km(lat, lng, bearing_lat, bearing_lng), radius - 1e-6)
+            self.assertLess(south, lat)
+            self.assertGreater(north, lat)
+
+    def test_box_near_pole_spans_all_longitudes(self):
+        self.assertEqual(bounding_box(89.5, 10.0, 100)[1::2], (-180.0, 180.0))
@@ -0,0 +1,196 @@
+# -*- encoding: utf-8 -*-
+"""
+Slippy-map tiles of facility markers.
+
+The map used to ask for an arbitrary float bounding box, which no two users
+ever share, so neither HTTP caching nor the viewport cache in cache_utils got
+hits. Tiles use the standard z/x/y Web Mercator grid instead: every client
+that looks at the same area asks for the same handful of URLs.
+
+A tile is built on first request from the cluster index (see clustering.py),
+and each cluster or facility is placed in exactly one tile: the one holding
+its centroid or point. The tile is stored already serialized under a key
+that carries the tile data version. Edits do not touch that version. Signals
+delete just the tiles that could contain the edited facility, at every zoom.
+Bumping the version (invalidate_all_tiles) drops everything, for bulk
+imports that bypass signals.
+"""
+
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+
+from .clustering import CLUSTER_MAX_ZOOM, CLUSTER_MIN_ZOOM, cell_size_for_zoom, get_cluster_index
+
+MAX_TILE_ZOOM = 18
+# Web Mercator cannot represent the poles; tiles stop at this latitude
+MAX_LATITUDE = 85.05112878
+
+TILE_VERSION_CACHE_KEY = 'facility_tile_version'
+TILE_CACHE_SECONDS = 3600
+
+FACILITY_FIELDS = [
+    'facility_id', 'latitude', 'longitude', 'facility_name',
+    'registration_number', 'ward_name', 'county_name', 'status_name',
+]
+CLUSTER_FIELDS = ['latitude', 'longitude', 'count']
+
+
+class InvalidTile(ValueError):
+    """z/x/y outside the tile pyramid."""
+
+
+def tile_bounds(z, x, y):
+    """Return (south, west, north, east) in degrees for tile z/x/y."""
+    n = 2 ** z
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < n and 0 <= y < n):
+        raise InvalidTile(f'No tile {z}/{x}/{y}')
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tile_for_point(lat, lng, z):
+    """Return the (x, y) of the tile containing lat/lng at zoom `z`."""
+    n = 2 ** z
+    lat = max(min(float(lat), MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((float(lng) + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_touched(lat, lng):
+    """
+    Every (z, x, y) whose payload can change when a facility at lat/lng is
+    added, moved, renamed or removed.
+
+    Below CLUSTER_MAX_ZOOM the facility feeds a cluster whose centroid can
+    sit anywhere in its cell, so every tile the cell overlaps counts.
+    """
+    lat = float(lat)
+    lng = float(lng)
+    touched = set()
+    for z in range(MAX_TILE_ZOOM + 1):
+        if z < CLUSTER_MAX_ZOOM:
+            size = cell_size_for_zoom(max(z, CLUSTER_MIN_ZOOM))
+            south = math.floor(lat / size) * size
+            west = math.floor(lng / size) * size
+            # The cell is half-open, so step just inside its far edges
+            x_lo, y_hi = tile_for_point(south, west, z)
+            x_hi, y_lo = tile_for_point(south + size - 1e-9, west + size - 1e-9, z)
+            touched.update(
+                (z, x, y)
+                for x in range(x_lo, x_hi + 1)
+                for y in range(y_lo, y_hi + 1)
+            )
+        else:
+            touched.add((z, *tile_for_point(lat, lng, z)))
+    return touched
+
+
+def _tile_version():
+    version = cache.get(TILE_VERSION_CACHE_KEY)
+    if version is None:
+        version = 1
+        cache.add(TILE_VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def _tile_key(version, z, x, y):
+    return f'facility_tile:{version}:{z}:{x}:{y}'
+
+
+def _in_tile(lat, lng, bounds):
+    # Half-open on the east and south edges so a point on a shared edge
+    # lands in exactly one tile
+    south, west, north, east = bounds
+    return south < lat <= north and west <= lng < east
+
+
+def build_tile(z, x, y):
+    """Build the payload dict for tile z/x/y."""
+    from .models import Facility
+
+    bounds = tile_bounds(z, x, y)
+    index = get_cluster_index(fresh=True)
+    clusters, points = index.query(z, bbox=bounds)
+    clusters = [c for c in clusters if _in_tile(c['latitude'], c['longitude'], bounds)]
+    points = [
+        p for p in points
+        if _in_tile(p['coordinates']['latitude'], p['coordinates']['longitude'], bounds)
+    ]
+
+    details = {}
+    if points:
+        details = {
+            row[0]: row[1:]
+            for row in Facility.objects.filter(
+                facility_id__in=[p['facility_id'] for p in points]
+            ).values_list(
+                'facility_id', 'facility_name', 'registration_number',
+                'ward__ward_name', 'ward__constituency__county__county_name',
+                'operational_status__status_name',
+            )
+        }
+
+    facilities = []
+    for point in points:
+        name, registration, ward, county, status = details.get(
+            point['facility_id'], (point['facility_name'], '', '', '', '')
+        )
+        facilities.append([
+            point['facility_id'],
+            point['coordinates']['latitude'],
+            point['coordinates']['longitude'],
+            name, registration or '', ward or '', county or '', status or '',
+        ])
+
+    return {
+        'z': z, 'x': x, 'y': y,
+        'bounds': {'sw_lat': bounds[0], 'sw_lng': bounds[1], 'ne_lat': bounds[2], 'ne_lng': bounds[3]},
+        'cluster_fields': CLUSTER_FIELDS,
+        'clusters': [[c['latitude'], c['longitude'], c['count']] for c in clusters],
+        'facility_fields': FACILITY_FIELDS,
+        'facilities': facilities,
+    }
+
+
+def get_tile(z, x, y):
+    """
+    Return (body_bytes, etag) for tile z/x/y, building and caching it on a
+    miss. Raises InvalidTile for coordinates outside the pyramid.
+    """
+    tile_bounds(z, x, y)
+    key = _tile_key(_tile_version(), z, x, y)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    body = json.dumps(build_tile(z, x, y), separators=(',', ':')).encode('utf-8')
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+    cache.set(key, (body, etag), TILE_CACHE_SECONDS)
+    return body, etag
+
+
+def invalidate_tiles_at(*positions):
+    """Drop the cached tiles that may show a facility at any of `positions`."""
+    version = _tile_version()
+    keys = set()
+    for lat, lng in positions:
+        if lat is None or lng is None:
+            continue
+        keys.update(_tile_key(version, z, x, y) for z, x, y in tiles_touched(lat, lng))
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_all_tiles():
+    """Move every worker to a fresh tile version (after bulk changes)."""
+    try:
+        cache.incr(TILE_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(TILE_VERSION_CACHE_KEY, 2, None)
@@ -6,14 +6,17 @@ Views for facilities app
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db.models import Count
 from django.db import transaction
 from django.conf import settings
+from django.utils import timezone
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from .cache_utils import (
     get_facility_statistics, get_facilities_by_county, get_facilities_by_status,
     get_paginated_facilities, invalidate_facility_cache
 )
+from .search import refresh_search_documents, search_facilities
+from .summary import refresh_facility_summaries
 from apps.authentication.permissions import (
     permission_required, role_required, any_role_required,
     staff_required, superuser_required
@@ -45,13 +48,7 @@ def facility_list(request):
     # Search functionality with database-level optimization
     search_query = request.GET.get('search', '')
     if search_query:
-        facilities = facilities.filter(
-            Q(facility_name__icontains=search_query) |
-            Q(registration_number__icontains=search_query) |
-            Q(ward__ward_name__icontains=search_query) |
-            Q(ward__constituency__constituency_name__icontains=search_query) |
-            Q(ward__constituency__county__county_name__icontains=search_query)
-        )
+        facilities = search_facilities(facilities, search_query, rank=True)
     
     # Filter by county
     county_id = request.GET.get('county')
@@ -63,8 +60,10 @@ def facility_list(request):
     if status_id:
         facilities = facilities.filter(operational_status_id=status_id)
     
-    # Order by facility_id for consistent pagination
-    facilities = facilities.order_by('facility_id')
+    # Order by facility_id for consistent pagination (searches keep their
+    # relevance order, which also ends in facility_id)
+    if not search_query:
+        facilities = facilities.order_by('facility_id')
     
     # Implement pagination for millions of records
     paginator = Paginator(facilities, 50)  # 50 facilities per page for better performance
@@ -162,25 +161,22 @@ def facility_map(request):
     sw_lng = request.GET.get('sw_lng')
     zoom_level = request.GET.get('zoom', 7)
     
-    # Base queryset with coordinates
+    # Base queryset with coordinates (denormalized onto the facility row)
     facilities = Facility.objects.filter(
         is_active=True,
-        facilitycoordinate__latitude__isnull=False,
-        facilitycoordinate__longitude__isnull=False
+        has_coordinates=True
     ).select_related(
         'ward__constituency__county',
         'operational_status'
-    ).prefetch_related(
-        'facilitycoordinate_set'
     )
     
     # Apply viewport filtering if provided (for dynamic loading)
     if ne_lat and ne_lng and sw_lat and sw_lng:
         facilities = facilities.filter(
-            facilitycoordinate__latitude__gte=float(sw_lat),
-            facilitycoordinate__latitude__lte=float(ne_lat),
-            facilitycoordinate__longitude__gte=float(sw_lng),
-            facilitycoordinate__longitude__lte=float(ne_lng)
+            primary_latitude__gte=float(sw_lat),
+            primary_latitude__lte=float(ne_lat),
+            primary_longitude__gte=float(sw_lng),
+            primary_longitude__lte=float(ne_lng)
         )
     
     # Limit results based on zoom level for performance
@@ -200,8 +196,7 @@ def facility_map(request):
     # Filter facilities with coordinates and serialize for JavaScript
     facilities_with_coords = []
     for facility in facilities:
-        coords = facility.facilitycoordinate_set.filter(is_active=True).first()
-        if coords and coords.latitude and coords.longitude:
+        if facility.has_coordinates:
             facilities_with_coords.append({
                 'facility': {
                     'facility_id': facility.facility_id,
@@ -220,8 +215,8 @@ def facility_map(request):
                     }
                 },
                 'coordinates': {
-                    'latitude': float(coords.latitude),
-                    'longitude': float(coords.longitude)
+                    'latitude': float(facility.primary_latitude),
+                    'longitude': float(facility.primary_longitude)
                 }
             })
     
@@ -442,9 +437,13 @@ def facility_update(request, facility_id):
                             gbv_category=category
                         )
                     
-                    # Mark existing related objects as inactive (soft delete)
-                    existing_contacts.update(is_active=False)
-                    existing_services.update(is_active=False)
+                    # Mark existing related objects as inactive (soft delete).
+                    # Stamp updated_at so mobile delta sync sees the change.
+                    existing_contacts.update(is_active=False, updated_at=timezone.now())
+                    existing_services.update(is_active=False, updated_at=timezone.now())
+                    # .update() skips signals; recount before the new rows are saved
+                    refresh_facility_summaries([facility.facility_id])
+                    refresh_search_documents([facility.facility_id])
                     # Delete existing owners (they don't have is_active field)
                     existing_owners.delete()
                     existing_infrastructure.update(is_active=False)
@@ -1,3 +1,83 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.serializers import ConsolidatedGeographySerializer
+from apps.authentication.models import User
+from .models import County, Constituency, Ward
+from .tree import get_geography_tree
+
+
+class GeographyTreeTest(TestCase):
+    def setUp(self):
+        # Run the commit hooks, as a real edit would, so cached trees are retired
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_places()
+
+    def create_places(self):
+        county = County.objects.create(
+            county_name='Nairobi', county_code='047',
+            centroid_lat=Decimal('-1.2921'), centroid_lng=Decimal('36.8219')
+        )
+        for code, name in [('275', 'Westlands'), ('274', 'Dagoretti North')]:
+            constituency = Constituency.objects.create(
+                constituency_name=name, constituency_code=code, county=county,
+                bbox_north=Decimal('-1.2')
+            )
+            Ward.objects.create(ward_name=f'{name} B', ward_code=f'{code}2', constituency=constituency)
+            Ward.objects.create(ward_name=f'{name} A', ward_code=f'{code}1', constituency=constituency)
+
+    def test_tree_matches_serializer_output(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            County.objects.create(county_name='Mombasa', county_code='001')
+        expected = JSONRenderer().render(ConsolidatedGeographySerializer(
+            County.objects.order_by('county_name'), many=True
+        ).data)
+        with self.assertNumQueries(3):
+            tree = get_geography_tree()
+        self.assertEqual(tree['body'], expected)
+
+    def test_unchanged_tree_answers_304(self):
+        user = User.objects.create_user(
+            email='geo@example.com', full_name='Geo User',
+            phone_number='+254700000002', password='testpass123'
+        )
+        self.client.force_login(user)
+        response = self.client.get('/api/geography/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['constituencies'][0]['constituency_name'], 'Dagoretti North')
+        response = self.client.get('/api/geography/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_tree_negotiates_gzip_and_etag_lists(self):
+        user = User.objects.create_user(
+            email='geo@example.com', full_name='Geo User',
+            phone_number='+254700000002', password='testpass123'
+        )
+        self.client.force_login(user)
+        response = self.client.get('/api/geography/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()), 1)
+        response = self.client.get('/api/geography/', HTTP_ACCEPT_ENCODING='deflate, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        response = self.client.get('/api/geography/', HTTP_IF_NONE_MATCH=f'"stale", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
 
-# Create your tests here.
+    def test_county_list_revalidates_until_a_county_changes(self):
+        user = User.objects.create_user(
+            email='geo@example.com', full_name='Geo User',
+            phone_number='+254700000002', password='testpass123'
+        )
+        self.client.force_login(user)
+        response = self.client.get('/api/geography/counties/')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/geography/counties/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            County.objects.create(county_name='Mombasa', county_code='001')
+        response = self.client.get('/api/geography/counties/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
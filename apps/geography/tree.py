@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+"""
+Pre-serialized county > constituency > ward tree.
+
+The consolidated geography endpoint used to serialize the tree per county,
+with a constituency query and then a ward query per constituency: hundreds
+of queries for 47 counties, 290 constituencies and 1,450 wards that change
+perhaps once an electoral cycle.
+
+build_geography_tree() reads each level in one flat query and assembles the
+nesting in Python. get_geography_tree() encodes the result once to JSON and
+gzip and keeps both as bytes through reference_data(), so a request costs a
+memory lookup in the worker. The reference data version moves on any edit
+of a county, constituency or ward, which retires the bytes. The ETag is a
+digest of the body, so clients keep it across unrelated version bumps.
+
+The JSON matches what ConsolidatedGeographySerializer produced: county
+coordinates as decimal strings, the nested levels as numbers.
+"""
+
+import gzip
+import hashlib
+
+from rest_framework.fields import DecimalField
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.cache_utils import reference_data
+
+from .models import Constituency, County, Ward
+
+COORDINATE_FIELDS = [
+    'centroid_lat', 'centroid_lng',
+    'bbox_north', 'bbox_south', 'bbox_east', 'bbox_west',
+]
+
+# Same formatting as the ModelSerializer field the county level used
+_county_decimal = DecimalField(max_digits=10, decimal_places=7)
+
+
+def _decimal_string(value):
+    return None if value is None else _county_decimal.to_representation(value)
+
+
+def build_geography_tree():
+    """The full tree as a list of county dicts, in three queries."""
+    wards = {}
+    for ward in Ward.objects.order_by('ward_name').values(
+        'ward_id', 'ward_name', 'ward_code', 'constituency_id', *COORDINATE_FIELDS
+    ):
+        constituency_id = ward.pop('constituency_id')
+        wards.setdefault(constituency_id, []).append(ward)
+
+    constituencies = {}
+    for constituency in Constituency.objects.order_by('constituency_name').values(
+        'constituency_id', 'constituency_name', 'constituency_code', 'county_id',
+        *COORDINATE_FIELDS
+    ):
+        county_id = constituency.pop('county_id')
+        constituency['wards'] = wards.get(constituency['constituency_id'], [])
+        constituencies.setdefault(county_id, []).append(constituency)
+
+    counties = []
+    for county in County.objects.order_by('county_name').values(
+        'county_id', 'county_name', 'county_code', *COORDINATE_FIELDS
+    ):
+        for field in COORDINATE_FIELDS:
+            county[field] = _decimal_string(county[field])
+        county['constituencies'] = constituencies.get(county['county_id'], [])
+        counties.append(county)
+    return counties
+
+
+def _encode_geography_tree():
+    body = JSONRenderer().render(build_geography_tree())
+    return {
+        'body': body,
+        'gzipped': gzip.compress(body),
+        'etag': '"%s"' % hashlib.md5(body).hexdigest(),
+    }
+
+
+def get_geography_tree():
+    """Dict with the JSON `body`, its `gzipped` form and an `etag`."""
+    return reference_data('geography_tree', _encode_geography_tree)
@@ -15,6 +15,7 @@ from apps.documents.models import Document
 from apps.facilities.models import Facility
 from apps.authentication.models import User
 from apps.authentication.views import custom_login_required
+from apps.common.cache_utils import cached_computation
 from apps.geography.models import County
 import logging
 from django.utils import timezone
@@ -52,10 +53,13 @@ def landing_page(request):
     return render(request, 'home/landing.html', context)
 
 
-@custom_login_required
-def index(request):
-    """Dashboard view with comprehensive system overview - only for authenticated users"""
-    
+# The dashboard aggregates cover the whole database and every staff member
+# opens this page, so they are shared between users for a minute
+DASHBOARD_STATS_SECONDS = 60
+
+
+def build_dashboard_stats():
+    """Counts and breakdowns shown on the dashboard"""
     # Get basic counts
     total_facilities = Facility.objects.filter(is_active=True).count()
     total_users = User.objects.filter(is_active=True).count()
@@ -73,21 +77,19 @@ def index(request):
         operational_status__status_name='Operational'
     ).count()
     
+    # Denormalized columns on Facility: no join or DISTINCT needed
     facilities_with_coordinates = Facility.objects.filter(
         is_active=True,
-        facilitycoordinate__isnull=False
-    ).distinct().count()
+        has_coordinates=True
+    ).count()
     
     facilities_with_services = Facility.objects.filter(
         is_active=True,
-        facilityservice__isnull=False
-    ).distinct().count()
+        service_count__gt=0
+    ).count()
     
     # Get document statistics
     total_documents = Document.objects.filter(is_active=True).count()
-    recent_documents = Document.objects.filter(
-        is_active=True
-    ).select_related('document_type', 'gbv_category').order_by('-uploaded_at')[:5]
     
     # Get chat statistics
     total_conversations = Conversation.objects.count()
@@ -95,17 +97,9 @@ def index(request):
     urgent_conversations = Conversation.objects.filter(priority='urgent').count()
     total_messages = Message.objects.count()
     
-    # Get recent chat activity
-    recent_conversations = Conversation.objects.select_related(
-        'mobile_session', 'assigned_admin'
-    ).order_by('-last_message_at', '-created_at')[:5]
-    
     # Get music statistics
     total_music_tracks = Music.objects.filter(is_active=True).count()
     total_music_plays = MusicPlay.objects.count()
-    recent_music_plays = MusicPlay.objects.select_related(
-        'music', 'user'
-    ).order_by('-played_at')[:5]
     
     # Get service statistics
     total_services = FacilityService.objects.filter(is_active=True).count()
@@ -133,13 +127,6 @@ def index(request):
         good_condition=Count('infrastructure_id', filter=Q(condition_status__status_name__in=['Good', 'Excellent']))
     ).order_by('-count')[:5]
     
-    # Get recent facilities
-    recent_facilities = Facility.objects.filter(
-        is_active=True
-    ).select_related(
-        'ward__constituency__county'
-    ).order_by('-created_at')[:5]
-    
     # Get system activity in last 30 days
     thirty_days_ago = timezone.now() - timedelta(days=30)
     recent_activity = {
@@ -162,7 +149,8 @@ def index(request):
         play_count=Count('musicplay__play_id')
     ).order_by('-play_count')[:5]
     
-    context = {
+    # Lists, not querysets, so the cache holds results rather than queries
+    return {
         'total_facilities': total_facilities,
         'total_users': total_users,
         'total_counties': total_counties,
@@ -170,43 +158,66 @@ def index(request):
         'non_operational_facilities': non_operational_facilities,
         'facilities_with_coordinates': facilities_with_coordinates,
         'facilities_with_services': facilities_with_services,
-        'recent_facilities': recent_facilities,
         
         # Document data
         'total_documents': total_documents,
-        'recent_documents': recent_documents,
         
         # Chat data
         'total_conversations': total_conversations,
         'active_conversations': active_conversations,
         'urgent_conversations': urgent_conversations,
         'total_messages': total_messages,
-        'recent_conversations': recent_conversations,
         
         # Music data
         'total_music_tracks': total_music_tracks,
         'total_music_plays': total_music_plays,
-        'recent_music_plays': recent_music_plays,
         
         # Service data
         'total_services': total_services,
-        'services_by_category': services_by_category,
-        'top_services': top_services,
+        'services_by_category': list(services_by_category),
+        'top_services': list(top_services),
         
         # Human resources data
         'total_contacts': total_contacts,
-        'contacts_by_type': contacts_by_type,
+        'contacts_by_type': list(contacts_by_type),
         
         # Infrastructure data
         'total_infrastructure': total_infrastructure,
-        'infrastructure_by_type': infrastructure_by_type,
+        'infrastructure_by_type': list(infrastructure_by_type),
         
         # Activity data
         'recent_activity': recent_activity,
-        'top_music': top_music,
-        
-        'segment': 'index',
+        'top_music': list(top_music),
     }
+
+
+@custom_login_required
+def index(request):
+    """Dashboard view with comprehensive system overview - only for authenticated users"""
+    context = dict(cached_computation(
+        'home_dashboard_stats', build_dashboard_stats, DASHBOARD_STATS_SECONDS
+    ))
+    
+    # Recent items are cheap LIMIT 5 queries and should always be current
+    context['recent_facilities'] = Facility.objects.filter(
+        is_active=True
+    ).select_related(
+        'ward__constituency__county'
+    ).order_by('-created_at')[:5]
+    
+    context['recent_documents'] = Document.objects.filter(
+        is_active=True
+    ).select_related('document_type', 'gbv_category').order_by('-uploaded_at')[:5]
+    
+    context['recent_conversations'] = Conversation.objects.select_related(
+        'mobile_session', 'assigned_admin'
+    ).order_by('-last_message_at', '-created_at')[:5]
+    
+    context['recent_music_plays'] = MusicPlay.objects.select_related(
+        'music', 'user'
+    ).order_by('-played_at')[:5]
+    
+    context['segment'] = 'index'
     
     return render(request, 'home/index.html', context)
 
@@ -0,0 +1,98 @@
+# -*- encoding: utf-8 -*-
+"""
+Keyset (cursor) pagination for the mobile list endpoints.
+
+Page numbers are turned into OFFSET slices, so page N makes the database
+walk and throw away every row before it, and each page re-runs COUNT over the
+same joins. In cursor mode (`?cursor=` on the first request, then the
+`next_cursor` from each response) the cursor carries the sort key of the last
+row served and the next page is a range query that starts right after it.
+
+Cursors are URL-safe base64 of a small JSON object. The app must treat them
+as opaque. They are not signed: editing one only moves the caller's own
+position in a public list. A malformed cursor, or one issued for a different
+ordering, raises InvalidCursor and the views answer 400.
+
+Old app builds keep using `page`/`page_size` and get the same response as
+before. Either mode can pass `include_count=false` to skip the total count.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import math
+
+from django.core.cache import cache
+
+COUNT_CACHE_SECONDS = 60
+
+
+class InvalidCursor(ValueError):
+    """The cursor could not be decoded or does not match the list ordering."""
+
+
+def encode_cursor(payload):
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the cursor payload, or None for an empty (first page) cursor."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(payload, dict):
+        raise InvalidCursor('Malformed cursor')
+    return payload
+
+
+def cursor_values(cursor, ordering, **fields):
+    """
+    Pull the sort key out of a decoded cursor.
+
+    `fields` maps each key to the type it is coerced with, e.g.
+    cursor_values(cursor, 'facility_id_desc', id=int). Values come back as a
+    list in the order given.
+    """
+    if cursor.get('o') != ordering:
+        raise InvalidCursor('Cursor was issued for a different ordering')
+    try:
+        values = [cast(cursor[name]) for name, cast in fields.items()]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        # json.loads accepts NaN and Infinity; int() of Infinity overflows
+        raise InvalidCursor('Malformed cursor')
+    if any(isinstance(value, float) and not math.isfinite(value) for value in values):
+        raise InvalidCursor('Malformed cursor')
+    return values
+
+
+def include_count(request):
+    """False when the client opted out of the total with include_count=false."""
+    return request.query_params.get('include_count', 'true').lower() != 'false'
+
+
+def cached_count(queryset, prefix):
+    """
+    COUNT for `queryset`, shared for COUNT_CACHE_SECONDS between requests
+    with the same filters, so scrolling does not repeat it on every page.
+    """
+    digest = hashlib.md5(str(queryset.query).encode('utf-8')).hexdigest()
+    key = f'{prefix}_count_{digest}'
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, COUNT_CACHE_SECONDS)
+    return total
+
+
+def page_url(request, **params):
+    """Absolute URL of this endpoint with `params` replacing query parameters."""
+    query_params = request.query_params.copy()
+    for name, value in params.items():
+        query_params[name] = value
+    return f"{request.build_absolute_uri(request.path)}?{query_params.urlencode()}"
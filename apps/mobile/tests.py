@@ -0,0 +1,17 @@
+import base64
+
+from django.test import SimpleTestCase
+
+from .pagination import InvalidCursor, cursor_values, decode_cursor, encode_cursor
+
+
+class CursorTest(SimpleTestCase):
+    def test_round_trip(self):
+        cursor = decode_cursor(encode_cursor({'o': 'distance', 'd': 1.5, 'id': 7}))
+        self.assertEqual(cursor_values(cursor, 'distance', d=float, id=int), [1.5, 7])
+
+    def test_non_finite_values_rejected(self):
+        for payload in (b'{"o":"distance","d":NaN,"id":7}', b'{"o":"distance","d":1.5,"id":Infinity}'):
+            cursor = decode_cursor(base64.urlsafe_b64encode(payload).decode('ascii'))
+            with self.assertRaises(InvalidCursor):
+                cursor_values(cursor, 'distance', d=float, id=int)
@@ -3,14 +3,20 @@
 Mobile App API Views - Consolidated from all apps
 """
 
+import gzip
+import math
+from collections import Counter
+
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
 from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -18,15 +24,37 @@ from drf_yasg import openapi
 from apps.chat.models import Conversation, Message
 from apps.mobile.ai_service import generate_reply
 from apps.mobile.directions_service import route as directions_route
-from apps.facilities.models import Facility, FacilityContact, FacilityService, FacilityCoordinate
+from apps.common.cache_utils import (
+    REFERENCE_VERSION_KEY, RESOURCES_VERSION_KEY, get_reference_version, get_version,
+    get_version_modified, reference_data,
+)
+from apps.common.conditional import accepts_gzip, conditional_get
+from apps.facilities.cache_utils import cached_facility_data, get_data_modified, get_data_version
+from apps.facilities.models import Facility, FacilityContact
+from apps.facilities.clustering import get_cluster_index
+from apps.facilities.geo import bbox_q, rank_by_distance
+from apps.facilities.search import search_facilities
+from apps.facilities.spatial_index import get_spatial_index
+from apps.facilities.suggest import (
+    DEFAULT_LIMIT as SUGGEST_DEFAULT_LIMIT, MAX_LIMIT as SUGGEST_MAX_LIMIT, suggest
+)
+from apps.facilities.sync import InvalidWatermark, get_sync_body, parse_watermark
+from apps.facilities.tiles import InvalidTile, get_tile
+from apps.mobile.pagination import (
+    InvalidCursor, cached_count, cursor_values, decode_cursor, encode_cursor,
+    include_count, page_url,
+)
 from apps.mobile_sessions.models import MobileSession
+from apps.mobile_sessions.resolver import require_session, resolve_session
 from apps.music.models import Music
 from apps.documents.models import Document
 from apps.lookups.models import (
     ServiceCategory, GBVCategory, ContactType, OwnerType,
     InfrastructureType, ConditionStatus, DocumentType
 )
+from apps.analytics.ingest import ACCEPTED, DUPLICATE, REJECTED, InvalidBatch, ingest_contact_events
 from apps.analytics.models import ContactInteraction
+from apps.authentication.permissions import has_permission as user_has_permission
 
 # Import serializers
 from apps.chat.serializers import (
@@ -35,7 +63,7 @@ from apps.chat.serializers import (
     MobileConversationListSerializer
 )
 from apps.api.serializers import (
-    MobileAppFacilitySerializer, MobileAppFacilityListSerializer, MobileFacilityMapSerializer,
+    MobileAppFacilitySerializer, MobileAppFacilityListSerializer,
     MusicSerializer, DocumentSerializer,
     MobileSessionSerializer, MobileSessionCreateSerializer, MobileSessionUpdateSerializer, MobileSessionEndSerializer,
     FacilityContactSerializer
@@ -46,6 +74,83 @@ from apps.chat.services import ConversationService, MessageService
 from apps.mobile_sessions.services import MobileSessionService
 
 
+def _record_activity(request):
+    """A 304 skips the view, so note the session activity it would have."""
+    request.mobile_session.update_activity()
+
+
+def _facility_list_county(request):
+    """The county a list is filtered to, if any: its version is enough then."""
+    county_id = request.query_params.get('county')
+    return int(county_id) if county_id and county_id.isdigit() else None
+
+
+def _facility_list_etag(request, *args, **kwargs):
+    session = request.mobile_session
+    return (
+        'mobile_facilities', get_data_version(_facility_list_county(request)),
+        request.build_absolute_uri(), session.latitude, session.longitude,
+    )
+
+
+def _facility_list_modified(request, *args, **kwargs):
+    """The later of the last facility edit and the last move of the session,
+    which ranks the list by distance."""
+    modified = get_data_modified(_facility_list_county(request))
+    located_at = request.mobile_session.location_updated_at
+    if modified is None or located_at is None:
+        return modified
+    return max(modified, located_at.timestamp())
+
+
+def _facility_detail_county(request, pk):
+    """One small query; None (no validator, so the view 404s) when not found."""
+    if not hasattr(request, '_facility_detail_county'):
+        request._facility_detail_county = (
+            Facility.objects.filter(facility_id=pk, is_active=True)
+            .values_list('ward__constituency__county_id', flat=True).first()
+            if str(pk).isdigit() else None
+        )
+    return request._facility_detail_county
+
+
+def _facility_detail_etag(request, pk=None, **kwargs):
+    county_id = _facility_detail_county(request, pk)
+    if county_id is None:
+        return None
+    return ('mobile_facility_detail', pk, get_data_version(county_id), request.build_absolute_uri())
+
+
+def _facility_detail_modified(request, pk=None, **kwargs):
+    county_id = _facility_detail_county(request, pk)
+    return None if county_id is None else get_data_modified(county_id)
+
+
+def _lookup_type(request):
+    lookup_type = request.query_params.get('lookup_type', '')
+    return lookup_type if lookup_type in ('service_categories', 'gbv_categories', 'contact_types') else 'all'
+
+
+def _lookup_etag(request, *args, **kwargs):
+    return ('mobile_lookups', get_reference_version(), _lookup_type(request))
+
+
+def _reference_modified(request, *args, **kwargs):
+    return get_version_modified(REFERENCE_VERSION_KEY)
+
+
+def _resources_etag(request, *args, **kwargs):
+    # File URLs are made absolute from the host and forwarded scheme
+    return (
+        'mobile_resources', get_version(RESOURCES_VERSION_KEY),
+        request.build_absolute_uri(), request.META.get('HTTP_X_FORWARDED_PROTO'),
+    )
+
+
+def _resources_modified(request, *args, **kwargs):
+    return get_version_modified(RESOURCES_VERSION_KEY)
+
+
 class MobileSessionPermission(BasePermission):
     """
     Custom permission class for mobile API endpoints.
@@ -61,10 +166,19 @@ class MobileSessionPermission(BasePermission):
             hasattr(view, 'action') and view.action in ['list_conversations', 'get_conversation_detail', 'send_message', 'update_message_status', 'close_conversation']):
             return True
         
-        # For GET requests, get device_id from query parameters
+        # Map tiles are shared with the admin facility map, which has no device
+        if (getattr(view, 'action', None) == 'get_facility_tile' and
+                user_has_permission(request.user, 'view_facilities')):
+            return True
+        
+        # For GET requests, get device_id from query parameters. Tiles may send
+        # the X-Device-ID header instead, which keeps their shared-cacheable
+        # URLs free of it; every other response depends on the session.
         # For POST/PUT requests, check both query parameters and request body
         if request.method == 'GET':
             device_id = request.query_params.get('device_id')
+            if not device_id and getattr(view, 'action', None) == 'get_facility_tile':
+                device_id = request.headers.get('X-Device-ID')
         else:
             # For POST requests, check query params first, then request body
             device_id = request.query_params.get('device_id') or request.data.get('device_id')
@@ -73,15 +187,14 @@ class MobileSessionPermission(BasePermission):
             self.message = "device_id is required. For GET requests, pass as query parameter. For POST requests, include in query parameters or request body."
             return False
         
-        # Check if mobile session exists and is active
-        try:
-            session = MobileSession.objects.get(device_id=device_id, is_active=True)
-            # Store session in request for use in views
-            request.mobile_session = session
-            return True
-        except MobileSession.DoesNotExist:
+        # Check if mobile session exists and is active (cached, see resolver.py)
+        session = resolve_session(device_id, request)
+        if session is None:
             self.message = f"Mobile session not found or inactive for device_id: {device_id}. Please create a valid session first."
             return False
+        # Store session in request for use in views
+        request.mobile_session = session
+        return True
 
 
 class MobileChatViewSet(viewsets.ViewSet):
@@ -123,11 +236,11 @@ class MobileChatViewSet(viewsets.ViewSet):
         if not device_id:
             return None, "device_id is required"
         
-        try:
-            session = MobileSession.objects.get(device_id=device_id, is_active=True)
-            return session, None
-        except MobileSession.DoesNotExist:
+        # Shares the permission class's lookup for this request
+        session = resolve_session(device_id, self.request)
+        if session is None:
             return None, f"Mobile session not found or inactive for device_id: {device_id}"
+        return session, None
     
     def _check_conversation_access(self, conversation, mobile_session):
         """
@@ -159,7 +272,7 @@ class MobileChatViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'], url_path='start')
     def start_conversation(self, request):
         """Start a new conversation or retrieve existing one"""
-        serializer = CreateConversationSerializer(data=request.data)
+        serializer = CreateConversationSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             device_id = serializer.validated_data.get('device_id')
             subject = serializer.validated_data.get('subject', '')
@@ -180,7 +293,7 @@ class MobileChatViewSet(viewsets.ViewSet):
                 )
             
             try:
-                mobile_session = MobileSession.objects.get(device_id=device_id, is_active=True)
+                mobile_session = require_session(device_id, request)
                 
                 # Check if there's already an open conversation for this device
                 existing_conversation = Conversation.objects.filter(
@@ -254,7 +367,7 @@ class MobileChatViewSet(viewsets.ViewSet):
             )
         
         try:
-            mobile_session = MobileSession.objects.get(device_id=device_id, is_active=True)
+            mobile_session = require_session(device_id, request)
             
             # Get conversations for this device, prioritizing open ones first
             conversations = Conversation.objects.filter(mobile_session=mobile_session).order_by(
@@ -302,6 +415,9 @@ class MobileChatViewSet(viewsets.ViewSet):
         manual_parameters=[
             openapi.Parameter(
                 'device_id', openapi.IN_QUERY, description="Device ID - required for mobile users", type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                'before', openapi.IN_QUERY, description="Return messages older than this message ID (the oldest one already loaded)", type=openapi.TYPE_INTEGER
             )
         ],
         responses={
@@ -761,7 +877,7 @@ class MobileFacilityViewSet(viewsets.ViewSet):
     
     @swagger_auto_schema(
         operation_id="mobile_facilities_list",
-        operation_description="List facilities optimized for mobile app with pagination support. Facilities are automatically sorted by distance (closest first) when GPS coordinates are available in the mobile session. If no GPS is available, facilities are sorted alphabetically.",
+        operation_description="List facilities optimized for mobile app with pagination support. Facilities are automatically sorted by distance (closest first) when GPS coordinates are available in the mobile session. If no GPS is available, facilities are sorted alphabetically. Responses carry an ETag and Last-Modified; send If-None-Match or If-Modified-Since to get 304 when unchanged.",
         manual_parameters=[
             openapi.Parameter(
                 'device_id', openapi.IN_QUERY, description="Device ID", type=openapi.TYPE_STRING, required=True
@@ -789,6 +905,12 @@ class MobileFacilityViewSet(viewsets.ViewSet):
             ),
             openapi.Parameter(
                 'page_size', openapi.IN_QUERY, description="Items per page (default: 100, max: 500)", type=openapi.TYPE_INTEGER, required=False
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY, description="Keyset pagination: pass empty for the first page, then the next_cursor from the previous response. Replaces page.", type=openapi.TYPE_STRING, required=False
+            ),
+            openapi.Parameter(
+                'include_count', openapi.IN_QUERY, description="Set to false to skip computing the total count (default: true)", type=openapi.TYPE_BOOLEAN, required=False
             )
         ],
         responses={
@@ -801,16 +923,19 @@ class MobileFacilityViewSet(viewsets.ViewSet):
                     'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT), description='List of facilities')
                 }
             )),
+            304: openapi.Response('Not Modified'),
             400: openapi.Response('Bad Request', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
         },
         tags=["Mobile Facility API"]
     )
     @action(detail=False, methods=['get'], url_path='list')
+    @conditional_get(
+        etag=_facility_list_etag, last_modified=_facility_list_modified, on_not_modified=_record_activity,
+        # The body carries the caller's location and a ranking from it
+        cache_control={'private': True, 'max_age': 30},
+    )
     def list_facilities(self, request):
         """List facilities optimized for mobile app with pagination and location-based sorting"""
-        from django.db.models import F, FloatField
-        from django.db.models.functions import Power, Sqrt
-        
         # Get mobile session (already validated by permission class)
         mobile_session = request.mobile_session
         mobile_session.update_activity()
@@ -838,6 +963,14 @@ class MobileFacilityViewSet(viewsets.ViewSet):
         if page_size > 500:
             page_size = 500  # Max 500 per page to prevent performance issues
         
+        # Cursor mode (?cursor=) replaces page numbers with a keyset; see pagination.py
+        cursor_mode = 'cursor' in request.query_params
+        with_count = include_count(request)
+        try:
+            cursor = decode_cursor(request.query_params.get('cursor')) if cursor_mode else None
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        
         queryset = Facility.objects.filter(is_active=True)
         
         # Apply location filters if provided
@@ -851,12 +984,8 @@ class MobileFacilityViewSet(viewsets.ViewSet):
             queryset = queryset.filter(ward_id=ward_id)
         
         if search_query:
-            queryset = queryset.filter(
-                Q(facility_name__icontains=search_query) |
-                Q(ward__ward_name__icontains=search_query) |
-                Q(ward__constituency__constituency_name__icontains=search_query) |
-                Q(ward__constituency__county__county_name__icontains=search_query)
-            )
+            # Ordering stays distance or newest-first so cursors keep working
+            queryset = search_facilities(queryset, search_query)
         
         if service_category:
             queryset = queryset.filter(
@@ -879,6 +1008,9 @@ class MobileFacilityViewSet(viewsets.ViewSet):
         if radius_km:
             try:
                 radius_km_float = float(radius_km)
+                # nan/inf parse as floats but cannot be mapped onto grid cells
+                if not math.isfinite(radius_km_float) or radius_km_float < 0:
+                    raise ValueError(radius_km)
                 if not latitude or not longitude:
                     return Response(
                         {'error': 'GPS coordinates required for radius filtering. Please ensure your mobile session has location data.'},
@@ -886,165 +1018,158 @@ class MobileFacilityViewSet(viewsets.ViewSet):
                     )
             except ValueError:
                 return Response(
-                    {'error': 'Invalid radius_km value. Must be a number.'},
+                    {'error': 'Invalid radius_km value. Must be a non-negative number.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        # Calculate distance and sort by closest if GPS is available
+        # Sort key of the last row served, when continuing from a cursor. A
+        # distance cursor also pins the origin so pages stay consistent if
+        # the session's GPS moves while the user scrolls.
+        after = None
+        if cursor:
+            try:
+                if use_distance:
+                    distance_after, id_after, latitude, longitude = cursor_values(
+                        cursor, 'distance', d=float, id=int, lat=float, lng=float
+                    )
+                    after = (distance_after, id_after)
+                else:
+                    (after,) = cursor_values(cursor, 'facility_id_desc', id=int)
+            except InvalidCursor:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        start = (page - 1) * page_size
+        end = start + page_size
+        
         if use_distance and latitude and longitude:
-            # Filter only facilities with coordinates for distance-based sorting
-            # This ensures we only show facilities we can calculate distance for
-            queryset = queryset.filter(
-                facilitycoordinate__latitude__isnull=False,
-                facilitycoordinate__longitude__isnull=False,
-                facilitycoordinate__is_active=True
-            )
-            
-            # Annotate with distance using Haversine approximation
-            queryset = queryset.annotate(
-                distance_km=Sqrt(
-                    Power(F('facilitycoordinate__latitude') - latitude, 2) +
-                    Power(F('facilitycoordinate__longitude') - longitude, 2),
-                    output_field=FloatField()
-                ) * 111.32  # Approximate conversion to km
-            )
+            # Rank with the in-memory spatial index instead of computing a
+            # distance for every coordinate row in SQL. The database is only
+            # asked which facilities pass the filters, then for one page of rows.
+            index = get_spatial_index()
+            allowed_ids = None
+            if search_query or service_category or county_id or constituency_id or ward_id:
+                allowed_ids = set(queryset.values_list('facility_id', flat=True))
             
-            # Apply radius filter if specified
             if radius_km_float:
-                queryset = queryset.filter(distance_km__lte=radius_km_float)
+                ranked = index.within(latitude, longitude, radius_km_float, allowed=allowed_ids)
+                total_count = len(ranked)
+                if after:
+                    ranked = [item for item in ranked if (item[1], item[0]) > after]
+                window = ranked[:page_size + 1] if cursor_mode else ranked[start:end + 1]
+            else:
+                total_count = index.count(allowed=allowed_ids)
+                if cursor_mode:
+                    window = index.nearest(latitude, longitude, k=page_size + 1, allowed=allowed_ids, after=after)
+                else:
+                    window = index.nearest(latitude, longitude, k=end + 1, allowed=allowed_ids)[start:]
             
-            # Order by distance (closest first), then by facility name
-            queryset = queryset.order_by('distance_km', 'facility_name')
-        else:
-            # No GPS available - will order by facility_id after distinct()
-            pass
-        
-        # Apply distinct to avoid duplicates from joins
-        queryset = queryset.distinct()
-        
-        # Apply ordering AFTER distinct() to ensure it's preserved
-        if use_distance and latitude and longitude and radius_km_float:
-            # Already ordered by distance above
-            pass
-        elif use_distance and latitude and longitude:
-            # Already ordered by distance above
-            pass
-        else:
-            # No GPS - order by facility_id DESCENDING (newest first) to avoid Baringo bias
-            # This shows most recently added facilities first, which avoids alphabetical/default ordering
-            queryset = queryset.order_by('-facility_id')
-        
-        # Get total count before pagination
-        total_count = queryset.count()
-        
-        # Optimize for mobile with select_related and prefetch_related
-        # Use Prefetch to filter active items and reduce data transfer
-        from django.db.models import Prefetch
-        
-        # Optimize prefetch based on query type
-        if use_distance and latitude and longitude:
-            # For distance queries, coordinates are already filtered in the main query
-            # Use lightweight prefetch to minimize data transfer
-            queryset = queryset.select_related(
+            # One extra row tells us whether there is a next page without a count
+            has_more = len(window) > page_size
+            page_ranked = window[:page_size]
+            last_key = page_ranked[-1] if page_ranked else None
+            
+            distances = dict(page_ranked)
+            facilities_by_id = Facility.objects.filter(
+                facility_id__in=distances.keys(), is_active=True
+            ).select_related(
                 'ward', 'ward__constituency', 'ward__constituency__county',
                 'operational_status'
-            ).prefetch_related(
-                # Only prefetch minimal service/contact data for counts
-                Prefetch(
-                    'facilityservice_set',
-                    queryset=FacilityService.objects.filter(is_active=True).only('is_active'),
-                    to_attr='_prefetched_services'
-                ),
-                Prefetch(
-                    'facilitycontact_set',
-                    queryset=FacilityContact.objects.filter(is_active=True).only('is_active'),
-                    to_attr='_prefetched_contacts'
-                )
-            )
+            ).in_bulk()
+            
+            paginated_queryset = []
+            for facility_id, distance in page_ranked:
+                facility = facilities_by_id.get(facility_id)
+                if facility is not None:
+                    facility.distance_km = distance
+                    paginated_queryset.append(facility)
+            
+            # Use lightweight serializer for list view (much faster - ~70% smaller payload)
+            response_data = MobileAppFacilityListSerializer(
+                paginated_queryset, many=True, context={'request': request}
+            ).data
+            for facility, facility_data in zip(paginated_queryset, response_data):
+                facility_data['distance_km'] = round(facility.distance_km, 2)
         else:
-            # For non-distance queries, prefetch coordinates too
-            queryset = queryset.select_related(
-                'ward', 'ward__constituency', 'ward__constituency__county',
-                'operational_status'
-            ).prefetch_related(
-                # Prefetch only active coordinates (first one for list view)
-                Prefetch(
-                    'facilitycoordinate_set',
-                    queryset=FacilityCoordinate.objects.filter(
-                        is_active=True,
-                        latitude__isnull=False,
-                        longitude__isnull=False
-                    ).only('latitude', 'longitude', 'is_active').order_by('-created_at')[:1],
-                    to_attr='_prefetched_coord_list'
-                ),
-                # Prefetch only active services (lightweight)
-                Prefetch(
-                    'facilityservice_set',
-                    queryset=FacilityService.objects.filter(is_active=True).only('is_active'),
-                    to_attr='_prefetched_services'
-                ),
-                # Prefetch only active contacts (lightweight)
-                Prefetch(
-                    'facilitycontact_set',
-                    queryset=FacilityContact.objects.filter(is_active=True).only('is_active'),
-                    to_attr='_prefetched_contacts'
+            # No GPS - order by facility_id DESCENDING (newest first) to avoid Baringo bias
+            # This shows most recently added facilities first, which avoids alphabetical/default ordering
+            queryset = queryset.distinct().order_by('-facility_id')
+            
+            def build_page():
+                # Get total count before pagination. Cursor clients scroll the same
+                # filters page after page, so their count is shared for a minute.
+                page_count = None
+                if with_count:
+                    page_count = cached_count(queryset, 'mobile_facilities') if cursor_mode else queryset.count()
+                
+                page_queryset = queryset
+                if after:
+                    # Primary key range - the database seeks straight to the page
+                    page_queryset = page_queryset.filter(facility_id__lt=after)
+                # Coordinates and counts are columns on the facility row, so a
+                # page is this one query with no prefetches
+                window = page_queryset.select_related(
+                    'ward', 'ward__constituency', 'ward__constituency__county',
+                    'operational_status'
                 )
+                window = list(window[:page_size + 1] if cursor_mode else window[start:end + 1])
+                page_rows = window[:page_size]
+                return {
+                    'count': page_count,
+                    'has_more': len(window) > page_size,
+                    'last_key': page_rows[-1].facility_id if page_rows else None,
+                    'results': list(MobileAppFacilityListSerializer(
+                        page_rows, many=True, context={'request': request}
+                    ).data),
+                }
+            
+            # The page is the same for every device, so it is shared through the
+            # versioned cache; an edit in the county (or anywhere, for unfiltered
+            # lists) moves the version and the next request rebuilds it
+            page_data = cached_facility_data(
+                'mobile_facilities_page', 300, build_page,
+                county_id=county_id, search=search_query,
+                service_category=service_category, constituency=constituency_id,
+                ward=ward_id, page=None if cursor_mode else page, after=after,
+                page_size=page_size, with_count=with_count,
             )
+            total_count = page_data['count']
+            has_more = page_data['has_more']
+            last_key = page_data['last_key']
+            response_data = page_data['results']
         
-        # Apply pagination
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_queryset = queryset[start:end]
-        
-        # Attach first coordinate to each facility for serializer access
-        # For distance queries, coordinates are already joined in the query
-        # For non-distance queries, we prefetched them
-        if not (use_distance and latitude and longitude):
-            # Attach prefetched coordinates
-            for facility in paginated_queryset:
-                if hasattr(facility, '_prefetched_coord_list') and facility._prefetched_coord_list:
-                    facility._prefetched_coord = facility._prefetched_coord_list[0]
-        # For distance queries, coordinates are accessible via the relationship
-        # The serializer will handle fetching them if needed
-        
-        # Use lightweight serializer for list view (much faster - ~70% smaller payload)
-        serializer = MobileAppFacilityListSerializer(paginated_queryset, many=True, context={'request': request})
-        
-        # Add distance information to response if available
-        response_data = serializer.data
-        if use_distance and latitude and longitude:
-            for i, facility_data in enumerate(response_data):
-                if hasattr(paginated_queryset[i], 'distance_km'):
-                    try:
-                        facility_data['distance_km'] = round(float(paginated_queryset[i].distance_km), 2)
-                    except (ValueError, TypeError):
-                        pass
-        
-        # Build pagination response
-        base_url = request.build_absolute_uri(request.path)
-        query_params = request.query_params.copy()
+        if not with_count:
+            total_count = None
         
         # Calculate next and previous page URLs
         next_url = None
         previous_url = None
-        
-        if end < total_count:
-            query_params['page'] = page + 1
-            next_url = f"{base_url}?{query_params.urlencode()}"
-        
-        if page > 1:
-            query_params['page'] = page - 1
-            previous_url = f"{base_url}?{query_params.urlencode()}"
+        next_cursor = None
+        
+        if cursor_mode:
+            # Cursors only go forward; the app keeps pages it already has
+            if has_more and last_key is not None:
+                if use_distance:
+                    next_cursor = encode_cursor({
+                        'o': 'distance', 'd': last_key[1], 'id': last_key[0],
+                        'lat': latitude, 'lng': longitude
+                    })
+                else:
+                    next_cursor = encode_cursor({'o': 'facility_id_desc', 'id': last_key})
+                next_url = page_url(request, cursor=next_cursor)
+        else:
+            if has_more:
+                next_url = page_url(request, page=page + 1)
+            
+            if page > 1:
+                previous_url = page_url(request, page=page - 1)
         
         # Build optimized response
-        response = Response({
+        response_data = {
             'count': total_count,
             'next': next_url,
             'previous': previous_url,
             'results': response_data,
-            'page': page,
             'page_size': page_size,
-            'total_pages': (total_count + page_size - 1) // page_size,
             'location_aware': use_distance,
             'user_location': {
                 'latitude': latitude,
@@ -1055,11 +1180,17 @@ class MobileFacilityViewSet(viewsets.ViewSet):
                 'gps_available': use_distance,
                 'message': 'Sorted by distance (closest first)' if use_distance else 'Sorted by facility ID (newest first) - GPS not available in mobile session'
             }
-        })
+        }
+        if cursor_mode:
+            response_data['next_cursor'] = next_cursor
+        else:
+            response_data['page'] = page
+            response_data['total_pages'] = (
+                (total_count + page_size - 1) // page_size if total_count is not None else None
+            )
+        response = Response(response_data)
         
-        # Add cache headers for mobile optimization (short TTL for real-time data)
-        # Cache for 30 seconds - balances performance with data freshness
-        response['Cache-Control'] = 'public, max-age=30, s-maxage=30'
+        # Cache-Control (30 seconds, then revalidate) is set by conditional_get
         response['X-Content-Type-Options'] = 'nosniff'
         
         return response
@@ -1095,6 +1226,9 @@ class MobileFacilityViewSet(viewsets.ViewSet):
             openapi.Parameter(
                 'ward', openapi.IN_QUERY, description="Filter by ward ID", type=openapi.TYPE_INTEGER, required=False
             ),
+            openapi.Parameter(
+                'cluster', openapi.IN_QUERY, description="Return zoom-sized clusters (count + centroid) instead of every point; single-facility cells and zoom >= 16 come back as facilities. Default: false", type=openapi.TYPE_BOOLEAN, required=False
+            ),
         ],
         responses={
             200: openapi.Response('Facilities for map display', openapi.Schema(
@@ -1105,6 +1239,11 @@ class MobileFacilityViewSet(viewsets.ViewSet):
                         items=openapi.Schema(type=openapi.TYPE_OBJECT),
                         description='List of facilities with coordinates'
                     ),
+                    'clusters': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                        description='Cluster markers with count, latitude, longitude and bounds (cluster=true only)'
+                    ),
                     'count': openapi.Schema(type=openapi.TYPE_INTEGER, description='Number of facilities returned'),
                     'viewport': openapi.Schema(
                         type=openapi.TYPE_OBJECT,
@@ -1119,8 +1258,6 @@ class MobileFacilityViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='map')
     def get_facilities_map(self, request):
         """Get facilities with coordinates optimized for map display - viewport-based loading"""
-        from django.db.models import Prefetch
-        
         # Get mobile session (already validated by permission class)
         mobile_session = request.mobile_session
         mobile_session.update_activity()
@@ -1141,122 +1278,158 @@ class MobileFacilityViewSet(viewsets.ViewSet):
         except (ValueError, TypeError):
             zoom_level = 10
         
-        # Base queryset - only facilities with active coordinates
-        queryset = Facility.objects.filter(
-            is_active=True,
-            facilitycoordinate__latitude__isnull=False,
-            facilitycoordinate__longitude__isnull=False,
-            facilitycoordinate__is_active=True
-        )
+        # One row per facility: the current coordinate is denormalized onto it
+        rows = Facility.objects.filter(is_active=True, has_coordinates=True)
+        
+        # Centre used to decide which facilities survive the zoom limit below
+        center = None
+        if mobile_session.latitude is not None and mobile_session.longitude is not None:
+            center = (float(mobile_session.latitude), float(mobile_session.longitude))
         
         # Apply viewport filtering if provided (for dynamic loading)
+        viewport = None
         if ne_lat and ne_lng and sw_lat and sw_lng:
             try:
                 ne_lat = float(ne_lat)
                 ne_lng = float(ne_lng)
                 sw_lat = float(sw_lat)
                 sw_lng = float(sw_lng)
-                
-                # Handle longitude wrapping (e.g., crossing 180/-180)
-                if sw_lng > ne_lng:
-                    # Crosses the date line - use OR condition
-                    queryset = queryset.filter(
-                        facilitycoordinate__latitude__gte=sw_lat,
-                        facilitycoordinate__latitude__lte=ne_lat
-                    ).filter(
-                        Q(facilitycoordinate__longitude__gte=sw_lng) |
-                        Q(facilitycoordinate__longitude__lte=ne_lng)
-                    )
-                else:
-                    # Normal case
-                    queryset = queryset.filter(
-                        facilitycoordinate__latitude__gte=sw_lat,
-                        facilitycoordinate__latitude__lte=ne_lat,
-                        facilitycoordinate__longitude__gte=sw_lng,
-                        facilitycoordinate__longitude__lte=ne_lng
+                viewport = (ne_lat, ne_lng, sw_lat, sw_lng)
+                if not all(math.isfinite(value) for value in viewport) or not (
+                    -90 <= sw_lat <= 90 and -90 <= ne_lat <= 90 and -180 <= sw_lng <= 180 and -180 <= ne_lng <= 180
+                ):
+                    return Response(
+                        {'error': 'Invalid viewport. Latitudes must be within ±90 and longitudes within ±180.'},
+                        status=status.HTTP_400_BAD_REQUEST
                     )
+                center_lng = (sw_lng + ne_lng) / 2
+                if sw_lng > ne_lng:
+                    center_lng = center_lng + 180 if center_lng <= 0 else center_lng - 180
+                center = ((sw_lat + ne_lat) / 2, center_lng)
             except (ValueError, TypeError):
                 # Invalid viewport parameters - ignore and return all
                 pass
         
         # Apply location filters if provided
+        narrowed = False
         county_id = request.query_params.get('county')
         if county_id:
             try:
-                queryset = queryset.filter(ward__constituency__county_id=int(county_id))
+                rows = rows.filter(ward__constituency__county_id=int(county_id))
+                narrowed = True
             except (ValueError, TypeError):
                 pass
         
         constituency_id = request.query_params.get('constituency')
         if constituency_id:
             try:
-                queryset = queryset.filter(ward__constituency_id=int(constituency_id))
+                rows = rows.filter(ward__constituency_id=int(constituency_id))
+                narrowed = True
             except (ValueError, TypeError):
                 pass
         
         ward_id = request.query_params.get('ward')
         if ward_id:
             try:
-                queryset = queryset.filter(ward_id=int(ward_id))
+                rows = rows.filter(ward_id=int(ward_id))
+                narrowed = True
             except (ValueError, TypeError):
                 pass
         
-        # Optimize query - only select what we need (BEFORE slicing)
-        queryset = queryset.only(
-            'facility_id', 'facility_name'
-        ).prefetch_related(
-            Prefetch(
-                'facilitycoordinate_set',
-                queryset=FacilityCoordinate.objects.filter(
-                    is_active=True,
-                    latitude__isnull=False,
-                    longitude__isnull=False
-                ).only('latitude', 'longitude', 'is_active').order_by('-created_at')[:1],
-                to_attr='_prefetched_map_coord_list'
-            )
-        ).distinct()
-        
-        # Limit results based on zoom level for performance (AFTER distinct)
+        # Limit results based on zoom level for performance
         # Higher zoom = more detail = more facilities
         if zoom_level <= 5:
             # Country level - show only operational facilities, limit to 500
-            queryset = queryset.filter(
-                operational_status__status_name='Operational'
-            )[:500]
+            rows = rows.filter(operational_status__status_name='Operational')
+            narrowed = True
+            limit = 500
         elif zoom_level <= 8:
             # Regional level - show more facilities, limit to 2000
-            queryset = queryset[:2000]
+            limit = 2000
         elif zoom_level <= 12:
             # City level - show many facilities, limit to 5000
-            queryset = queryset[:5000]
+            limit = 5000
         else:
             # Street level - show all facilities in viewport, limit to 10000
-            queryset = queryset[:10000]
-        
-        # Attach first coordinate to each facility for serializer access
-        for facility in queryset:
-            if hasattr(facility, '_prefetched_map_coord_list') and facility._prefetched_map_coord_list:
-                facility._prefetched_map_coord = facility._prefetched_map_coord_list[0]
-        
-        # Use ultra-lightweight serializer for map
-        serializer = MobileFacilityMapSerializer(queryset, many=True, context={'request': request})
-        
-        # Filter out facilities without coordinates
-        facilities_data = [f for f in serializer.data if f.get('coordinates') is not None]
-        
-        # Build response
-        response_data = {
-            'facilities': facilities_data,
-            'count': len(facilities_data),
-        }
+            limit = 10000
+        
+        if request.query_params.get('cluster', 'false').lower() == 'true':
+            # Precomputed per-zoom cells: the database is only asked which
+            # facilities pass the location/status filters, if any apply
+            allowed_ids = set(rows.values_list('facility_id', flat=True)) if narrowed else None
+            bbox = (viewport[2], viewport[3], viewport[0], viewport[1]) if viewport else None
+            clusters, facilities_data = get_cluster_index().query(zoom_level, bbox=bbox, allowed=allowed_ids)
+            response_data = {
+                'clusters': clusters,
+                'facilities': facilities_data,
+                'count': len(facilities_data) + sum(cluster['count'] for cluster in clusters),
+                'clustered': True,
+            }
+            return self._map_response(response_data, viewport, zoom_level)
+        
+        def build_map():
+            map_rows = rows
+            if viewport:
+                # Plain range predicates on the (primary_latitude, primary_longitude) index;
+                # bbox_q handles a viewport crossing the 180/-180 line
+                map_rows = map_rows.filter(bbox_q(viewport[2], viewport[3], viewport[0], viewport[1], prefix='primary_'))
+            
+            points = {
+                facility_id: (facility_name, float(lat), float(lng))
+                for facility_id, facility_name, lat, lng in map_rows.values_list(
+                    'facility_id', 'facility_name', 'primary_latitude', 'primary_longitude'
+                )
+            }
+            
+            # When the limit bites, keep the facilities closest to the viewport
+            # centre (or the user) by great-circle distance rather than arbitrary rows
+            if center is not None:
+                ranked = rank_by_distance(
+                    ((facility_id, lat, lng) for facility_id, (_, lat, lng) in points.items()),
+                    center[0], center[1]
+                )
+                selected = [facility_id for facility_id, _ in ranked[:limit]]
+            else:
+                selected = sorted(points)[:limit]
+            
+            facilities_data = [
+                {
+                    'facility_id': facility_id,
+                    'facility_name': points[facility_id][0],
+                    'coordinates': {
+                        'latitude': points[facility_id][1],
+                        'longitude': points[facility_id][2]
+                    }
+                }
+                for facility_id in selected
+            ]
+            
+            # Build response
+            return {
+                'facilities': facilities_data,
+                'count': len(facilities_data),
+            }
         
+        if viewport is None and center is not None:
+            # Ranked around this user's own position: not worth sharing
+            return self._map_response(build_map(), viewport, zoom_level, shared=False)
+        # Same viewport and filters give the same markers for everyone
+        response_data = cached_facility_data(
+            'mobile_facilities_map', 300, build_map,
+            county_id=county_id, constituency=constituency_id, ward=ward_id,
+            viewport=viewport, zoom=zoom_level,
+        )
+        return self._map_response(response_data, viewport, zoom_level)
+    
+    def _map_response(self, response_data, viewport, zoom_level, shared=True):
+        """Wrap a map payload with viewport echo and cache headers (private unless `shared`)"""
         # Add viewport info if provided
-        if ne_lat and ne_lng and sw_lat and sw_lng:
+        if viewport:
             response_data['viewport'] = {
-                'ne_lat': float(ne_lat),
-                'ne_lng': float(ne_lng),
-                'sw_lat': float(sw_lat),
-                'sw_lng': float(sw_lng),
+                'ne_lat': viewport[0],
+                'ne_lng': viewport[1],
+                'sw_lat': viewport[2],
+                'sw_lng': viewport[3],
                 'zoom': zoom_level
             }
         
@@ -1264,21 +1437,157 @@ class MobileFacilityViewSet(viewsets.ViewSet):
         
         # Add cache headers for mobile optimization (short TTL for real-time data)
         # Cache for 60 seconds - balances performance with data freshness for maps
-        response['Cache-Control'] = 'public, max-age=60, s-maxage=60'
+        response['Cache-Control'] = 'public, max-age=60, s-maxage=60' if shared else 'private, max-age=60'
         response['X-Content-Type-Options'] = 'nosniff'
         
         return response
     
+    @swagger_auto_schema(
+        operation_id="mobile_facilities_tile",
+        operation_description="Facility markers for one slippy-map tile (z/x/y, Web Mercator). Below zoom 16 dense areas come back as clusters. Tiles are identical for every caller and carry an ETag; send If-None-Match to get 304 when unchanged. The device_id may be sent as an X-Device-ID header so tile URLs stay shareable by HTTP caches.",
+        manual_parameters=[
+            openapi.Parameter(
+                'device_id', openapi.IN_QUERY, description="Device ID (or X-Device-ID header)", type=openapi.TYPE_STRING, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Tile payload', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'cluster_fields': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                    'clusters': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_NUMBER)), description='Rows in cluster_fields order'),
+                    'facility_fields': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+                    'facilities': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)), description='Rows in facility_fields order'),
+                }
+            )),
+            304: openapi.Response('Not Modified'),
+            404: openapi.Response('No such tile', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
+        },
+        tags=["Mobile Facility API"]
+    )
+    @action(detail=False, methods=['get'], url_path=r'tiles/(?P<z>[0-9]+)/(?P<x>[0-9]+)/(?P<y>[0-9]+)')
+    def get_facility_tile(self, request, z, x, y):
+        """Serve a cached, pre-serialized map tile of facilities"""
+        try:
+            body, etag = get_tile(int(z), int(x), int(y))
+        except InvalidTile as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        
+        # Tiles only change when an edit touches them, so clients and proxies
+        # may keep them longer than the viewport responses and revalidate by ETag
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=300'
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
+    
+    @swagger_auto_schema(
+        operation_id="mobile_facilities_suggest",
+        operation_description="Autocomplete for the search box. Matches facility, ward, constituency and county names word by word, tolerating typos (1 edit from 4 letters, 2 from 8) and common Kiswahili words (e.g. hospitali, kliniki, polisi). The last word may be incomplete.",
+        manual_parameters=[
+            openapi.Parameter(
+                'device_id', openapi.IN_QUERY, description="Device ID", type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                'q', openapi.IN_QUERY, description="Partial query as typed", type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY, description=f"Maximum suggestions (default {SUGGEST_DEFAULT_LIMIT}, max {SUGGEST_MAX_LIMIT})", type=openapi.TYPE_INTEGER, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Suggestions, best first', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'query': openapi.Schema(type=openapi.TYPE_STRING),
+                    'suggestions': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'type': openapi.Schema(type=openapi.TYPE_STRING, enum=['facility', 'ward', 'constituency', 'county']),
+                            'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'label': openapi.Schema(type=openapi.TYPE_STRING),
+                            'context': openapi.Schema(type=openapi.TYPE_STRING),
+                            'score': openapi.Schema(type=openapi.TYPE_NUMBER),
+                        }
+                    )),
+                }
+            )),
+        },
+        tags=["Mobile Facility API"]
+    )
+    @action(detail=False, methods=['get'], url_path='suggest')
+    def suggest_facilities(self, request):
+        """Typo-tolerant autocomplete over facility and place names"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT))
+        except (ValueError, TypeError):
+            limit = SUGGEST_DEFAULT_LIMIT
+        
+        suggestions = suggest(query, limit) if len(query) >= 2 else []
+        response = Response({'query': query, 'suggestions': suggestions})
+        # Keystroke-level requests: let the app reuse answers briefly
+        response['Cache-Control'] = 'private, max-age=60'
+        return response
+    
+    @swagger_auto_schema(
+        operation_id="mobile_facilities_sync",
+        operation_description="Offline sync of the facility directory. Call without `since` for a full snapshot, then pass the `watermark` of the previous response to get only facilities changed since (sent whole, with active contacts, services and coordinates) and the IDs of facilities to drop. When reset is true the client must replace its local copy. Sent gzip-compressed when the client accepts it.",
+        manual_parameters=[
+            openapi.Parameter(
+                'device_id', openapi.IN_QUERY, description="Device ID", type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                'since', openapi.IN_QUERY, description="Watermark from the previous sync response", type=openapi.TYPE_STRING, required=False
+            ),
+        ],
+        responses={
+            200: openapi.Response('Sync payload', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'watermark': openapi.Schema(type=openapi.TYPE_STRING, description='Pass as `since` on the next sync'),
+                    'reset': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Full snapshot: replace the local copy'),
+                    'facilities': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    'deleted': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                }
+            )),
+            400: openapi.Response('Bad Request', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
+        },
+        tags=["Mobile Facility API"]
+    )
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync_facilities(self, request):
+        """Snapshot or delta of the facility directory since a watermark"""
+        try:
+            since = parse_watermark(request.query_params.get('since'))
+        except InvalidWatermark as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        body = get_sync_body(since)
+        if accepts_gzip(request):
+            response = HttpResponse(body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(body), content_type='application/json')
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     @swagger_auto_schema(
         operation_id="mobile_facility_detail",
-        operation_description="Get facility details optimized for mobile app",
+        operation_description="Get facility details optimized for mobile app. Responses carry an ETag and Last-Modified; send If-None-Match or If-Modified-Since to get 304 when unchanged.",
         responses={
             200: openapi.Response('Facility details', MobileAppFacilitySerializer),
+            304: openapi.Response('Not Modified'),
             404: openapi.Response('Not Found', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
         },
         tags=["Mobile Facility API"]
     )
     @action(detail=True, methods=['get'], url_path='detail')
+    @conditional_get(etag=_facility_detail_etag, last_modified=_facility_detail_modified)
     def get_facility_detail(self, request, pk=None):
         """Get facility details optimized for mobile app"""
         facility = get_object_or_404(Facility, facility_id=pk, is_active=True)
@@ -1442,6 +1751,9 @@ class MobileSessionViewSet(viewsets.ViewSet):
                     if field != 'device_id' and hasattr(session, field):
                         setattr(session, field, value)
                         update_fields.append(field)
+                if 'latitude' in update_fields or 'longitude' in update_fields:
+                    session.location_updated_at = timezone.now()
+                    update_fields.append('location_updated_at')
                 
                 session.save(update_fields=update_fields)
                 
@@ -1819,7 +2131,7 @@ class MobileLookupViewSet(viewsets.ViewSet):
     
     @swagger_auto_schema(
         operation_id="mobile_lookups_data",
-        operation_description="Get lookup data for mobile app",
+        operation_description="Get lookup data for mobile app. Responses carry an ETag and Last-Modified; send If-None-Match or If-Modified-Since to get 304 when unchanged.",
         manual_parameters=[
             openapi.Parameter(
                 'device_id', openapi.IN_QUERY, description="Device ID", type=openapi.TYPE_STRING, required=True
@@ -1830,34 +2142,39 @@ class MobileLookupViewSet(viewsets.ViewSet):
         ],
         responses={
             200: openapi.Response('Lookup data', openapi.Schema(type=openapi.TYPE_OBJECT)),
+            304: openapi.Response('Not Modified'),
             400: openapi.Response('Bad Request', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
         },
         tags=["Mobile Lookup API"]
     )
     @action(detail=False, methods=['get'], url_path='data')
+    @conditional_get(etag=_lookup_etag, last_modified=_reference_modified)
     def get_lookup_data(self, request):
         """Get lookup data for mobile app"""
-        lookup_type = request.query_params.get('lookup_type', '')
-        
-        if lookup_type == 'service_categories':
-            data = ServiceCategory.objects.all().values('service_category_id', 'category_name', 'description', 'icon_url')
-        elif lookup_type == 'gbv_categories':
-            data = GBVCategory.objects.all().values('gbv_category_id', 'category_name', 'description', 'icon_url')
-        elif lookup_type == 'contact_types':
-            data = ContactType.objects.all().values('contact_type_id', 'type_name', 'validation_regex')
-        else:
-            # Return all lookup data
-            data = {
-                'service_categories': list(ServiceCategory.objects.all().values('service_category_id', 'category_name', 'description', 'icon_url')),
-                'gbv_categories': list(GBVCategory.objects.all().values('gbv_category_id', 'category_name', 'description', 'icon_url')),
-                'contact_types': list(ContactType.objects.all().values('contact_type_id', 'type_name', 'validation_regex')),
-                'owner_types': list(OwnerType.objects.all().values('owner_type_id', 'type_name', 'description')),
-                'infrastructure_types': list(InfrastructureType.objects.all().values('infrastructure_type_id', 'type_name', 'description')),
-                'condition_statuses': list(ConditionStatus.objects.all().values('condition_status_id', 'status_name', 'description')),
-                'document_types': list(DocumentType.objects.all().values('document_type_id', 'type_name', 'allowed_extensions', 'max_file_size_mb', 'description'))
-            }
+        lookup_type = _lookup_type(request)
         
+        # Served from this worker's memory; edits reach it within seconds
+        data = reference_data(f'mobile_lookups:{lookup_type}', lambda: self.build_lookup_data(lookup_type))
         return Response(data)
+    
+    def build_lookup_data(self, lookup_type):
+        """Lookup rows for one lookup_type, or all of them"""
+        if lookup_type == 'service_categories':
+            return list(ServiceCategory.objects.all().values('service_category_id', 'category_name', 'description', 'icon_url'))
+        if lookup_type == 'gbv_categories':
+            return list(GBVCategory.objects.all().values('gbv_category_id', 'category_name', 'description', 'icon_url'))
+        if lookup_type == 'contact_types':
+            return list(ContactType.objects.all().values('contact_type_id', 'type_name', 'validation_regex'))
+        # Return all lookup data
+        return {
+            'service_categories': list(ServiceCategory.objects.all().values('service_category_id', 'category_name', 'description', 'icon_url')),
+            'gbv_categories': list(GBVCategory.objects.all().values('gbv_category_id', 'category_name', 'description', 'icon_url')),
+            'contact_types': list(ContactType.objects.all().values('contact_type_id', 'type_name', 'validation_regex')),
+            'owner_types': list(OwnerType.objects.all().values('owner_type_id', 'type_name', 'description')),
+            'infrastructure_types': list(InfrastructureType.objects.all().values('infrastructure_type_id', 'type_name', 'description')),
+            'condition_statuses': list(ConditionStatus.objects.all().values('condition_status_id', 'status_name', 'description')),
+            'document_types': list(DocumentType.objects.all().values('document_type_id', 'type_name', 'allowed_extensions', 'max_file_size_mb', 'description'))
+        }
 
 
 class MobileAnalyticsViewSet(viewsets.ViewSet):
@@ -2070,6 +2387,58 @@ class MobileAnalyticsViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @swagger_auto_schema(
+        operation_id="mobile_analytics_events_batch",
+        operation_description="Submit a batch of queued contact interaction events (e.g. from the app's offline buffer). Contacts are validated together and the events stored in one write. Returns 202 with a status per event: accepted, duplicate (client_event_id already received) or rejected (with an error). At most 500 events per batch.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['device_id', 'events'],
+            properties={
+                'device_id': openapi.Schema(type=openapi.TYPE_STRING, description="Device ID"),
+                'events': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        required=['contact_id'],
+                        properties={
+                            'client_event_id': openapi.Schema(type=openapi.TYPE_STRING, description="Unique per device; makes resending a batch safe"),
+                            'contact_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'type': openapi.Schema(type=openapi.TYPE_STRING, description="e.g. call, email, sms, whatsapp (default: click)"),
+                            'is_helpful': openapi.Schema(type=openapi.TYPE_BOOLEAN, nullable=True),
+                            'data': openapi.Schema(type=openapi.TYPE_OBJECT),
+                            'occurred_at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description="When the user tapped (default: now)"),
+                        }
+                    )
+                )
+            }
+        ),
+        responses={
+            202: openapi.Response('Batch processed', openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+                'accepted': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'duplicates': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'rejected': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT))
+            })),
+            400: openapi.Response('Bad Request', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
+        },
+        tags=["Mobile Analytics API"]
+    )
+    @action(detail=False, methods=['post'], url_path='events/batch')
+    def track_events_batch(self, request):
+        """Store a batch of contact interaction events in one write"""
+        try:
+            results = ingest_contact_events(request.mobile_session, request.data.get('events'))
+        except InvalidBatch as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'accepted': counts[ACCEPTED],
+            'duplicates': counts[DUPLICATE],
+            'rejected': counts[REJECTED],
+            'results': results
+        }, status=status.HTTP_202_ACCEPTED)
+
 
 class MobileResourcesViewSet(viewsets.ViewSet):
     """
@@ -2081,7 +2450,7 @@ class MobileResourcesViewSet(viewsets.ViewSet):
     
     @swagger_auto_schema(
         operation_id="mobile_resources_list",
-        operation_description="Get all resources (documents, music) for mobile app in a single consolidated response",
+        operation_description="Get all resources (documents, music) for mobile app in a single consolidated response. Responses carry an ETag and Last-Modified; send If-None-Match or If-Modified-Since to get 304 when unchanged.",
         manual_parameters=[
             openapi.Parameter(
                 'device_id', openapi.IN_QUERY, description="Device ID from mobile session", type=openapi.TYPE_STRING, required=True
@@ -2117,11 +2486,16 @@ class MobileResourcesViewSet(viewsets.ViewSet):
                     'total_count': openapi.Schema(type=openapi.TYPE_INTEGER, description='Total resources across all types')
                 }
             )),
+            304: openapi.Response('Not Modified'),
             400: openapi.Response('Bad Request', openapi.Schema(type=openapi.TYPE_OBJECT, properties={'error': openapi.Schema(type=openapi.TYPE_STRING)}))
         },
         tags=["Mobile Resources API"]
     )
     @action(detail=False, methods=['get'], url_path='list')
+    @conditional_get(
+        etag=_resources_etag, last_modified=_resources_modified, on_not_modified=_record_activity,
+        cache_control={'public': True, 'max_age': 300, 's_maxage': 300},
+    )
     def get_resources(self, request):
         """Get all resources (documents, music) for mobile app with accessible file URLs"""
         from rest_framework.pagination import PageNumberPagination
@@ -2210,9 +2584,8 @@ class MobileResourcesViewSet(viewsets.ViewSet):
         else:
             response_data['music'] = {'count': 0, 'results': []}
         
-        response = Response(response_data)
-        response['Cache-Control'] = 'public, max-age=300, s-maxage=300'
-        return response
+        # Cache-Control, ETag and Last-Modified are set by conditional_get
+        return Response(response_data)
 
 
 class MobileContactViewSet(viewsets.ViewSet):
@@ -2260,6 +2633,12 @@ class MobileContactViewSet(viewsets.ViewSet):
             ),
             openapi.Parameter(
                 'page_size', openapi.IN_QUERY, description="Items per page (default: 100, max: 500)", type=openapi.TYPE_INTEGER, required=False
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY, description="Keyset pagination: pass empty for the first page, then the next_cursor from the previous response. Replaces page.", type=openapi.TYPE_STRING, required=False
+            ),
+            openapi.Parameter(
+                'include_count', openapi.IN_QUERY, description="Set to false to skip computing the total count (default: true)", type=openapi.TYPE_BOOLEAN, required=False
             )
         ],
         responses={
@@ -2287,9 +2666,6 @@ class MobileContactViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='list')
     def list_contacts(self, request):
         """List facility contacts with filtering, search, and location-based sorting"""
-        from django.db.models import F, FloatField
-        from django.db.models.functions import Power, Sqrt
-        
         # Get mobile session (already validated by permission class)
         mobile_session = request.mobile_session
         mobile_session.update_activity()
@@ -2320,6 +2696,14 @@ class MobileContactViewSet(viewsets.ViewSet):
         if page_size > 500:
             page_size = 500
         
+        # Cursor mode (?cursor=) replaces page numbers with a keyset; see pagination.py
+        cursor_mode = 'cursor' in request.query_params
+        with_count = include_count(request)
+        try:
+            cursor = decode_cursor(request.query_params.get('cursor')) if cursor_mode else None
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Start with active contacts from active facilities
         queryset = FacilityContact.objects.filter(
             is_active=True,
@@ -2383,6 +2767,9 @@ class MobileContactViewSet(viewsets.ViewSet):
         if radius_km:
             try:
                 radius_km_float = float(radius_km)
+                # nan/inf parse as floats but cannot be mapped onto grid cells
+                if not math.isfinite(radius_km_float) or radius_km_float < 0:
+                    raise ValueError(radius_km)
                 if not latitude or not longitude:
                     return Response(
                         {'error': 'GPS coordinates required for radius filtering. Please ensure your mobile session has location data.'},
@@ -2390,109 +2777,178 @@ class MobileContactViewSet(viewsets.ViewSet):
                     )
             except ValueError:
                 return Response(
-                    {'error': 'Invalid radius_km value. Must be a number.'},
+                    {'error': 'Invalid radius_km value. Must be a non-negative number.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
+        # Sort key of the last row served, when continuing from a cursor. A
+        # distance cursor also pins the origin so pages stay consistent if
+        # the session's GPS moves while the user scrolls.
+        by_distance = bool(use_distance and latitude and longitude and radius_km_float)
+        after = None
+        if cursor:
+            try:
+                if by_distance:
+                    distance_after, name_after, id_after, latitude, longitude = cursor_values(
+                        cursor, 'distance', d=float, name=str, id=int, lat=float, lng=float
+                    )
+                    after = (distance_after, name_after, id_after)
+                else:
+                    after = tuple(cursor_values(cursor, 'facility_name', name=str, type=str, id=int))
+            except InvalidCursor:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Apply pagination
+        start = (page - 1) * page_size
+        end = start + page_size
+        
+        def serialize_contacts(contacts):
+            results = []
+            for contact in contacts:
+                facility = contact.facility
+                contact_data = {
+                    'contact_id': contact.contact_id,
+                    'facility_id': facility.facility_id,
+                    'facility_name': facility.facility_name,
+                    'facility_registration_number': facility.registration_number,
+                    'contact_type': contact.contact_type.type_name,
+                    'contact_value': contact.contact_value,
+                    'contact_person_name': contact.contact_person_name or '',
+                    'is_primary': contact.is_primary,
+                    'location': {
+                        'ward': facility.ward.ward_name,
+                        'ward_id': facility.ward.ward_id,
+                        'constituency': facility.ward.constituency.constituency_name,
+                        'constituency_id': facility.ward.constituency.constituency_id,
+                        'county': facility.ward.constituency.county.county_name,
+                        'county_id': facility.ward.constituency.county.county_id,
+                    },
+                    # Denormalized on the facility row, so no query per contact
+                    'coordinates': {
+                        'latitude': float(facility.primary_latitude),
+                        'longitude': float(facility.primary_longitude)
+                    } if facility.has_coordinates else None,
+                }
+                
+                # Add distance if calculated (only when radius filtering was used)
+                if by_distance and hasattr(contact, 'distance_km'):
+                    try:
+                        contact_data['distance_km'] = round(float(contact.distance_km), 2)
+                    except (ValueError, TypeError):
+                        pass
+                
+                results.append(contact_data)
+            return results
+        
         # Calculate distance if GPS is available AND radius is specified
-        if use_distance and latitude and longitude and radius_km_float:
-            # Filter only facilities with coordinates when radius filtering is requested
-            queryset = queryset.filter(
-                facility__facilitycoordinate__latitude__isnull=False,
-                facility__facilitycoordinate__longitude__isnull=False,
-                facility__facilitycoordinate__is_active=True
+        if by_distance:
+            # The spatial index finds the facilities inside the radius; SQL only
+            # applies the contact filters to that set.
+            distances = dict(get_spatial_index().within(latitude, longitude, radius_km_float))
+            candidates = queryset.filter(facility_id__in=distances.keys()).values_list(
+                'contact_id', 'facility_id', 'facility__facility_name'
             )
             
-            # Annotate with distance using Haversine approximation
-            queryset = queryset.annotate(
-                distance_km=Sqrt(
-                    Power(F('facility__facilitycoordinate__latitude') - latitude, 2) +
-                    Power(F('facility__facilitycoordinate__longitude') - longitude, 2),
-                    output_field=FloatField()
-                ) * 111.32  # Approximate conversion to km
+            # Order by distance (nearest first)
+            ranked = sorted(
+                (distances[facility_pk], facility_name, contact_id)
+                for contact_id, facility_pk, facility_name in candidates
             )
+            total_count = len(ranked)
+            if after:
+                ranked = [key for key in ranked if key > after]
             
-            # Apply radius filter
-            queryset = queryset.filter(distance_km__lte=radius_km_float)
+            # One extra row tells us whether there is a next page without a count
+            window = ranked[:page_size + 1] if cursor_mode else ranked[start:end + 1]
+            has_more = len(window) > page_size
+            page_keys = window[:page_size]
             
-            # Order by distance (nearest first)
-            queryset = queryset.order_by('distance_km', 'facility__facility_name', 'contact_id')
+            contacts_by_id = queryset.in_bulk([key[2] for key in page_keys])
+            paginated_queryset = []
+            for distance, _, contact_id in page_keys:
+                contact = contacts_by_id[contact_id]
+                contact.distance_km = distance
+                paginated_queryset.append(contact)
+            last_key = page_keys[-1] if page_keys else None
+            results = serialize_contacts(paginated_queryset)
         else:
             # No radius filtering - return all contacts, order alphabetically
             queryset = queryset.order_by('facility__facility_name', 'contact_type__type_name', 'contact_id')
-        
-        # Get total count before pagination
-        total_count = queryset.count()
-        
-        # Apply pagination
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_queryset = queryset[start:end]
-        
-        # Build response data
-        results = []
-        for contact in paginated_queryset:
-            # Get facility coordinates if available
-            facility_coords = None
-            try:
-                coord = contact.facility.facilitycoordinate_set.filter(is_active=True).first()
-                if coord:
-                    facility_coords = {
-                        'latitude': float(coord.latitude),
-                        'longitude': float(coord.longitude)
-                    }
-            except:
-                pass
-            
-            contact_data = {
-                'contact_id': contact.contact_id,
-                'facility_id': contact.facility.facility_id,
-                'facility_name': contact.facility.facility_name,
-                'facility_registration_number': contact.facility.registration_number,
-                'contact_type': contact.contact_type.type_name,
-                'contact_value': contact.contact_value,
-                'contact_person_name': contact.contact_person_name or '',
-                'is_primary': contact.is_primary,
-                'location': {
-                    'ward': contact.facility.ward.ward_name,
-                    'ward_id': contact.facility.ward.ward_id,
-                    'constituency': contact.facility.ward.constituency.constituency_name,
-                    'constituency_id': contact.facility.ward.constituency.constituency_id,
-                    'county': contact.facility.ward.constituency.county.county_name,
-                    'county_id': contact.facility.ward.constituency.county.county_id,
-                },
-                'coordinates': facility_coords,
-            }
             
-            # Add distance if calculated (only when radius filtering was used)
-            if use_distance and radius_km_float and hasattr(contact, 'distance_km'):
-                try:
-                    contact_data['distance_km'] = round(float(contact.distance_km), 2)
-                except (ValueError, TypeError):
-                    pass
+            def build_page():
+                # Get total count before pagination. Cursor clients scroll the same
+                # filters page after page, so their count is shared for a minute.
+                page_count = None
+                if with_count:
+                    page_count = cached_count(queryset, 'mobile_contacts') if cursor_mode else queryset.count()
+                
+                page_queryset = queryset
+                if after:
+                    name_after, type_after, id_after = after
+                    page_queryset = page_queryset.filter(
+                        Q(facility__facility_name__gt=name_after) |
+                        Q(facility__facility_name=name_after, contact_type__type_name__gt=type_after) |
+                        Q(facility__facility_name=name_after, contact_type__type_name=type_after,
+                          contact_id__gt=id_after)
+                    )
+                window = list(page_queryset[:page_size + 1] if cursor_mode else page_queryset[start:end + 1])
+                page_rows = window[:page_size]
+                last_key = None
+                if page_rows:
+                    last = page_rows[-1]
+                    last_key = (last.facility.facility_name, last.contact_type.type_name, last.contact_id)
+                return {
+                    'count': page_count,
+                    'has_more': len(window) > page_size,
+                    'last_key': last_key,
+                    'results': serialize_contacts(page_rows),
+                }
             
-            results.append(contact_data)
+            # Shared between devices through the versioned cache, like the
+            # facility list
+            page_data = cached_facility_data(
+                'mobile_contacts_page', 300, build_page,
+                county_id=county_id, contact_type=contact_type, facility=facility_id,
+                constituency=constituency_id, ward=ward_id, search=search_query,
+                primary_only=primary_only, page=None if cursor_mode else page, after=after,
+                page_size=page_size, with_count=with_count,
+            )
+            total_count = page_data['count']
+            has_more = page_data['has_more']
+            last_key = page_data['last_key']
+            results = page_data['results']
         
-        # Build pagination URLs
-        base_url = request.build_absolute_uri(request.path)
-        query_params = request.query_params.copy()
+        if not with_count:
+            total_count = None
         
+        # Build pagination URLs
         next_url = None
         previous_url = None
+        next_cursor = None
+        
+        if cursor_mode:
+            # Cursors only go forward; the app keeps pages it already has
+            if has_more and last_key is not None:
+                if by_distance:
+                    next_cursor = encode_cursor({
+                        'o': 'distance', 'd': last_key[0], 'name': last_key[1], 'id': last_key[2],
+                        'lat': latitude, 'lng': longitude
+                    })
+                else:
+                    next_cursor = encode_cursor({
+                        'o': 'facility_name', 'name': last_key[0], 'type': last_key[1], 'id': last_key[2]
+                    })
+                next_url = page_url(request, cursor=next_cursor)
+        else:
+            if has_more:
+                next_url = page_url(request, page=page + 1)
+            
+            if page > 1:
+                previous_url = page_url(request, page=page - 1)
         
-        if end < total_count:
-            query_params['page'] = page + 1
-            next_url = f"{base_url}?{query_params.urlencode()}"
-        
-        if page > 1:
-            query_params['page'] = page - 1
-            previous_url = f"{base_url}?{query_params.urlencode()}"
-        
-        return Response({
+        response_data = {
             'count': total_count,
-            'page': page,
             'page_size': page_size,
-            'total_pages': (total_count + page_size - 1) // page_size,
             'next': next_url,
             'previous': previous_url,
             'results': results,
@@ -2507,7 +2963,15 @@ class MobileContactViewSet(viewsets.ViewSet):
                 'primary_only': primary_only,
                 'location_aware': use_distance,
             }
-        })
+        }
+        if cursor_mode:
+            response_data['next_cursor'] = next_cursor
+        else:
+            response_data['page'] = page
+            response_data['total_pages'] = (
+                (total_count + page_size - 1) // page_size if total_count is not None else None
+            )
+        return Response(response_data)
 
 
 class MobileAiViewSet(viewsets.ViewSet):
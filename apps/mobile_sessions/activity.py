@@ -0,0 +1,120 @@
+# -*- encoding: utf-8 -*-
+"""
+Coalesced session activity stamps.
+
+MobileSession.update_activity() used to UPDATE the session row on nearly
+every mobile request, reads included, so the busiest table in the system
+took a write per page view. ActivityTracker keeps the stamps in memory
+instead and writes them in bulk:
+
+* a device is stamped at most once per ACTIVITY_MIN_INTERVAL_SECONDS; calls
+  in between are dropped, as they would only move the time a little;
+* pending stamps are written with one bulk_update once
+  ACTIVITY_FLUSH_EVENTS devices are waiting, or ACTIVITY_FLUSH_SECONDS
+  after the first one arrived, from a timer thread so a quiet worker still
+  writes them;
+* whatever is pending at interpreter exit is written then.
+
+last_active_at therefore lags real activity by at most the interval plus
+the flush delay (about 70 seconds with the defaults). These can be set in
+Django settings as MOBILE_ACTIVITY_MIN_INTERVAL_SECONDS,
+MOBILE_ACTIVITY_FLUSH_SECONDS and MOBILE_ACTIVITY_FLUSH_EVENTS.
+
+The bulk write goes through bulk_update, so it sends no signals and does
+not disturb the cached sessions in apps.mobile_sessions.resolver.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from apps.common.cache_utils import LocalCache
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_MIN_INTERVAL_SECONDS = getattr(settings, 'MOBILE_ACTIVITY_MIN_INTERVAL_SECONDS', 60)
+ACTIVITY_FLUSH_SECONDS = getattr(settings, 'MOBILE_ACTIVITY_FLUSH_SECONDS', 10)
+ACTIVITY_FLUSH_EVENTS = getattr(settings, 'MOBILE_ACTIVITY_FLUSH_EVENTS', 500)
+ACTIVITY_MAX_DEVICES = 100000
+
+
+class ActivityTracker:
+    """Collects last-activity stamps per device and writes them in batches."""
+
+    def __init__(self, min_interval=ACTIVITY_MIN_INTERVAL_SECONDS,
+                 flush_seconds=ACTIVITY_FLUSH_SECONDS, flush_events=ACTIVITY_FLUSH_EVENTS):
+        self.min_interval = min_interval
+        self.flush_seconds = flush_seconds
+        self.flush_events = flush_events
+        self._recent = LocalCache(max_entries=ACTIVITY_MAX_DEVICES)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def record(self, device_id, when=None):
+        """Note activity of `device_id`; returns False if it was skipped."""
+        found, _ = self._recent.get(device_id)
+        if found:
+            return False
+        when = when or timezone.now()
+        if self.min_interval:
+            self._recent.set(device_id, when, self.min_interval)
+        with self._lock:
+            self._pending[device_id] = when
+            due = len(self._pending) >= self.flush_events
+            if not due and self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write every pending stamp now. Returns the number of devices."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        # Imported here: models.py imports this module
+        from .models import MobileSession
+        sessions = [
+            MobileSession(device_id=device_id, last_active_at=when)
+            for device_id, when in pending.items()
+        ]
+        try:
+            MobileSession.objects.bulk_update(sessions, ['last_active_at'], batch_size=500)
+        except Exception:
+            # Activity stamps are best effort; never fail a request over them
+            logger.exception("Could not write activity of %d mobile sessions", len(sessions))
+            return 0
+        return len(sessions)
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own connection; do not leak it
+            connections.close_all()
+
+    def clear(self):
+        """Forget pending and recent stamps without writing them (tests)."""
+        with self._lock:
+            self._pending = {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._recent.clear()
+
+
+activity_tracker = ActivityTracker()
+atexit.register(activity_tracker.flush)
@@ -10,3 +10,7 @@ class MobileSessionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.mobile_sessions'
     verbose_name = 'Mobile Sessions'
+
+    def ready(self):
+        import apps.mobile_sessions.signals  # noqa
+        import apps.mobile_sessions.usage  # noqa
@@ -6,6 +6,7 @@ Mobile Session models for GVRC Admin
 from django.db import models
 from django.utils import timezone
 from apps.authentication.models import User
+from .activity import activity_tracker
 
 
 class MobileSession(models.Model):
@@ -35,9 +36,9 @@ class MobileSession(models.Model):
         self.save(update_fields=['latitude', 'longitude', 'location_updated_at', 'updated_at'])
     
     def update_activity(self):
-        """Update last activity timestamp"""
+        """Update last activity timestamp (written in batches, see activity.py)"""
         self.last_active_at = timezone.now()
-        self.save(update_fields=['last_active_at', 'updated_at'])
+        activity_tracker.record(self.device_id, self.last_active_at)
     
     def update_game_score(self, new_score):
         """Update game high score if the new score is higher"""
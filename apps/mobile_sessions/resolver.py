@@ -0,0 +1,97 @@
+# -*- encoding: utf-8 -*-
+"""
+Cached lookup of active mobile sessions.
+
+Every /mobile/ request named its device and MobileSessionPermission fetched
+the session row; the chat views and serializers then fetched the same row
+again for the same request. resolve_session() replaces those lookups:
+
+* within a request the session is resolved once and remembered on the
+  request, so the permission class, the view and its serializers share it;
+* across requests a session is kept for LOCAL_SESSION_SECONDS in this
+  process and for SESSION_CACHE_SECONDS in the shared cache. Unknown or
+  inactive devices are cached as well, so a client retrying with a dead
+  device_id does not hit the database each time.
+
+Session edits other than activity stamps (ending, reactivation, location
+and settings updates, new sessions) drop the shared entry through the
+signals in apps.mobile_sessions.signals. Other workers may keep serving
+their own copy for up to LOCAL_SESSION_SECONDS.
+
+Each caller gets its own MobileSession instance, rebuilt from the cached
+row, so views can modify and save it without affecting other requests.
+"""
+
+from django.core.cache import cache
+from django.db import router
+
+from apps.common.cache_utils import LocalCache
+
+from .models import MobileSession
+
+SESSION_CACHE_SECONDS = 60
+LOCAL_SESSION_SECONDS = 5
+LOCAL_SESSION_MAX_ENTRIES = 4096
+
+# Cached in place of a row for unknown or inactive devices
+NO_SESSION = 0
+
+_local_sessions = LocalCache(max_entries=LOCAL_SESSION_MAX_ENTRIES)
+_field_names = [field.attname for field in MobileSession._meta.concrete_fields]
+
+
+def _cache_key(device_id):
+    return f'mobile_session:{device_id}'
+
+
+def _load_row(device_id):
+    found, row = _local_sessions.get(device_id)
+    if found:
+        return row
+    key = _cache_key(device_id)
+    row = cache.get(key)
+    if row is None:
+        row = (
+            MobileSession.objects.filter(device_id=device_id, is_active=True)
+            .values_list(*_field_names).first()
+        ) or NO_SESSION
+        cache.set(key, row, SESSION_CACHE_SECONDS)
+    _local_sessions.set(device_id, row, LOCAL_SESSION_SECONDS)
+    return row
+
+
+def resolve_session(device_id, request=None):
+    """
+    The active MobileSession of `device_id`, or None. Pass the request to
+    resolve each device at most once per request.
+    """
+    if not device_id:
+        return None
+    # DRF's Request wraps the HttpRequest; memoize on the inner one so
+    # every wrapper of the same request shares it
+    request = getattr(request, '_request', request)
+    resolved = getattr(request, '_mobile_sessions', None) if request is not None else None
+    if resolved is not None and device_id in resolved:
+        return resolved[device_id]
+
+    row = _load_row(device_id)
+    session = MobileSession.from_db(router.db_for_read(MobileSession), _field_names, row) if row else None
+    if request is not None:
+        if resolved is None:
+            resolved = request._mobile_sessions = {}
+        resolved[device_id] = session
+    return session
+
+
+def require_session(device_id, request=None):
+    """Like resolve_session(), but raise MobileSession.DoesNotExist for none."""
+    session = resolve_session(device_id, request)
+    if session is None:
+        raise MobileSession.DoesNotExist(f'No active mobile session for device {device_id}')
+    return session
+
+
+def forget_session(device_id):
+    """Drop the cached session of `device_id` here and in the shared cache."""
+    cache.delete(_cache_key(device_id))
+    _local_sessions.delete(device_id)
@@ -5,6 +5,7 @@ Mobile Session Services
 
 from django.utils import timezone
 from .models import MobileSession
+from .resolver import resolve_session
 
 
 class MobileSessionService:
@@ -38,10 +39,7 @@ class MobileSessionService:
     @staticmethod
     def get_active_session(device_id):
         """Get active session for device"""
-        try:
-            return MobileSession.objects.get(device_id=device_id, is_active=True)
-        except MobileSession.DoesNotExist:
-            return None
+        return resolve_session(device_id)
     
     @staticmethod
     def update_session_activity(device_id):
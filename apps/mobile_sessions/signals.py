@@ -0,0 +1,24 @@
+# -*- encoding: utf-8 -*-
+"""
+Signal handlers for mobile sessions app
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MobileSession
+from .resolver import forget_session
+
+# Saves touching only these leave the cached session good enough to serve
+ACTIVITY_FIELDS = {'last_active_at', 'updated_at'}
+
+
+@receiver(post_save, sender=MobileSession)
+@receiver(post_delete, sender=MobileSession)
+def mobile_session_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Ending, reactivating or editing a session drops its cached copy."""
+    if raw or (update_fields and set(update_fields) <= ACTIVITY_FIELDS):
+        return
+    device_id = instance.device_id
+    transaction.on_commit(lambda: forget_session(device_id))
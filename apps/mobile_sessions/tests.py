@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.http import HttpRequest
+from django.test import TestCase
+from django.utils import timezone
+
+from .activity import ActivityTracker
+from .models import MobileSession
+from .resolver import forget_session, resolve_session
+from .services import MobileSessionService
+
+
+class SessionResolverTest(TestCase):
+    def setUp(self):
+        forget_session('resolver-device')
+
+    def test_session_resolved_once_then_served_from_cache(self):
+        MobileSession.objects.create(device_id='resolver-device')
+        request = HttpRequest()
+        with self.assertNumQueries(1):
+            first = resolve_session('resolver-device', request)
+            self.assertIs(resolve_session('resolver-device', request), first)
+        with self.assertNumQueries(0):
+            other = resolve_session('resolver-device', HttpRequest())
+        self.assertEqual(other.device_id, 'resolver-device')
+        self.assertIsNot(other, first)
+
+    def test_ended_session_is_no_longer_resolved(self):
+        session = MobileSession.objects.create(device_id='resolver-device')
+        self.assertIsNotNone(resolve_session('resolver-device'))
+        with self.captureOnCommitCallbacks(execute=True):
+            MobileSessionService.end_session(session)
+        self.assertIsNone(resolve_session('resolver-device'))
+
+    def test_new_session_replaces_cached_miss(self):
+        self.assertIsNone(resolve_session('resolver-device'))
+        with self.captureOnCommitCallbacks(execute=True):
+            MobileSession.objects.create(device_id='resolver-device')
+        self.assertIsNotNone(resolve_session('resolver-device'))
+
+    def test_activity_update_keeps_cached_session(self):
+        session = MobileSession.objects.create(device_id='resolver-device')
+        resolve_session('resolver-device')
+        with self.captureOnCommitCallbacks(execute=True):
+            session.update_activity()
+        with self.assertNumQueries(0):
+            resolve_session('resolver-device')
+
+
+class ActivityTrackerTest(TestCase):
+    def setUp(self):
+        self.tracker = ActivityTracker(min_interval=60, flush_seconds=3600, flush_events=3)
+        self.addCleanup(self.tracker.clear)
+        for device_id in ('device-a', 'device-b', 'device-c'):
+            MobileSession.objects.create(device_id=device_id, last_active_at=timezone.now() - timedelta(days=1))
+
+    def test_repeated_activity_within_interval_is_skipped(self):
+        self.assertTrue(self.tracker.record('device-a'))
+        self.assertFalse(self.tracker.record('device-a'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), 1)
+        self.assertEqual(self.tracker.flush(), 0)
+
+    def test_batch_written_once_enough_devices_are_pending(self):
+        with self.assertNumQueries(0):
+            self.tracker.record('device-a')
+            self.tracker.record('device-b')
+        with self.assertNumQueries(1):
+            self.tracker.record('device-c')
+        recent = timezone.now() - timedelta(minutes=1)
+        self.assertEqual(MobileSession.objects.filter(last_active_at__gte=recent).count(), 3)
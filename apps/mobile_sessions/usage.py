@@ -0,0 +1,63 @@
+# -*- encoding: utf-8 -*-
+"""
+Feature usage counters, written through the write-behind queue.
+
+MobileAppUsage keeps one row per device and feature with a running
+usage_count, so a queued use cannot simply be inserted. write_feature_usage()
+merges a batch: uses of the same feature by the same device are added up,
+existing rows get their count and last_used moved on with one bulk_update,
+and the rest are inserted with one bulk_create. Two workers creating the
+same row at once keep only one of the inserts; for usage statistics that
+loss is acceptable.
+"""
+
+from django.utils import timezone
+
+from apps.common.write_behind import register_writer, write_behind
+
+from .models import MobileAppUsage
+
+
+def record_feature_usage(device_id, feature_name, feature_category='', additional_data=None):
+    """Count one use of `feature_name` by `device_id`, asynchronously."""
+    now = timezone.now()
+    return write_behind.enqueue(MobileAppUsage(
+        session_id=device_id,
+        feature_name=feature_name,
+        feature_category=feature_category,
+        additional_data=additional_data or {},
+        first_used=now,
+        last_used=now,
+        created_at=now,
+    ))
+
+
+def write_feature_usage(usages):
+    totals = {}
+    for usage in usages:
+        key = (usage.session_id, usage.feature_name)
+        merged = totals.get(key)
+        if merged is None:
+            totals[key] = usage
+        else:
+            merged.usage_count += usage.usage_count
+            merged.last_used = max(merged.last_used, usage.last_used)
+
+    existing = MobileAppUsage.objects.filter(
+        session_id__in={device_id for device_id, _ in totals},
+        feature_name__in={feature_name for _, feature_name in totals},
+    )
+    updated = []
+    for row in existing:
+        usage = totals.pop((row.session_id, row.feature_name), None)
+        if usage is not None:
+            row.usage_count += usage.usage_count
+            row.last_used = max(row.last_used, usage.last_used)
+            updated.append(row)
+    if updated:
+        MobileAppUsage.objects.bulk_update(updated, ['usage_count', 'last_used'])
+    if totals:
+        MobileAppUsage.objects.bulk_create(list(totals.values()), ignore_conflicts=True)
+
+
+register_writer(MobileAppUsage, write_feature_usage)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('system/', views.system_metrics, name='system_metrics'),
     path('database/', views.database_metrics, name='database_metrics'),
     path('application/', views.application_metrics, name='application_metrics'),
+    path('write-behind/', views.write_behind_metrics, name='write_behind_metrics'),
     path('status/', views.full_status, name='full_status'),
 ]
 
@@ -12,6 +12,7 @@ from django.shortcuts import render
 from django.db import connection
 from django.core.cache import cache
 from django.conf import settings
+from apps.common.write_behind import write_behind
 import os
 import json
 from datetime import datetime, timedelta
@@ -208,6 +209,7 @@ def application_metrics(request):
             'logs': log_sizes,
             'debug_mode': settings.DEBUG,
             'allowed_hosts_count': len(getattr(settings, 'ALLOWED_HOSTS', [])),
+            'write_behind': write_behind.stats(),
         })
     except Exception as e:
         return JsonResponse({
@@ -216,6 +218,16 @@ def application_metrics(request):
         }, status=500)
 
 
+@require_http_methods(["GET"])
+@login_required
+def write_behind_metrics(request):
+    """Write-behind queue depth, counters and flush latency of this worker"""
+    return JsonResponse({
+        'timestamp': datetime.now().isoformat(),
+        **write_behind.stats(),
+    })
+
+
 @require_http_methods(["GET"])
 @login_required
 def full_status(request):
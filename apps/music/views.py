@@ -15,6 +15,7 @@ from django.contrib import messages
 from .models import Music, MusicPlay
 from .forms import MusicForm
 from apps.authentication.views import custom_login_required
+from apps.common.write_behind import write_behind
 import json
 from django.contrib.auth import get_user_model
 from apps.authentication.permissions import permission_required
@@ -166,13 +167,14 @@ def track_play(request):
             music = get_object_or_404(Music, music_id=music_id)
             user = get_object_or_404(User, id=user_id)
             
-            MusicPlay.objects.create(
+            # Written in batches by the write-behind queue
+            write_behind.enqueue(MusicPlay(
                 music=music,
                 user=user,
                 ip_address=request.META.get('REMOTE_ADDR'),
                 user_agent=request.META.get('HTTP_USER_AGENT', ''),
                 session_duration=session_duration
-            )
+            ))
             
             return JsonResponse({'status': 'success'})
         else:
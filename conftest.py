@@ -9,6 +9,14 @@ import pytest
 from django.contrib.auth import get_user_model
 
 
+@pytest.fixture(autouse=True)
+def discard_activity_stamps():
+    """Drop buffered session activity so nothing is flushed after the test database is gone."""
+    yield
+    from apps.mobile_sessions.activity import activity_tracker
+    activity_tracker.clear()
+
+
 @pytest.fixture
 def test_user(db):
     User = get_user_model()
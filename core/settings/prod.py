@@ -3,6 +3,8 @@
 Production settings
 """
 
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *
 
 DEBUG = False
@@ -131,25 +133,36 @@ LOGGING = {
     },
 }
 
-# Cache configuration (Redis recommended for production)
+# Cache configuration
+#
+# The cache must be shared by every gunicorn worker: the data version
+# counters, the stampede locks (cache.add), the reference data version, the
+# mobile session cache and the analytics dedup keys only work if all workers
+# see the same keys. LocMemCache is per process, so an edit served by one
+# worker left the others answering from stale entries.
+#
+# Only Redis gives all of that cheaply: the database cache turns every
+# version read, lock, session lookup and dedup check into a SQL query, and its
+# incr() is a read-then-write that loses concurrent bumps. Refuse to start
+# without REDIS_URL rather than fall back to it.
+REDIS_URL = os.getenv('REDIS_URL', None)
+
+if not REDIS_URL:
+    raise ImproperlyConfigured(
+        'REDIS_URL must be set in production; the data version counters, '
+        'locks and session cache need a shared, atomic cache.'
+    )
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
     }
 }
 
-# For production with Redis, uncomment and configure:
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django_redis.cache.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#         }
-#     }
-# }
-
 # Email configuration for production
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -0,0 +1,13 @@
+# -*- encoding: utf-8 -*-
+"""
+Test settings (pytest.ini)
+"""
+
+from .dev import *
+
+# Write queued rows in the caller's thread, inside the test's transaction;
+# tests of the queue itself turn it back on with override_settings
+WRITE_BEHIND_ENABLED = False
+
+# Analytics rollups and exports read up to the newest row at once
+ANALYTICS_SETTLE_SECONDS = 0
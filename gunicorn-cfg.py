@@ -52,3 +52,9 @@ enable_stdio_inheritance = True
 raw_env = [
     'DJANGO_SETTINGS_MODULE=core.settings.prod',
 ]
+
+
+def worker_exit(server, worker):
+    """Write out queued analytics rows before the worker goes away"""
+    from apps.common.write_behind import write_behind
+    write_behind.stop()